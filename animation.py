@@ -0,0 +1,107 @@
+"""
+Non-blocking animation scheduler on top of Tk's `after`.
+
+A Timeline is a list of (time_ms, callback) keyframes plus an `on_done`
+continuation. Keyframes at t=0 run immediately; the rest are scheduled
+with root.after, so the event loop (and EMG input) is never blocked.
+
+`Animator.finish()` cuts every running timeline short: pending callbacks
+are cancelled, the last keyframe (the resting state) is applied and
+on_done runs. The app calls it when a signal arrives, so a signal never
+waits for a flash or transition. `scale` stretches all durations; 0
+disables animation (expert mode) and every timeline lands at once.
+"""
+
+
+def mix_color(c1, c2, t):
+    """Linear blend of two '#rrggbb' colors, t in [0, 1]."""
+    a = [int(c1[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(c2[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(x + (y - x) * t):02x}" for x, y in zip(a, b))
+
+
+class Timeline:
+    def __init__(self, animator, keyframes, on_done=None):
+        self.animator = animator
+        self.keyframes = sorted(keyframes, key=lambda k: k[0])
+        self.on_done = on_done
+        self.next = 0  # index of the next keyframe to run
+        self.after_ids = []
+        self.finished = False
+
+    def _start(self):
+        scale = self.animator.scale
+        if scale <= 0 or not self.keyframes:
+            self.finish()
+            return
+        for i, (t, _) in enumerate(self.keyframes):
+            if t <= 0:
+                self._run(i)
+            else:
+                self.after_ids.append(self.animator.root.after(int(t * scale), self._run, i))
+        if self.keyframes[-1][0] <= 0:
+            self._complete()
+
+    def _run(self, i):
+        if self.finished or i < self.next:
+            return
+        self.next = i + 1
+        self.keyframes[i][1]()
+        if i == len(self.keyframes) - 1 and self.keyframes[i][0] > 0:
+            self._complete()
+
+    def _complete(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.animator._active.remove(self)
+        if self.on_done:
+            self.on_done()
+
+    def finish(self):
+        """Jump to the end: cancel pending keyframes, apply the last one, run on_done."""
+        if self.finished:
+            return
+        for after_id in self.after_ids:
+            self.animator.root.after_cancel(after_id)
+        self.after_ids = []
+        if self.keyframes and self.next < len(self.keyframes):
+            self.next = len(self.keyframes)
+            self.keyframes[-1][1]()
+        self._complete()
+
+
+class Animator:
+    def __init__(self, root, scale=1.0):
+        self.root = root
+        self.scale = scale
+        self._active = []
+
+    @property
+    def busy(self):
+        return bool(self._active)
+
+    def play(self, keyframes, on_done=None):
+        """Play (time_ms, callback) keyframes; returns the Timeline."""
+        timeline = Timeline(self, keyframes, on_done)
+        self._active.append(timeline)
+        timeline._start()
+        return timeline
+
+    def fade(self, start_color, end_color, duration_ms, apply, frames=4, on_done=None):
+        """Call apply(color) with colors blending from start_color to end_color."""
+        keyframes = [(duration_ms * i / frames, lambda c=mix_color(start_color, end_color, i / frames): apply(c))
+                     for i in range(frames + 1)]
+        return self.play(keyframes, on_done)
+
+    def move(self, start, end, duration_ms, apply, frames=4, on_done=None):
+        """Call apply(coords) with coordinate tuples interpolated from start to end."""
+        def lerp(t):
+            return tuple(a + (b - a) * t for a, b in zip(start, end))
+        keyframes = [(duration_ms * i / frames, lambda p=lerp(i / frames): apply(p)) for i in range(frames + 1)]
+        return self.play(keyframes, on_done)
+
+    def finish(self):
+        """Land every running timeline at its end state (in start order)."""
+        while self._active:
+            self._active[0].finish()
@@ -0,0 +1,319 @@
+"""
+Single-switch auto-scan: one reliable EMG activation is enough.
+
+Every prompt of the app normally needs two or more distinct signals. In
+auto-scan mode the answers of the current prompt are highlighted in turn
+on a timer (the parts of a split prompt, 0 / 1 of a question, then ↶
+undo) and one activation picks the highlighted answer. Prompts that walk
+something one step per 0 (the diagonal crosses, the axis scan) advance on
+the timer by themselves: each cross / cell stays up for one interval and
+an activation answers 1 ("here"). Answers go through the app's
+set_signal / undo, so recordings replay without auto-scan.
+
+TickScheduler is the timer: tick n is due at start + n * interval on the
+monotonic clock and every root.after delay is computed from that
+deadline, so handler and redraw time don't add up to drift; a stalled
+event loop skips the overdue ticks instead of bunching them up.
+
+ScanRate adapts the interval to the user. An activation meant for one
+option lands on the next when the reaction time exceeds the interval, so
+the interval should sit at the (1 - target error) quantile of the user's
+reaction times: the shortest one they follow at that error rate. Once
+enough activations are timed the interval starts at that quantile of the
+measured reaction times; from then on a weighted up-down staircase holds
+it there: every activation shortens it a little, every late one (an
+answer undone with the very next activation) lengthens it, with steps
+that balance out exactly at the target late rate. An undone answer
+counts as a reaction to the option before, one interval longer.
+
+    python demo1.py --autoscan 1200 --emg synthetic
+    python autoscan.py --rt-median 0.8 --fixed 1.0 1.5 2.0
+"""
+import argparse
+import math
+import random
+import time
+from collections import deque
+
+from scan_engine import AXIS_SCAN, CHOICE, CROSS, DONE, FALLBACK, SPLIT_PHASES, ScanEngine
+
+UNDO = "undo"  # the undo slot of a scan cycle
+STEP_PHASES = (CROSS, AXIS_SCAN)  # the timer answers 0 (next cross / cell); an activation answers 1
+FIRST_DWELL = 1.5  # the first highlight of a prompt stays this many intervals (time to read it)
+STAIRCASE_STEP = 0.1  # log-interval step of the staircase (a late activation adds ~10%)
+
+
+class TickScheduler:
+    """Calls tick() every `interval` seconds through root.after, on deadlines of a monotonic clock."""
+
+    def __init__(self, root, tick, clock=time.monotonic):
+        self.root, self.tick, self.clock = root, tick, clock
+        self.after_id = None
+        self.interval = None
+        self.due = None  # clock time of the next tick
+        self.skipped = 0  # ticks dropped because the event loop stalled past them
+
+    @property
+    def running(self):
+        return self.after_id is not None
+
+    def start(self, interval, first=None):
+        """Tick every `interval` s, the first one after `first` s (default one interval)."""
+        self.stop()
+        self.interval = interval
+        self.due = self.clock() + (interval if first is None else first)
+        self._schedule()
+
+    def stop(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def _schedule(self):
+        self.after_id = self.root.after(max(0, round((self.due - self.clock()) * 1000)), self._fire)
+
+    def _fire(self):
+        self.after_id = None
+        late = int((self.clock() - self.due) // self.interval)
+        if late > 0:
+            # keep the phase of the deadline grid, drop the ticks the loop missed
+            self.skipped += late
+            self.due += late * self.interval
+        self.due += self.interval
+        self._schedule()  # before tick(), which may stop or restart the scheduler
+        self.tick()
+
+
+class ScanRate:
+    """Scan interval adapted to the user's reaction times (see the module docstring)."""
+
+    def __init__(self, interval=1.0, target_error=0.05, lo=0.3, hi=4.0, window=40, min_samples=10, adapt=True):
+        self.interval = interval
+        self.target_error = target_error
+        self.lo, self.hi = lo, hi
+        self.min_samples = min_samples
+        self.adapt = adapt
+        self.reactions = deque(maxlen=window)  # seconds from highlight to activation
+        self.late = deque(maxlen=window)  # per activation: undone right after (too late)
+        self._intervals = deque(maxlen=window)  # interval each activation was made at
+        self.timed = 0  # activations so far
+        self._answered = False  # the last activation was an answer (not ↶)
+
+    def activation(self, reaction, undo=False):
+        """One activation `reaction` s after its highlight; `undo`: it picked ↶."""
+        if undo and self._answered:
+            self._late()
+        self._answered = not undo
+        self.reactions.append(reaction)
+        self.late.append(False)
+        self._intervals.append(self.interval)
+        self.timed += 1
+        if not self.adapt:
+            return
+        if self.timed == self.min_samples:
+            values = sorted(self.reactions)
+            self._set(values[min(len(values) - 1, int((1 - self.target_error) * len(values)))])
+        elif self.timed > self.min_samples:
+            self._set(self.interval * math.exp(-STAIRCASE_STEP * self.target_error))
+
+    def _late(self):
+        # the answer just taken back was meant for the option before, one interval earlier;
+        # further undos in a row go back through older answers on purpose and don't count
+        self.reactions[-1] += self._intervals[-1]
+        self.late[-1] = True
+        if self.adapt and self.timed > self.min_samples:
+            # undo the timely step and take the late one: exp(step * t) * exp(step * (1 - t))
+            self._set(self.interval * math.exp(STAIRCASE_STEP))
+
+    def _set(self, interval):
+        self.interval = min(self.hi, max(self.lo, interval))
+
+    @property
+    def late_rate(self):
+        return sum(self.late) / len(self.late) if self.late else 0.0
+
+    def summary(self):
+        if not self.reactions:
+            return f"Scan: {self.interval * 1000:.0f} ms"
+        values = sorted(self.reactions)
+        return (f"Scan: {self.interval * 1000:.0f} ms | reaction p50 {values[len(values) // 2] * 1000:.0f} ms"
+                f" | late {self.late_rate:.0%} (n={len(values)})")
+
+
+class AutoScanner:
+    """Drives an EMGScanningApp from one switch: the current prompt's answers are highlighted in
+    turn (app.draw_scan_focus) and activate() answers with the highlighted one."""
+
+    def __init__(self, app, rate, undo=True, clock=time.monotonic, first_dwell=FIRST_DWELL):
+        self.app = app
+        self.rate = rate
+        self.undo = undo  # offer ↶ as the last answer of every cycle
+        self.clock = clock
+        self.first_dwell = first_dwell
+        self.scheduler = TickScheduler(app.root, self._tick, clock)
+        self.cycle = ()
+        self.pos = 0
+        self.focus = None  # highlighted answer, None while no prompt is waiting
+        self.onset = 0.0  # clock time the focus was shown
+        self.focus_listeners = []  # callbacks(option) on every highlight (simulation, logging)
+        self.activations = 0
+        self.ignored = 0  # activations while no prompt was waiting (flash, pause)
+
+    def _cycle(self):
+        e = self.app.engine
+        if e.phase in STEP_PHASES:
+            return [1]  # no undo slot: it would double the time per cross
+        if e.phase == DONE:
+            cycle = [0]
+        elif e.phase in SPLIT_PHASES:
+            cycle = list(range(len(e.halves)))
+        else:
+            cycle = [0, 1]
+        if self.undo and e.signals:
+            cycle.append(UNDO)
+        return cycle
+
+    def prompt(self):
+        """A prompt started waiting (app.wait_for_signal): highlight its first answer, start the timer."""
+        self.cycle, self.pos = self._cycle(), 0
+        self._show()
+        interval = self.rate.interval
+        step = self.app.engine.phase in STEP_PHASES
+        self.scheduler.start(interval, interval if step else interval * self.first_dwell)
+
+    def _show(self):
+        self.focus = self.cycle[self.pos]
+        self.app.draw_scan_focus(self.focus)
+        self.onset = self.clock()
+        for listener in self.focus_listeners:
+            listener(self.focus)
+
+    def _tick(self):
+        app = self.app
+        if app.waiting is None:
+            self.stop()  # answered some other way (buttons); the next prompt restarts the cycle
+            return
+        if app.engine.phase in STEP_PHASES:
+            # this cross / cell passed without an activation: next one
+            self.stop()
+            app.set_signal(0)
+            return
+        self.pos = (self.pos + 1) % len(self.cycle)
+        self._show()
+
+    def activate(self):
+        """The switch: answer the waiting prompt with the highlighted option. False if none is waiting."""
+        app = self.app
+        if self.focus is None or app.waiting is None:
+            self.ignored += 1
+            return False
+        option, reaction = self.focus, self.clock() - self.onset
+        self.stop()
+        self.activations += 1
+        self.rate.activation(reaction, undo=option == UNDO)
+        if option == UNDO:
+            app.undo()
+        else:
+            app.set_signal(option)
+        if app.waiting is not None and self.focus is None:
+            self.prompt()  # the answer changed nothing (e.g. nothing left to undo): keep scanning
+        app.latency_label.config(text=f"{app.latency.summary()}   {self.rate.summary()}")
+        return True
+
+    def stop(self):
+        self.scheduler.stop()
+        self.focus = None
+
+
+# ---------------- simulation ----------------
+def simulate(interval, adapt, selections=50, rt_median=0.8, rt_sigma=0.35, target_error=0.05, seed=0,
+             cols=20, rows=20, choice_cells=16, max_s=36000.0):
+    """Auto-scan a headless app (virtual clock) with a simulated user; returns the results dict.
+
+    The user reacts to the highlight of the answer they want after a lognormal reaction time;
+    whatever is highlighted by then is answered, and a wrong answer is undone at the next prompt."""
+    import demo1
+    import headless
+    from simulate import SimulatedUser
+
+    demo1.tk = headless
+    rng = random.Random(seed)
+    root = headless.Tk()
+    app = demo1.EMGScanningApp(root, engine=ScanEngine(cols, rows, choice_cells=choice_cells), start_ms=0)
+    app.repeat = True
+    scanner = app.attach_autoscan(ScanRate(interval, target_error, adapt=adapt), clock=lambda: root.now / 1000)
+    user = SimulatedUser(rng, reaction_median=rt_median, reaction_sigma=rt_sigma)
+    state = {"target": (rng.randrange(cols), rng.randrange(rows)), "next": False, "correct": 0, "errors": 0}
+
+    def wanted():
+        e, target = app.engine, state["target"]
+        if e.phase == DONE:
+            return 0 if e.selection == target else UNDO
+        if e.phase in SPLIT_PHASES + (CHOICE, FALLBACK) and not e.region.contains(*target):
+            return UNDO
+        s = user.intended(e, *target)
+        return None if e.phase in STEP_PHASES and s == 0 else s
+
+    def fire(intended):
+        option = scanner.focus
+        if scanner.activate():
+            state["errors"] += option != intended
+
+    def on_focus(option):
+        if state["next"] and app.engine.phase != DONE:
+            state["target"], state["next"] = (rng.randrange(cols), rng.randrange(rows)), False
+        if root.now / 1000 > max_s or state["correct"] >= selections:
+            scanner.stop()
+            app.autoscan = None  # the queue drains and run_pending returns
+            return
+        if option == wanted():
+            root.after(round(user.reaction_time() * 1000), fire, option)
+
+    def selected(col, row):
+        if (col, row) == state["target"]:
+            state["correct"] += 1
+            state["next"] = True
+    scanner.focus_listeners.append(on_focus)
+    app.selection_listeners.append(selected)
+    root.run_pending()
+    seconds = root.now / 1000
+    return {
+        "interval": interval, "adapt": adapt, "final_interval": scanner.rate.interval,
+        "selections": state["correct"], "seconds": seconds,
+        "seconds_per_selection": seconds / max(1, state["correct"]),
+        "selections_per_min": 60 * state["correct"] / seconds if seconds else 0.0,
+        "activations": scanner.activations, "error_rate": state["errors"] / max(1, scanner.activations),
+        "skipped_ticks": scanner.scheduler.skipped,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulate single-switch auto-scan: fixed vs adaptive scan rate.")
+    ap.add_argument("--fixed", type=float, nargs="*", default=[0.8, 1.2, 1.6, 2.0], metavar="S",
+                    help="fixed scan intervals to compare (seconds)")
+    ap.add_argument("--start", type=float, default=1.2, help="adaptive: initial interval (seconds)")
+    ap.add_argument("--rt-median", type=float, nargs="+", default=[0.8], help="user reaction time median (s)")
+    ap.add_argument("--rt-sigma", type=float, default=0.35, help="lognormal sigma of the reaction time")
+    ap.add_argument("--target-error", type=float, default=0.05, help="adaptive: late-activation rate aimed at")
+    ap.add_argument("--grid", type=int, default=20, help="N x N cells")
+    ap.add_argument("--choice-cells", type=int, default=16)
+    ap.add_argument("-n", type=int, default=50, help="correct selections per run")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    header = (f"{'rt_med':>6} {'mode':>9} {'start':>5} {'final':>5} | {'s/sel':>6} {'sel/min':>7} | "
+              f"{'err':>6} {'acts':>6}")
+    print(header)
+    print("-" * len(header))
+    for rt in args.rt_median:
+        runs = [(s, False) for s in args.fixed] + [(args.start, True)]
+        for interval, adapt in runs:
+            r = simulate(interval, adapt, args.n, rt, args.rt_sigma, args.target_error, args.seed,
+                         args.grid, args.grid, args.choice_cells)
+            print(f"{rt:>6.2f} {'adaptive' if adapt else 'fixed':>9} {interval:>5.2f} {r['final_interval']:>5.2f} | "
+                  f"{r['seconds_per_selection']:>6.1f} {r['selections_per_min']:>7.2f} | "
+                  f"{r['error_rate']:>6.3f} {r['activations']:>6}")
+
+
+if __name__ == "__main__":
+    main()
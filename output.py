@@ -0,0 +1,406 @@
+"""
+Action sinks: turn a finished selection into OS pointer events.
+
+A sink emits move / click / double-click / drag at screen coordinates,
+or types text (keyboard mode, keyboard.py), through one backend:
+
+- RecordingSink   keeps the events in memory (tests, replays, headless runs)
+- XTestSink       X11 XTEST extension, e.g. under Xvfb (needs python-xlib)
+- UInputSink      Linux uinput absolute pointer (needs python-evdev and
+                  write access to /dev/uinput); it types through a second
+                  uinput keyboard with a US layout, so only characters on
+                  that layout are typed and the rest are counted as skipped
+
+Every action carries a perf_counter timestamp and, when the caller passes
+the time of the signal that finished the selection, its
+selection-to-event latency (measured after the backend flushed). A
+backend that has to wait (XTEST rebinding a spare keycode) queues the
+rest of the text and finishes it through the sink's `after` scheduler
+(demo1 sets Tk's root.after), so the UI thread never sleeps.
+
+    python output.py record --action double_click 640 360
+    DISPLAY=:99 python output.py xtest --action click 640 360
+"""
+import argparse
+import time
+from collections import OrderedDict, deque
+
+MOVE, CLICK, DOUBLE_CLICK, DRAG = "move", "click", "double_click", "drag"
+ACTIONS = (MOVE, CLICK, DOUBLE_CLICK, DRAG)
+TYPE = "type"
+BACKSPACE = "\b"
+# X keysyms outside Latin-1 (Unicode characters are 0x01000000 + code point)
+XK_BACKSPACE, XK_RETURN, XK_SHIFT_L = 0xFF08, 0xFF0D, 0xFFE1
+# a spare keycode is rebound only after its last press is this old, so clients decode it first
+SPARE_IDLE_S = 0.1
+# uinput typing: character -> (evdev key name, with shift) on a US layout
+US_KEYS = {" ": ("KEY_SPACE", False), BACKSPACE: ("KEY_BACKSPACE", False), "\n": ("KEY_ENTER", False),
+           ".": ("KEY_DOT", False), ",": ("KEY_COMMA", False), "-": ("KEY_MINUS", False),
+           "'": ("KEY_APOSTROPHE", False), ";": ("KEY_SEMICOLON", False), "/": ("KEY_SLASH", False),
+           "?": ("KEY_SLASH", True), "!": ("KEY_1", True), ":": ("KEY_SEMICOLON", True)}
+US_KEYS.update({ch: ("KEY_" + ch.upper(), False) for ch in "abcdefghijklmnopqrstuvwxyz0123456789"})
+US_KEYS.update({ch.upper(): ("KEY_" + ch.upper(), True) for ch in "abcdefghijklmnopqrstuvwxyz"})
+
+
+def cell_center(col, row, cols, rows, screen_w, screen_h):
+    """Screen pixel at the center of grid cell (col, row) when the grid spans the screen."""
+    return (2 * col + 1) * screen_w // (2 * cols), (2 * row + 1) * screen_h // (2 * rows)
+
+
+class Action:
+    __slots__ = ("kind", "x", "y", "t", "wall", "latency", "text")
+
+    def __init__(self, kind, x, y, t, wall, latency=None, text=None):
+        self.kind, self.x, self.y = kind, x, y
+        self.t, self.wall = t, wall
+        self.latency = latency
+        self.text = text
+
+    def __repr__(self):
+        lat = f", {self.latency * 1000:.2f} ms" if self.latency is not None else ""
+        where = repr(self.text) if self.kind == TYPE else f"({self.x}, {self.y})"
+        return f"Action({self.kind} {where} @ {self.wall:.3f}{lat})"
+
+
+class ActionSink:
+    """Base sink. Backends implement _move(x, y), _button(down), _key(char) and _flush()."""
+
+    def __init__(self, history=1000):
+        self.actions = deque(maxlen=history)
+        self._dragging = False
+        self.skipped = 0  # characters the backend cannot type
+        self.after = None  # after(ms, callback) for deferred work; None: backends block instead
+
+    # ---------------- backend primitives ----------------
+    def _move(self, x, y):
+        raise NotImplementedError
+
+    def _button(self, down):
+        raise NotImplementedError
+
+    def _key(self, char):
+        """Press and release the key of one character ("\\b" = BackSpace); False if it can't be typed."""
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    # ---------------- actions ----------------
+    def _done(self, kind, x, y, t0, text=None):
+        t = time.perf_counter()
+        action = Action(kind, x, y, t, time.time(), None if t0 is None else t - t0, text)
+        self.actions.append(action)
+        return action
+
+    def move(self, x, y, t0=None):
+        self._move(x, y)
+        self._flush()
+        return self._done(MOVE, x, y, t0)
+
+    def click(self, x, y, t0=None):
+        self._move(x, y)
+        self._button(True)
+        self._button(False)
+        self._flush()
+        return self._done(CLICK, x, y, t0)
+
+    def double_click(self, x, y, t0=None):
+        self._move(x, y)
+        self._button(True)
+        self._button(False)
+        # back to back: well inside any double-click interval, and the UI thread never sleeps
+        self._button(True)
+        self._button(False)
+        self._flush()
+        return self._done(DOUBLE_CLICK, x, y, t0)
+
+    def drag(self, x, y, t0=None):
+        """Drags take two selections: the first presses the button at (x, y), the second releases it."""
+        self._move(x, y)
+        self._button(not self._dragging)
+        self._dragging = not self._dragging
+        self._flush()
+        return self._done(DRAG, x, y, t0)
+
+    def perform(self, kind, x, y, t0=None):
+        return getattr(self, kind)(x, y, t0)
+
+    def type_text(self, text, t0=None):
+        """Type `text` as key presses into the focused window ("\\b" is a backspace)."""
+        for char in text:
+            if not self._key(char):
+                self.skipped += 1
+        self._flush()
+        return self._done(TYPE, None, None, t0, text)
+
+    def summary(self):
+        latencies = sorted(a.latency for a in self.actions if a.latency is not None)
+        skipped = f" | {self.skipped} characters not typeable" if self.skipped else ""
+        if not latencies:
+            return f"Output: {len(self.actions)} actions{skipped}"
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        return (f"Output: {len(self.actions)} actions | selection-to-event p50 {p50 * 1000:.2f} ms"
+                f" | p95 {p95 * 1000:.2f} ms{skipped}")
+
+
+class RecordingSink(ActionSink):
+    """Keeps every primitive event as (perf_counter, kind, x, y) for tests and headless runs;
+    key events are (perf_counter, "key", char, None) and `typed` is the text they leave."""
+
+    def __init__(self, history=1000):
+        super().__init__(history)
+        self.events = []
+        self.x = self.y = None
+        self.typed = ""
+
+    def _move(self, x, y):
+        self.x, self.y = x, y
+        self.events.append((time.perf_counter(), "move", x, y))
+
+    def _button(self, down):
+        self.events.append((time.perf_counter(), "down" if down else "up", self.x, self.y))
+
+    def _key(self, char):
+        self.events.append((time.perf_counter(), "key", char, None))
+        self.typed = self.typed[:-1] if char == BACKSPACE else self.typed + char
+        return True
+
+
+class XTestSink(ActionSink):
+    """Pointer events through the X11 XTEST extension (works on Xvfb)."""
+
+    def __init__(self, display_name=None, history=1000):
+        try:
+            from Xlib import X, display
+            from Xlib.ext import xtest
+        except ImportError as exc:
+            raise RuntimeError("XTestSink needs python-xlib (pip install python-xlib)") from exc
+        super().__init__(history)
+        self._X, self._xtest = X, xtest
+        self.display = display.Display(display_name)
+        if not self.display.has_extension("XTEST"):
+            raise RuntimeError(f"X display {self.display.get_display_name()} has no XTEST extension")
+        screen = self.display.screen()
+        self.screen_w, self.screen_h = screen.width_in_pixels, screen.height_in_pixels
+        self._spares = None  # keycodes without keysyms, bound to characters missing from the keymap
+        self._bound = OrderedDict()  # keysym -> spare keycode, least recently typed first
+        self._pressed = {}  # spare keycode -> monotonic time of its last press
+        self._queue = deque()  # keysyms waiting for a spare keycode to go idle (typed via `after`)
+        self._timer = None
+
+    def _move(self, x, y):
+        self._xtest.fake_input(self.display, self._X.MotionNotify, x=x, y=y)
+
+    def _button(self, down):
+        self._xtest.fake_input(self.display, self._X.ButtonPress if down else self._X.ButtonRelease, 1)
+
+    def _keymap_code(self, keysym):
+        """(keycode, with shift) of a keysym on the keymap; (None, False) if it isn't there."""
+        for keycode, index in self.display.keysym_to_keycodes(keysym):
+            if index in (0, 1):
+                return keycode, index == 1
+        if self._spares is None:
+            first = self.display.display.info.min_keycode
+            mapping = self.display.get_keyboard_mapping(first, self.display.display.info.max_keycode - first + 1)
+            self._spares = [first + i for i, syms in enumerate(mapping) if not any(syms)]
+        return None, False
+
+    def _spare_wait(self, keysym):
+        """Seconds until `keysym` can be typed: the time the spare it would rebind must still idle."""
+        if self._keymap_code(keysym)[0] is not None or keysym in self._bound:
+            return 0.0
+        if len(self._bound) < len(self._spares) or not self._spares:
+            return 0.0
+        keycode = next(iter(self._bound.values()))
+        return max(0.0, self._pressed[keycode] + SPARE_IDLE_S - time.monotonic())
+
+    def _keycode(self, keysym):
+        """(keycode, with shift) of a keysym; one missing from the keymap is bound to a spare keycode.
+
+        Bindings rotate through all spare keycodes and stay until the spare is
+        needed again: a client decodes a press with the keysyms bound when it
+        reads the event, so the least recently typed spare is rebound, and only
+        once its last press is SPARE_IDLE_S old (like xdotool's delayed restore).
+        Callers with a scheduler wait for that through _spare_wait; others sleep here."""
+        keycode, shift = self._keymap_code(keysym)
+        if keycode is not None:
+            return keycode, shift
+        keycode = self._bound.get(keysym)
+        if keycode is not None:
+            self._bound.move_to_end(keysym)
+        elif len(self._bound) < len(self._spares):
+            keycode = self._spares[len(self._bound)]
+            self._bind(keycode, keysym)
+        elif self._spares:
+            _, keycode = self._bound.popitem(last=False)
+            self.display.sync()  # its last press has reached the server
+            idle = time.monotonic() - self._pressed[keycode]
+            if idle < SPARE_IDLE_S:
+                time.sleep(SPARE_IDLE_S - idle)
+            self._bind(keycode, keysym)
+        else:
+            return None, False
+        self._pressed[keycode] = time.monotonic()
+        return keycode, False
+
+    def _bind(self, keycode, keysym):
+        self.display.change_keyboard_mapping(keycode, [(keysym, keysym)])
+        self.display.sync()
+        self._bound[keysym] = keycode
+
+    def _key(self, char):
+        code = ord(char)
+        if char == BACKSPACE:
+            keysym = XK_BACKSPACE
+        elif char == "\n":
+            keysym = XK_RETURN
+        else:
+            keysym = code if code < 0x100 else 0x01000000 + code
+        if self.after is not None and (self._queue or self._spare_wait(keysym) > 0):
+            # keep the order: this and everything after it is typed once the spare is idle
+            self._queue.append(keysym)
+            if self._timer is None:
+                self._timer = self.after(int(self._spare_wait(self._queue[0]) * 1000) + 1, self._drain)
+            return True
+        return self._press(keysym)
+
+    def _drain(self):
+        """Type the queued keysyms up to the next one whose spare keycode is not idle yet."""
+        self._timer = None
+        while self._queue:
+            wait = self._spare_wait(self._queue[0])
+            if wait > 0:
+                self._timer = self.after(int(wait * 1000) + 1, self._drain)
+                break
+            if not self._press(self._queue.popleft()):
+                self.skipped += 1
+        self._flush()
+
+    def _press(self, keysym):
+        keycode, shift = self._keycode(keysym)
+        if keycode is None:
+            return False
+        X, fake_input = self._X, self._xtest.fake_input
+        if shift:
+            fake_input(self.display, X.KeyPress, self.display.keysym_to_keycode(XK_SHIFT_L))
+        fake_input(self.display, X.KeyPress, keycode)
+        fake_input(self.display, X.KeyRelease, keycode)
+        if shift:
+            fake_input(self.display, X.KeyRelease, self.display.keysym_to_keycode(XK_SHIFT_L))
+        return True
+
+    def _flush(self):
+        self.display.sync()
+
+    def close(self):
+        # called once the UI loop is gone: type what is still queued, blocking if need be
+        self.after = None
+        while self._queue:
+            if not self._press(self._queue.popleft()):
+                self.skipped += 1
+        if self._bound:
+            # leave the spare keycodes unbound again, once clients have read their last presses
+            self.display.sync()
+            idle = time.monotonic() - max(self._pressed.values())
+            if idle < SPARE_IDLE_S:
+                time.sleep(SPARE_IDLE_S - idle)
+            for keycode in self._bound.values():
+                self.display.change_keyboard_mapping(keycode, [(self._X.NoSymbol, self._X.NoSymbol)])
+        self.display.close()
+
+
+class UInputSink(ActionSink):
+    """Absolute pointer device on Linux uinput; any compositor or console picks it up."""
+
+    def __init__(self, screen_w, screen_h, name="text-mouse-input", history=1000):
+        try:
+            from evdev import AbsInfo, UInput, ecodes
+        except ImportError as exc:
+            raise RuntimeError("UInputSink needs python-evdev (pip install evdev)") from exc
+        super().__init__(history)
+        self._ec, self._uinput = ecodes, UInput
+        self.name = name
+        self.screen_w, self.screen_h = screen_w, screen_h
+        self.keyboard = None  # second device, created on the first typed character
+        capabilities = {
+            ecodes.EV_KEY: [ecodes.BTN_LEFT],
+            ecodes.EV_ABS: [(ecodes.ABS_X, AbsInfo(0, 0, screen_w - 1, 0, 0, 0)),
+                            (ecodes.ABS_Y, AbsInfo(0, 0, screen_h - 1, 0, 0, 0))],
+        }
+        self.device = UInput(capabilities, name=name)
+
+    def _move(self, x, y):
+        self.device.write(self._ec.EV_ABS, self._ec.ABS_X, x)
+        self.device.write(self._ec.EV_ABS, self._ec.ABS_Y, y)
+        self.device.syn()
+
+    def _button(self, down):
+        self.device.write(self._ec.EV_KEY, self._ec.BTN_LEFT, 1 if down else 0)
+        self.device.syn()
+
+    def _key(self, char):
+        key = US_KEYS.get(char)
+        if key is None:
+            return False
+        ec = self._ec
+        if self.keyboard is None:
+            codes = {ec.ecodes[name] for name, _ in US_KEYS.values()} | {ec.KEY_LEFTSHIFT}
+            self.keyboard = self._uinput({ec.EV_KEY: sorted(codes)}, name=self.name + " keyboard")
+        name, shift = key
+        presses = [ec.KEY_LEFTSHIFT, ec.ecodes[name]] if shift else [ec.ecodes[name]]
+        for code in presses:
+            self.keyboard.write(ec.EV_KEY, code, 1)
+        for code in reversed(presses):
+            self.keyboard.write(ec.EV_KEY, code, 0)
+        self.keyboard.syn()
+        return True
+
+    def close(self):
+        if self.keyboard is not None:
+            self.keyboard.close()
+        self.device.close()
+
+
+def open_sink(spec, screen_w=1920, screen_h=1080):
+    """Build a sink from a CLI spec: record | xtest[:DISPLAY] | uinput."""
+    kind, _, arg = spec.partition(":")
+    if kind == "record":
+        return RecordingSink()
+    if kind == "xtest":
+        return XTestSink(arg or None)
+    if kind == "uinput":
+        return UInputSink(screen_w, screen_h)
+    raise ValueError(f"unknown output: {spec!r}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Send one pointer action through an output backend.")
+    ap.add_argument("sink", help="record | xtest[:DISPLAY] | uinput")
+    ap.add_argument("x", type=int)
+    ap.add_argument("y", type=int)
+    ap.add_argument("--action", choices=ACTIONS, default=CLICK)
+    ap.add_argument("--type", metavar="TEXT", help="then type TEXT into the window under the pointer")
+    ap.add_argument("--screen", default="1920x1080", help="WxH, used by uinput")
+    args = ap.parse_args()
+    w, _, h = args.screen.lower().partition("x")
+    sink = open_sink(args.sink, int(w), int(h))
+    try:
+        t0 = time.perf_counter()
+        print(sink.perform(args.action, args.x, args.y, t0))
+        if args.action == DRAG:
+            print(sink.perform(DRAG, args.x, args.y, time.perf_counter()))
+        if args.type:
+            print(sink.type_text(args.type, time.perf_counter()))
+        if isinstance(sink, RecordingSink):
+            for event in sink.events:
+                print(event)
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Rendering benchmark: the app's draw paths at grid sizes from 20x20 to 500x500.
+
+For every grid size an EMGScanningApp is built around a ScanEngine of that
+size and walked through scripted selections (seeded random targets). Each
+draw path is timed per call and the canvas items it creates, reconfigures
+and deletes are counted. The timed walk is repeated (`--repeat`, same
+calls every time) and each call keeps its fastest time, since load only
+ever slows a repeat down; p50 and p95 are taken over those. A second walk with the
+same calls runs under tracemalloc for the Python memory each call
+allocates (peak) and keeps.
+
+    build           app and renderer construction (every cell item)
+    grid            draw_full_grid with the current region highlighted
+    preview         draw_partition_preview composed from scratch
+    preview_cached  the same prompt again from the kept frame
+    split           the split line sliding to its next position (all frames)
+    flash           the chosen half's flash (all frames)
+    cross           draw_full_grid with a cross
+    banner          draw_choice (in-canvas algorithm choice)
+    respond         a signal through the app until its next prompt is on screen,
+                    speculation off (the prompt is composed after the signal)
+    swap            the same with the next prompt staged while waiting (a swap)
+    stage           one idle-time slice of staging every answer's next prompt
+                    (the longest a signal can wait behind the staging)
+
+On real Tk (needs a display; run it under Xvfb) the times include Tk's
+redraw, since every draw path ends in update_idletasks. `--headless`
+uses the null canvas of headless.py: same item counts, Python time only.
+Results are JSON, so runs compare mechanically: `--baseline` checks a run
+against a stored one and exits 1 when a path got slower than
+`--tolerance` and the run-to-run noise (more than doubled, and by over
+twice the spread of the baseline's repeats), keeps more memory, or touches more
+canvas items. Paths with one call per walk (build) are not timed.
+
+    xvfb-run -a python render_bench.py --out bench/tk.json
+    python render_bench.py --headless --grids 20 100 --baseline bench/headless.json
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+import demo1
+from animation import Animator
+from scan_engine import CHOICE, SPLIT_PHASES, ScanEngine
+
+PATHS = ("build", "grid", "preview", "preview_cached", "split", "flash", "cross", "banner", "respond", "swap", "stage")
+COUNTERS = ("created", "configured", "deleted")
+MIN_DELTA_MS = 0.1  # slowdowns smaller than this are timer noise, whatever the ratio
+NOISE_FRACTION = 1.0  # p50s of the same tree differ by up to ~1.7x between runs (uneven calls, heap state)
+MIN_TIMED = 5  # paths with fewer calls per run are not timed against a baseline (build: one call)
+MIN_DELTA_KB = 1.0
+
+
+def counting_canvas(base):
+    """`base` (tkinter.Canvas) counting item creation / reconfiguration / deletion like headless.Canvas."""
+    class CountingCanvas(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.created = self.configured = self.deleted = 0
+
+        def _create(self, kind, args, kwargs):
+            self.created += 1
+            return getattr(super(), kind)(*args, **kwargs)
+
+        def create_rectangle(self, *args, **kwargs):
+            return self._create("create_rectangle", args, kwargs)
+
+        def create_line(self, *args, **kwargs):
+            return self._create("create_line", args, kwargs)
+
+        def create_oval(self, *args, **kwargs):
+            return self._create("create_oval", args, kwargs)
+
+        def create_text(self, *args, **kwargs):
+            return self._create("create_text", args, kwargs)
+
+        def itemconfig(self, item, cnf=None, **kwargs):
+            self.configured += 1
+            return super().itemconfig(item, cnf, **kwargs)
+
+        def addtag_withtag(self, newtag, tag_or_id):
+            self.configured += 1
+            return super().addtag_withtag(newtag, tag_or_id)
+
+        def coords(self, item, *args):
+            if args:
+                self.configured += 1
+            return super().coords(item, *args)
+
+        def delete(self, *items):
+            self.deleted += sum(len(self.find_withtag(item)) for item in items)
+            super().delete(*items)
+
+        def stats(self):
+            return {"created": self.created, "configured": self.configured, "deleted": self.deleted,
+                    "live": len(self.find_all())}
+
+    return CountingCanvas
+
+
+def tk_toolkit():
+    """tkinter with a counting canvas, to swap in as demo1.tk."""
+    import tkinter
+
+    toolkit = types.SimpleNamespace(**vars(tkinter))
+    toolkit.Canvas = counting_canvas(tkinter.Canvas)
+    return toolkit
+
+
+class ImmediateAnimator(Animator):
+    """Runs every keyframe at once, back to back, so an animation's whole cost lands in one call."""
+
+    def play(self, keyframes, on_done=None):
+        for _, apply in sorted(keyframes, key=lambda k: k[0]):
+            apply()
+        if on_done:
+            on_done()
+
+
+class Probe:
+    """Times (or, with memory=True, traces the allocations of) draw calls, per path."""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.canvas = None
+        self.samples = {path: [] for path in PATHS}
+
+    def run(self, path, draw):
+        """Call draw(); returns its result. The canvas is the app's (set once it exists)."""
+        before = self.canvas.stats() if self.canvas is not None else None
+        if self.memory:
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            result = draw()
+            now, peak = tracemalloc.get_traced_memory()
+            self.samples[path].append(((peak - start) / 1024, (now - start) / 1024))
+            return result
+        t0 = time.perf_counter()
+        result = draw()
+        elapsed = (time.perf_counter() - t0) * 1000
+        canvas = self.canvas if self.canvas is not None else result.canvas
+        after = canvas.stats()
+        self.samples[path].append((elapsed,) + tuple(after[k] - (before[k] if before else 0) for k in COUNTERS))
+        return result
+
+
+def _walk(probe, toolkit, cols, rows, selections, rng):
+    root = toolkit.Tk()
+    try:
+        app = probe.run("build", lambda: demo1.EMGScanningApp(root, engine=ScanEngine(cols, rows)))
+        probe.canvas = app.canvas
+        app.animator = ImmediateAnimator(root)
+        e = app.engine
+        for _ in range(selections):
+            e.reset()
+            target = rng.randrange(cols), rng.randrange(rows)
+            probe.run("grid", lambda: app.draw_full_grid(highlight_region=e.region))
+            while not e.done:
+                region = e.region
+                if e.phase in SPLIT_PHASES:
+                    parts, direction = e.halves, e.direction
+                    key = (e.tree, e.node) if e.node >= 0 else None
+                    probe.run("preview", lambda: app.draw_partition_preview(region, parts, direction))
+                    probe.run("split", app._animate_split_line)
+                    if key is not None:
+                        app.draw_partition_preview(region, parts, direction, key)
+                        probe.run("preview_cached", lambda: app.draw_partition_preview(region, parts, direction, key))
+                    s = next(i for i, part in enumerate(parts) if part.contains(*target))
+                    e.step(s)
+                    probe.run("flash", lambda: app.animator.play(app._flash_keyframes(parts[s], demo1.PART_COLORS[s])))
+                    probe.run("grid", lambda: app.draw_full_grid(highlight_region=e.region))
+                elif e.phase == CHOICE:
+                    probe.run("banner", lambda: app.draw_choice(region, "0 → Taramaya devam et  |  1 → Çapraz aramaya geç"))
+                    cross = (rng.randrange(region.c1, region.c2), rng.randrange(region.r1, region.r2))
+                    probe.run("cross", lambda: app.draw_full_grid(highlight_region=region, cross=cross))
+                    e.step(0)
+                else:
+                    e.step(0)
+    finally:
+        root.destroy()
+    probe.canvas = None
+
+
+def _walk_signals(probe, toolkit, cols, rows, selections, rng, speculate):
+    """Answer prompts through app.set_signal (animations off) with speculation on or off."""
+    root = toolkit.Tk()
+    settle = getattr(root, "run_pending", None) or root.update
+    try:
+        app = demo1.EMGScanningApp(root, engine=ScanEngine(cols, rows), anim_scale=0, start_ms=0)
+        app.speculate = speculate
+        speculate_slice = app._speculate
+        app._speculate = lambda work: probe.run("stage", lambda: speculate_slice(work))
+        app.repeat = True
+        probe.canvas = app.canvas
+        settle()
+        e = app.engine
+        for _ in range(selections):
+            target = rng.randrange(cols), rng.randrange(rows)
+            while not e.done:
+                s = next(i for i, part in enumerate(e.halves) if part.contains(*target)) if e.phase in SPLIT_PHASES else 0
+                if not speculate:
+                    probe.run("respond", lambda: app.set_signal(s))
+                elif s in app._staged:
+                    probe.run("swap", lambda: app.set_signal(s))
+                else:
+                    app.set_signal(s)
+                settle()
+            app.set_signal(0)  # next selection
+            settle()
+    finally:
+        root.destroy()
+    probe.canvas = None
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+def bench(cols, rows, toolkit, selections=5, seed=0, repeat=3):
+    """{path: {"n", "p50_ms", "p95_ms", "p50_spread_ms", "created", "configured", "deleted", "alloc_kb",
+    "retained_kb"}} for one grid. The timed walk runs `repeat` times (same seed, same calls); p50 / p95 are
+    taken over each call's fastest time and p50_spread_ms is how far the runs' own p50s lie apart."""
+    demo1.tk = toolkit
+    runs = []
+    for _ in range(repeat):
+        timed = Probe()
+        _walk(timed, toolkit, cols, rows, selections, random.Random(seed))
+        for speculate in (False, True):
+            _walk_signals(timed, toolkit, cols, rows, selections, random.Random(seed), speculate)
+        runs.append(timed)
+    traced = Probe(memory=True)
+    # collections would free earlier grids' cycles inside whichever call they land in: retained memory
+    # would then depend on the grids run before this one
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        _walk(traced, toolkit, cols, rows, selections, random.Random(seed))
+        for speculate in (False, True):
+            _walk_signals(traced, toolkit, cols, rows, selections, random.Random(seed), speculate)
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    out = {}
+    for path in PATHS:
+        samples, memory = runs[0].samples[path], traced.samples[path]
+        if not samples:
+            continue
+        n = len(samples)
+        times = [min(timed.samples[path][i][0] for timed in runs) for i in range(n)]
+        p50s = [_percentile([sample[0] for sample in timed.samples[path]], 50) for timed in runs]
+        stats = {"n": n, "p50_ms": _percentile(times, 50), "p95_ms": _percentile(times, 95),
+                 "p50_spread_ms": max(p50s) - min(p50s)}
+        for i, key in enumerate(COUNTERS, 1):
+            stats[key] = sum(sample[i] for sample in samples) / n
+        stats["alloc_kb"] = sum(m[0] for m in memory) / len(memory)
+        stats["retained_kb"] = sum(m[1] for m in memory) / len(memory)
+        out[path] = stats
+    return out
+
+
+def compare(run, baseline, tolerance):
+    """Regressions of `run` against `baseline` as readable lines (empty = none)."""
+    problems = []
+    for grid, paths in baseline["results"].items():
+        for path, base in paths.items():
+            cur = run["results"].get(grid, {}).get(path)
+            if cur is None:
+                continue
+            where = f"{grid} {path}"
+            # a slowdown must clear the tolerance and the run-to-run noise: NOISE_FRACTION of the p50 and twice
+            # the spread of the baseline's own repeats; single-call paths have no p50 worth comparing
+            noise = max(MIN_DELTA_MS, base["p50_ms"] * NOISE_FRACTION, 2 * base.get("p50_spread_ms", 0.0))
+            if (base["n"] >= MIN_TIMED and cur["p50_ms"] > base["p50_ms"] * (1 + tolerance)
+                    and cur["p50_ms"] - base["p50_ms"] > noise):
+                problems.append(f"{where}: p50 {base['p50_ms']:.3f} -> {cur['p50_ms']:.3f} ms")
+            for key in COUNTERS:
+                if cur[key] > base[key]:
+                    problems.append(f"{where}: {key} {base[key]:.1f} -> {cur[key]:.1f} items per call")
+            if cur["retained_kb"] > base["retained_kb"] + abs(base["retained_kb"]) * tolerance + MIN_DELTA_KB:
+                problems.append(f"{where}: retained {base['retained_kb']:.1f} -> {cur['retained_kb']:.1f} KB")
+    if run["meta"]["toolkit"] != baseline["meta"]["toolkit"]:
+        problems.insert(0, f"note: toolkit differs ({baseline['meta']['toolkit']} baseline, {run['meta']['toolkit']} now)")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time the app's draw paths across grid sizes.")
+    ap.add_argument("--grids", type=int, nargs="+", default=[20, 50, 100, 200, 500],
+                    help="grid sizes N (N x N cells)")
+    ap.add_argument("--selections", type=int, default=5, help="scripted selections per grid")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3, help="timed walks per grid (each call keeps its fastest time)")
+    ap.add_argument("--headless", action="store_true", help="null canvas instead of Tk (Python time only)")
+    ap.add_argument("--out", metavar="PATH", help="write the results as JSON")
+    ap.add_argument("--baseline", metavar="PATH", help="compare against a stored run; exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown / memory growth (fraction)")
+    args = ap.parse_args()
+    if args.repeat < 1:
+        ap.error("--repeat must be at least 1")
+
+    if args.headless:
+        import headless as toolkit
+    else:
+        toolkit = tk_toolkit()
+    run = {"meta": {"toolkit": "headless" if args.headless else f"tk {toolkit.TkVersion}",
+                    "python": platform.python_version(), "platform": platform.platform(),
+                    "selections": args.selections, "seed": args.seed,
+                    "repeat": args.repeat, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+           "results": {}}
+    print(f"{'grid':>9} {'path':>15} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'created':>9} {'config':>9}"
+          f" {'deleted':>8} {'alloc KB':>9} {'kept KB':>8}")
+    for n in args.grids:
+        grid = f"{n}x{n}"
+        results = run["results"][grid] = bench(n, n, toolkit, args.selections, args.seed, args.repeat)
+        for path, s in results.items():
+            print(f"{grid:>9} {path:>15} {s['n']:>5} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['created']:>9.1f}"
+                  f" {s['configured']:>9.1f} {s['deleted']:>8.1f} {s['alloc_kb']:>9.1f} {s['retained_kb']:>8.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(run, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(run, json.load(f), args.tolerance)
+        for line in problems:
+            print(line)
+        if any(not line.startswith("note:") for line in problems):
+            sys.exit(1)
+        print("no regressions against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Record / replay of scanning sessions.
+
+A recording is JSONL: a header with everything needed to rebuild the
+session (engine config, prior snapshot), then one line per input,
+[t, "signal", s], [t, "undo", count] or [t, "targets", layout] (a
+target-snapping layout update), and one per finished selection,
+[t, "select", col, row, point]; t is seconds since the session started. Recordings from before the in-canvas algorithm choice
+also hold [t, "choice", true|false|null] (the old modal's answer); it
+replays as the signal that answers the same prompt now, and a signal sent
+while the modal was open is held for the prompt after it, as it was then.
+
+A replay rebuilds the app on the headless toolkit (headless.py: null
+canvas, virtual clock) or on real Tk (e.g. under Xvfb with --tk), feeds
+the inputs back as fast as possible and checks that every selection
+comes out identical, so a change that alters outcomes fails loudly.
+Per-step timings come from telemetry.Telemetry.
+
+    python demo1.py --record session.jsonl
+    python replay.py sessions/*.jsonl --repeat 5
+"""
+import argparse
+import json
+import sys
+import time
+
+from scan_engine import CHOICE, FALLBACK
+from target_prior import TargetPrior
+from targets import Target
+from telemetry import Telemetry
+
+
+class SessionRecorder:
+    def __init__(self, path, config, prior=None):
+        self.file = open(path, "w")
+        self.t0 = time.perf_counter()
+        header = {"session": 1, "start": time.time(), "config": config,
+                  "prior": prior.to_dict() if prior is not None else None}
+        self.file.write(json.dumps(header) + "\n")
+        self.app = None
+
+    def attach(self, app):
+        self.app = app
+        app.input_listeners.append(self.input)
+        app.selection_listeners.append(self.selection)
+
+    def _write(self, line):
+        self.file.write(json.dumps([round(time.perf_counter() - self.t0, 4)] + line) + "\n")
+        self.file.flush()
+
+    def input(self, kind, value):
+        self._write([kind, value])
+
+    def selection(self, col, row):
+        point = getattr(self.app.engine, "point", None)
+        self._write(["select", col, row, list(point) if point else None])
+
+    def close(self):
+        self.file.close()
+
+
+def load_session(path):
+    """(header, inputs, selections) of a recording; inputs are (kind, value), selections [col, row, point]."""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        inputs, selections = [], []
+        for line in f:
+            if not line.strip():
+                continue
+            t, kind, *rest = json.loads(line)
+            if kind == "select":
+                selections.append(rest)
+            else:
+                inputs.append((kind, rest[0]))
+    return header, inputs, selections
+
+
+def replay(header, inputs, use_tk=False, telemetry=None):
+    """Run the inputs through a fresh app; returns the selections it made."""
+    import demo1
+
+    config = header["config"]
+    prior = TargetPrior.from_dict(header["prior"]) if header.get("prior") else None
+    if use_tk:
+        import tkinter as toolkit
+        root = toolkit.Tk()
+        settle = root.update
+    else:
+        import headless as toolkit
+        root = toolkit.Tk(*config["screen"])
+        settle = root.run_pending
+    demo1.tk = toolkit
+    app = demo1.make_app(root, config, prior, anim_scale=0, start_ms=0)
+    app.repeat = config.get("repeat", False)
+    app.telemetry = telemetry
+    selections = []
+
+    def selected(col, row):
+        point = getattr(app.engine, "point", None)
+        selections.append([col, row, list(point) if point else None])
+        if prior is not None and config.get("learn"):
+            prior.observe(col, row)
+    app.selection_listeners.append(selected)
+    settle()
+    legacy = any(kind == "choice" for kind, _ in inputs)
+    held = None  # legacy: signal that arrived while the choice modal was open
+    for kind, value in inputs:
+        if kind == "signal":
+            if legacy and app.engine.phase in (CHOICE, FALLBACK):
+                held = value
+            else:
+                app.set_signal(value)
+        elif kind == "undo":
+            app.undo(value)
+        elif kind == "targets":
+            app.update_targets([Target(*t) for t in value])
+        elif app.engine.phase not in (CHOICE, FALLBACK):
+            raise ValueError("recorded an algorithm choice but no choice is asked (the flow diverged)")
+        else:
+            # modal answers: True = continue scanning (0), False = cross / finalize (1), None = closed (0)
+            app.set_signal(1 if value is False else 0)
+            if held is not None:
+                settle()
+                app.set_signal(held)
+                held = None
+        settle()
+    app.animator.finish()
+    if use_tk:
+        root.destroy()
+    return selections
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay recorded scanning sessions and check their selections.")
+    ap.add_argument("session", nargs="+", help="recordings made with demo1.py --record")
+    ap.add_argument("--repeat", type=int, default=1, help="replay every session this many times")
+    ap.add_argument("--tk", action="store_true", help="replay on real Tk (needs a display, e.g. Xvfb)")
+    args = ap.parse_args()
+
+    telemetry = Telemetry()
+    failed = 0
+    t0 = time.perf_counter()
+    steps = 0
+    for path in args.session:
+        header, inputs, expected = load_session(path)
+        for _ in range(args.repeat):
+            try:
+                got = replay(header, inputs, args.tk, telemetry)
+            except ValueError as exc:
+                got = f"error: {exc}"
+            steps += len(inputs)
+            if got != expected:
+                failed += 1
+                print(f"MISMATCH {path}: recorded {expected}, replayed {got}")
+                break
+        else:
+            print(f"ok {path}: {len(inputs)} inputs, {len(expected)} selections")
+    wall = time.perf_counter() - t0
+    print(f"{steps} steps in {wall:.3f} s ({steps / wall if wall else 0:,.0f} steps/s)")
+    print(telemetry.summary())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,629 @@
+"""
+Headless selection engine for the EMG scanning demo (no tkinter).
+
+The scanning flows of EMGScanningApp as a step-driven state machine:
+
+- TOP:       top-level binary scanning, TOP_LEVEL_LIMIT splits
+- CHOICE:    0 = continue scanning (REFINE), 1 = cross precision (CROSS)
+- REFINE:    split while area > MIN_REGION_CELLS, CHOICE after every split
+- FINAL:     split the small region until one cell is left
+- CROSS:     diagonal cross i: 1 = target on the cross, 0 = next i
+- AXIS:      0 = search the cross row, 1 = search the cross column
+- AXIS_SCAN: walk the axis: 1 = found, 0 = next cell
+- CROSS_BAND: (cross_mode="log") crosses band_lo..band_mid-1 at once:
+             1 = target on one of them, 0 = on a later one. Binary search
+             for the diagonal index, then AXIS, then FINAL halves the chosen
+             row / column, so cross precision costs O(log n) signals.
+- FALLBACK:  diagonal exhausted: 0 = continue scanning, 1 = finalize
+- DONE:      `selection` holds the chosen (col, row)
+
+With `choice_cells` the CHOICE prompt is only shown for regions larger
+than that many cells; smaller regions keep scanning without asking, which
+saves one signal per refined split where cross precision can't pay off.
+
+`undo()` backs out of the last answer (a wrong half, a skipped cross, even
+the final selection): the engine keeps a bounded stack of its state
+before each step, so recovering from a misfire costs the undo signal and
+the repeated answer instead of a restart.
+
+QUERY is the split prompt of engines that don't narrow one grid region:
+a belief over all cells (bayes_engine.BayesEngine) or a set of UI targets
+(targets.TargetEngine).
+
+The engine only holds state; a front end (Tk app, simulator, server) reads
+`phase`, `region`, `halves`, `cross` to show the prompt and feeds each
+0/1 signal to `step`.
+
+With `arity` k > 2 (multi-channel input) every split prompt offers k
+parts instead of two halves, answered with signals 0..k-1: k stripes
+across the region (alternating horizontal / vertical like the binary
+split) or, with layout "quad", a 2x2 split. A selection then takes about
+log_k(cells) split signals; `halves` holds the parts in signal order.
+All other prompts stay 0/1. arity=2 is the binary flow unchanged.
+
+With midpoint splits the whole binary partition of a grid is fixed, so it
+is built once per grid size (PartitionTree) and every split prompt is a
+lookup; `node` is the tree node of the current region (-1 off the tree).
+"""
+import os
+from array import array
+from collections import deque
+from operator import attrgetter
+
+TOP_LEVEL_LIMIT = 3  # after 3 top-level selections prompt user
+MIN_REGION_CELLS = 4  # stop scanning when region area <= this (small enough)
+
+HORIZONTAL, VERTICAL = "horizontal", "vertical"
+QUAD = "quad"  # direction of a 2x2 split
+
+LAYOUT_STRIPES, LAYOUT_QUAD = "stripes", "quad"
+
+TOP = "top"
+CHOICE = "choice"
+REFINE = "refine"
+FINAL = "final"
+CROSS = "cross"
+AXIS = "axis"
+AXIS_SCAN = "axis_scan"
+FALLBACK = "fallback"
+DONE = "done"
+QUERY = "query"
+CROSS_BAND = "cross_band"
+
+CROSS_LINEAR, CROSS_LOG = "linear", "log"
+
+HISTORY_LIMIT = 64  # answers that can be undone
+
+SPLIT_PHASES = (TOP, REFINE, FINAL, QUERY)
+
+
+class Region:
+    __slots__ = ("c1", "r1", "c2", "r2")
+
+    def __init__(self, c1, r1, c2, r2):
+        # c1,r1 inclusive start indices; c2,r2 exclusive end indices
+        self.c1, self.r1 = c1, r1
+        self.c2, self.r2 = c2, r2
+
+    def __eq__(self, other):
+        return isinstance(other, Region) and (self.c1, self.r1, self.c2, self.r2) == (other.c1, other.r1, other.c2, other.r2)
+
+    def __hash__(self):
+        return hash((self.c1, self.r1, self.c2, self.r2))
+
+    def __repr__(self):
+        return f"Region({self.c1}, {self.r1}, {self.c2}, {self.r2})"
+
+    def width(self):
+        return self.c2 - self.c1
+
+    def height(self):
+        return self.r2 - self.r1
+
+    def area(self):
+        return max(0, self.width()) * max(0, self.height())
+
+    def subdivide(self, direction, at=None):
+        # direction = "horizontal" or "vertical"; `at` = cut row/column (default: midpoint)
+        if direction == HORIZONTAL:
+            mid = (self.r1 + self.r2) // 2 if at is None else at
+            top = Region(self.c1, self.r1, self.c2, mid)
+            bottom = Region(self.c1, mid, self.c2, self.r2)
+            return top, bottom
+        else:
+            mid = (self.c1 + self.c2) // 2 if at is None else at
+            left = Region(self.c1, self.r1, mid, self.r2)
+            right = Region(mid, self.r1, self.c2, self.r2)
+            return left, right
+
+    def stripes(self, direction, k):
+        """Up to k near-equal stripes (fewer when the region is thinner than k); k=2 is subdivide."""
+        if direction == HORIZONTAL:
+            lo, n = self.r1, self.height()
+        else:
+            lo, n = self.c1, self.width()
+        k = max(1, min(k, n))
+        cuts = [lo + i * n // k for i in range(k + 1)]
+        if direction == HORIZONTAL:
+            return tuple(Region(self.c1, cuts[i], self.c2, cuts[i + 1]) for i in range(k))
+        return tuple(Region(cuts[i], self.r1, cuts[i + 1], self.r2) for i in range(k))
+
+    def quadrants(self):
+        """Top-left, top-right, bottom-left, bottom-right quarters (region at least 2x2)."""
+        mc, mr = (self.c1 + self.c2) // 2, (self.r1 + self.r2) // 2
+        return (Region(self.c1, self.r1, mc, mr), Region(mc, self.r1, self.c2, mr),
+                Region(self.c1, mr, mc, self.r2), Region(mc, mr, self.c2, self.r2))
+
+    def contains(self, col, row):
+        return self.c1 <= col < self.c2 and self.r1 <= row < self.r2
+
+
+def parse_parts(spec):
+    """CLI spec of the split prompt: "2", "3", "4" (stripes) or "quad" -> (arity, layout)."""
+    if spec == LAYOUT_QUAD:
+        return 4, LAYOUT_QUAD
+    arity = int(spec)
+    if arity < 2:
+        raise ValueError(f"a split needs at least 2 parts, got {spec!r}")
+    return arity, LAYOUT_STRIPES
+
+
+# ---------------- partition tree ----------------
+class PartitionTree:
+    """Precomputed midpoint partition of a cols x rows grid, in flat arrays.
+
+    Node 0 is the whole grid; the children of node n are child[n] and
+    child[n] + 1 (first / second half), -1 for single cells and for nodes
+    beyond `max_nodes`, where the engine falls back to Region.subdivide.
+    A node at depth d is split like ScanEngine._prepare_split does with
+    direction_index d. Child regions are created on first use and reused.
+    """
+    __slots__ = ("cols", "rows", "max_nodes", "c1", "r1", "c2", "r2", "cut", "vertical", "child", "_halves")
+
+    MAX_NODES = 1 << 16  # ~30 bytes per node plus the regions handed out
+    cache_dir = None  # directory for on-disk trees (see shared)
+    _shared = {}
+    _VERSION = 1
+
+    def __init__(self, cols, rows, max_nodes=MAX_NODES, build=True):
+        self.cols, self.rows = cols, rows
+        self.max_nodes = max_nodes
+        self.c1, self.r1, self.c2, self.r2 = array("i"), array("i"), array("i"), array("i")
+        self.cut, self.child = array("i"), array("i")
+        self.vertical = bytearray()
+        if build:
+            self._build()
+        self._halves = [None] * len(self.c1)
+
+    def __len__(self):
+        return len(self.c1)
+
+    def _build(self):
+        c1s, r1s, c2s, r2s = self.c1, self.r1, self.c2, self.r2
+        cuts, vertical, child = self.cut, self.vertical, self.child
+        c1s.append(0), r1s.append(0), c2s.append(self.cols), r2s.append(self.rows)
+        depth = bytearray(1)  # depth parity, only needed while building
+        n = 0
+        while n < len(c1s):
+            c1, r1, c2, r2 = c1s[n], r1s[n], c2s[n], r2s[n]
+            if (c2 - c1) * (r2 - r1) <= 1 or len(c1s) + 2 > self.max_nodes:
+                cuts.append(-1), vertical.append(0), child.append(-1)
+                n += 1
+                continue
+            vert = depth[n] == 1
+            if not vert and r2 - r1 < 2:
+                vert = True
+            elif vert and c2 - c1 < 2:
+                vert = False
+            child.append(len(c1s))
+            vertical.append(vert)
+            parity = depth[n] ^ 1
+            if vert:
+                mid = (c1 + c2) // 2
+                c1s.extend((c1, mid)), r1s.extend((r1, r1)), c2s.extend((mid, c2)), r2s.extend((r2, r2))
+            else:
+                mid = (r1 + r2) // 2
+                c1s.extend((c1, c1)), r1s.extend((r1, mid)), c2s.extend((c2, c2)), r2s.extend((mid, r2))
+            cuts.append(mid)
+            depth.extend((parity, parity))
+            n += 1
+
+    def region(self, node):
+        return Region(self.c1[node], self.r1[node], self.c2[node], self.r2[node])
+
+    def direction(self, node):
+        return VERTICAL if self.vertical[node] else HORIZONTAL
+
+    def halves(self, node):
+        """(first, second) child regions of an inner node."""
+        halves = self._halves[node]
+        if halves is None:
+            first = self.child[node]
+            halves = self._halves[node] = (self.region(first), self.region(first + 1))
+        return halves
+
+    # ---------------- sharing / on-disk cache ----------------
+    @classmethod
+    def shared(cls, cols, rows, max_nodes=MAX_NODES):
+        """One tree per grid config per process, loaded from / saved to `cache_dir` when set."""
+        key = (cols, rows, max_nodes)
+        tree = cls._shared.get(key)
+        if tree is None:
+            path = None
+            if cls.cache_dir:
+                path = os.path.join(cls.cache_dir, f"scan-tree-{cols}x{rows}-{max_nodes}-v{cls._VERSION}.bin")
+                tree = cls.load(path, cols, rows, max_nodes)
+            if tree is None:
+                tree = cls(cols, rows, max_nodes)
+                if path:
+                    tree.save(path)
+            cls._shared[key] = tree
+        return tree
+
+    def _arrays(self):
+        return (self.c1, self.r1, self.c2, self.r2, self.cut, self.child)
+
+    def save(self, path):
+        header = array("i", (self._VERSION, self.cols, self.rows, self.max_nodes, len(self)))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            header.tofile(f)
+            for a in self._arrays():
+                a.tofile(f)
+            f.write(self.vertical)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, cols, rows, max_nodes=MAX_NODES):
+        """Tree stored at `path`, or None if it is missing or was built for another config."""
+        try:
+            with open(path, "rb") as f:
+                header = array("i")
+                header.fromfile(f, 5)
+                if tuple(header) != (cls._VERSION, cols, rows, max_nodes, header[4]):
+                    return None
+                n = header[4]
+                tree = cls(cols, rows, max_nodes, build=False)
+                for a in tree._arrays():
+                    a.fromfile(f, n)
+                tree.vertical = bytearray(f.read(n))
+        except (OSError, EOFError):
+            return None
+        if len(tree.vertical) != n:
+            return None
+        tree._halves = [None] * n
+        return tree
+
+
+# everything step() changes except `signals`; one tuple of these per history entry
+_STATE = ("phase", "region", "direction", "halves", "cross", "selection", "node",
+          "direction_index", "top_level_counter",
+          "diag_i", "diag_pos", "diag_axis", "diag_steps", "diag_safety",
+          "band_lo", "band_mid", "band_hi")
+_get_state = attrgetter(*_STATE)
+
+
+class ScanEngine:
+    __slots__ = ("cols", "rows", "top_level_limit", "min_region_cells", "splitter", "cross_mode", "tree",
+                 "choice_cells", "arity", "layout", "signals", "undos", "history") + _STATE
+
+    def __init__(self, cols, rows, top_level_limit=TOP_LEVEL_LIMIT, min_region_cells=MIN_REGION_CELLS,
+                 splitter=None, cross_mode=CROSS_LINEAR, choice_cells=0, arity=2, layout=LAYOUT_STRIPES):
+        self.cols, self.rows = cols, rows
+        self.top_level_limit = top_level_limit
+        self.min_region_cells = min_region_cells
+        # regions of at most this many cells skip the CHOICE prompt and keep scanning (0 = always ask)
+        self.choice_cells = choice_cells
+        # splitter(region, direction) -> (first, second); None = geometric midpoint
+        self.splitter = splitter
+        self.cross_mode = cross_mode
+        # parts per split prompt (signals 0..arity-1) and how they are laid out
+        if layout == LAYOUT_QUAD and arity != 4:
+            raise ValueError("a quad split has 4 parts")
+        if arity > 2 and splitter is not None:
+            raise ValueError("k-way splits are midpoint only")
+        self.arity, self.layout = arity, layout
+        # midpoint splits never change, so they come from the shared tree of this grid size
+        self.tree = PartitionTree.shared(cols, rows) if splitter is None and arity == 2 else None
+        self.reset()
+
+    def reset(self):
+        self.region = Region(0, 0, self.cols, self.rows)
+        self.node = 0 if self.tree is not None else -1
+        self.direction_index = 0  # alternate horizontal (0) then vertical (1) ...
+        self.top_level_counter = 0
+        self.signals = 0
+        self.direction = None
+        self.halves = None
+        self.cross = None
+        self.selection = None
+        self.diag_i = self.diag_pos = self.diag_steps = self.diag_safety = 0
+        self.diag_axis = None
+        self.band_lo = self.band_mid = self.band_hi = 0
+        self.undos = 0
+        self.history = deque(maxlen=HISTORY_LIMIT)
+        self._enter_top()
+
+    # ---------------- phase entry ----------------
+    def _prepare_split(self):
+        """Pick the split for the current prompt. A 1-cell-thick side can't be split, so use the other axis."""
+        node = self.node
+        if node >= 0:
+            tree = self.tree
+            if tree.child[node] >= 0:
+                self.direction = tree.direction(node)
+                self.halves = tree.halves(node)
+                return
+            self.node = -1  # beyond the tree's node budget
+        region = self.region
+        direction = HORIZONTAL if self.direction_index % 2 == 0 else VERTICAL
+        if direction == HORIZONTAL and region.height() < 2:
+            direction = VERTICAL
+        elif direction == VERTICAL and region.width() < 2:
+            direction = HORIZONTAL
+        if self.arity > 2:
+            if self.layout == LAYOUT_QUAD and region.width() >= 2 and region.height() >= 2:
+                self.direction = QUAD
+                self.halves = region.quadrants()
+            else:
+                self.direction = direction
+                self.halves = region.stripes(direction, self.arity)
+            return
+        self.direction = direction
+        if self.splitter is None:
+            self.halves = region.subdivide(direction)
+        else:
+            self.halves = self.splitter(region, direction)
+
+    def _enter_top(self):
+        if self.top_level_counter >= self.top_level_limit or self.region.area() <= 1:
+            self._enter_choice()
+            return
+        self.phase = TOP
+        self._prepare_split()
+
+    def _enter_choice(self):
+        # a single cell has nothing left to choose between
+        if self.region.area() <= max(1, self.choice_cells):
+            self._enter_refine()
+            return
+        self.phase = CHOICE
+
+    def _enter_refine(self):
+        if self.region.area() <= max(1, self.min_region_cells):
+            self._enter_final()
+            return
+        self.phase = REFINE
+        self._prepare_split()
+
+    def _enter_final(self):
+        if self.region.area() <= 1:
+            self._select(self.region.c1, self.region.r1)
+            return
+        self.phase = FINAL
+        self._prepare_split()
+
+    def _select(self, col, row):
+        self.phase = DONE
+        self.halves = None
+        self.cross = None
+        self.selection = (col, row)
+
+    def _enter_cross(self):
+        if self.cross_mode == CROSS_LOG:
+            self.band_lo, self.band_hi = 0, min(self.region.width(), self.region.height())
+            self._band_step()
+            return
+        self.diag_i = 0
+        self.diag_steps = 0
+        self.diag_safety = max(200, self.region.width() * self.region.height() * 6)
+        self._diagonal_step()
+
+    def _diagonal_step(self):
+        region = self.region
+        if self.diag_i >= min(region.width(), region.height()) or self.diag_steps > self.diag_safety:
+            self.phase = FALLBACK
+            self.cross = None
+            return
+        self.phase = CROSS
+        self.cross = (region.c1 + self.diag_i, region.r1 + self.diag_i)
+
+    def _band_step(self):
+        if self.band_hi - self.band_lo <= 1:
+            # diagonal index found: same axis question as the linear variant
+            self.diag_i = self.band_lo
+            self.phase = AXIS
+            self.cross = (self.region.c1 + self.diag_i, self.region.r1 + self.diag_i)
+            return
+        self.phase = CROSS_BAND
+        self.band_mid = (self.band_lo + self.band_hi) // 2
+        self.cross = None
+
+    def band_contains(self, col, row):
+        """True if (col, row) lies on one of the crosses band_lo..band_mid-1 (CROSS_BAND prompt)."""
+        i = min(col - self.region.c1, row - self.region.r1)
+        return self.band_lo <= i < self.band_mid and self.region.contains(col, row)
+
+    def _axis_scan_step(self):
+        region = self.region
+        end = region.height() if self.diag_axis == "column" else region.width()
+        if self.diag_pos >= end or self.diag_steps > self.diag_safety:
+            # axis exhausted -> continue next diagonal i
+            self.diag_i += 1
+            self._diagonal_step()
+            return
+        self.phase = AXIS_SCAN
+        if self.diag_axis == "column":
+            self.cross = (region.c1 + self.diag_i, region.r1 + self.diag_pos)
+        else:
+            self.cross = (region.c1 + self.diag_pos, region.r1 + self.diag_i)
+
+    # ---------------- signals ----------------
+    def step(self, s):
+        """Apply one 0/1 signal to the current prompt."""
+        phase = self.phase
+        if phase == DONE:
+            return phase  # nothing to answer
+        self.history.append(_get_state(self))
+        self.signals += 1
+        if phase == TOP or phase == REFINE or phase == FINAL:
+            self.region = self.halves[s]
+            self.direction_index += 1
+            if self.node >= 0:
+                self.node = self.tree.child[self.node] + (0 if s == 0 else 1)
+            if phase == TOP:
+                self.top_level_counter += 1
+                self._enter_top()
+            elif phase == REFINE:
+                # after each partition the user chooses again
+                self._enter_choice()
+            else:
+                self._enter_final()
+        elif phase == CHOICE:
+            if s == 0:
+                self._enter_refine()
+            else:
+                self._enter_cross()
+        elif phase == FALLBACK:
+            if s == 0:
+                self._enter_refine()
+            else:
+                # user insists on diagonal but it is exhausted: finalize
+                self._enter_final()
+        elif phase == CROSS:
+            if s == 0:
+                self.diag_steps += 1
+                self.diag_i += 1
+                self._diagonal_step()
+            else:
+                self.phase = AXIS
+        elif phase == CROSS_BAND:
+            if s == 1:
+                self.band_hi = self.band_mid
+            else:
+                self.band_lo = self.band_mid
+            self._band_step()
+        elif phase == AXIS:
+            self.diag_axis = "column" if s == 1 else "row"
+            self.diag_pos = self.diag_i  # local index relative to region start
+            if self.cross_mode == CROSS_LOG:
+                # halve the rest of the chosen row / column instead of walking it
+                c, r = self.cross
+                region = self.region
+                if self.diag_axis == "column":
+                    self.region = Region(c, r, c + 1, region.r2)
+                else:
+                    self.region = Region(c, r, region.c2, r + 1)
+                self.node = -1  # not a node of the partition tree
+                self.cross = None
+                self._enter_final()
+            else:
+                self._axis_scan_step()
+        elif phase == AXIS_SCAN:
+            if s == 1:
+                self._select(*self.cross)
+            else:
+                self.diag_pos += 1
+                self.diag_steps += 1
+                self._axis_scan_step()
+        return self.phase
+
+    def clone(self):
+        """Copy of the current prompt state to step ahead (speculative rendering); no undo history."""
+        other = ScanEngine.__new__(ScanEngine)
+        for name in ScanEngine.__slots__:
+            setattr(other, name, getattr(self, name))
+        other.history = deque(maxlen=HISTORY_LIMIT)
+        return other
+
+    def undo(self):
+        """Back out of the last answer; the undo gesture counts as a signal. False if there is no history."""
+        if not self.history:
+            return False
+        for name, value in zip(_STATE, self.history.pop()):
+            setattr(self, name, value)
+        self.signals += 1
+        self.undos += 1
+        return True
+
+    @property
+    def done(self):
+        return self.phase == DONE
+
+
+class MultiResEngine:
+    """Zoomable multi-level grid down to real screen pixels.
+
+    Level 0 lays a grid of at most max_cols x max_rows cells over the whole
+    screen. When the inner engine selects a cell, that cell's pixel
+    rectangle becomes the next level's view and is re-gridded, until the
+    selected cell is a single pixel (`point`). Only the current level
+    exists (one inner engine, cols x rows cells), so memory and per-frame
+    work are the same for any screen size.
+
+    Everything about the current prompt (phase, region, halves, cross,
+    selection, ...) is delegated to the inner engine, so front ends drive
+    it like a plain ScanEngine. `make_engine(cols, rows)` builds the inner
+    engine of each level.
+    """
+
+    def __init__(self, screen_w, screen_h, make_engine, max_cols=20, max_rows=20):
+        self.screen_w, self.screen_h = screen_w, screen_h
+        self.make_engine = make_engine
+        self.max_cols, self.max_rows = max_cols, max_rows
+        self.reset()
+
+    def __getattr__(self, name):
+        # only reached for attributes not set on the wrapper: the current prompt
+        inner = self.__dict__.get("inner")
+        if inner is None:
+            raise AttributeError(name)
+        return getattr(inner, name)
+
+    def reset(self):
+        self.level = 0
+        self.point = None
+        self._signals_before = self._undos_before = 0  # spent outside the current level
+        self._levels = []  # (view, inner) of the levels above, for undo
+        self._enter_level(0, 0, self.screen_w, self.screen_h)
+
+    def _enter_level(self, x, y, w, h):
+        self.view = (x, y, w, h)
+        self.inner = self.make_engine(min(self.max_cols, w), min(self.max_rows, h))
+
+    @property
+    def signals(self):
+        return self._signals_before + self.inner.signals
+
+    @property
+    def undos(self):
+        return self._undos_before + self.inner.undos
+
+    @property
+    def done(self):
+        return self.point is not None
+
+    def cell_rect(self, col, row):
+        """Screen pixel rect (x1, y1, x2, y2) of a cell of the current level."""
+        x, y, w, h = self.view
+        cols, rows = self.inner.cols, self.inner.rows
+        return (x + col * w // cols, y + row * h // rows,
+                x + (col + 1) * w // cols, y + (row + 1) * h // rows)
+
+    def cell_of(self, px, py):
+        """Cell of the current level that contains screen pixel (px, py)."""
+        x, y, w, h = self.view
+        return ((px - x + 1) * self.inner.cols - 1) // w, ((py - y + 1) * self.inner.rows - 1) // h
+
+    def step(self, s):
+        inner = self.inner
+        phase = inner.step(s)
+        if phase != DONE:
+            return phase
+        x1, y1, x2, y2 = self.cell_rect(*inner.selection)
+        if x2 - x1 <= 1 and y2 - y1 <= 1:
+            self.point = (x1, y1)
+            return phase
+        # zoom into the chosen cell
+        self._levels.append((self.view, inner))
+        self._signals_before += inner.signals
+        self._undos_before += inner.undos
+        self.level += 1
+        self._enter_level(x1, y1, x2 - x1, y2 - y1)
+        return self.inner.phase
+
+    def undo(self):
+        """Undo within the level; at the start of a level, go back up and reopen the cell choice."""
+        self.point = None
+        if self.inner.undo():
+            return True
+        if not self._levels:
+            return False
+        # leave the level; what was spent in it still counts, the undo signal goes to the parent
+        abandoned = self.inner
+        self.view, self.inner = self._levels.pop()
+        # the parent's own counts are live again (it did not step while zoomed in)
+        self._signals_before += abandoned.signals - self.inner.signals
+        self._undos_before += abandoned.undos - self.inner.undos
+        self.level -= 1
+        return self.inner.undo()
@@ -0,0 +1,475 @@
+"""
+Multi-session selection server (asyncio, no tkinter).
+
+Hosts many scanning sessions in one process so stations only draw: a
+client opens a session, sends its signals and gets every prompt back as
+an update (region, parts of the split preview, cross, final selection /
+pixel) to render. Sessions are plain engines (scan_engine, bayes_engine,
+targets) behind a small slotted record; grid sessions of one size share
+their PartitionTree, so a session costs a few KB and one process holds
+thousands.
+
+Protocol: one JSON object per line, over TCP (tcp:HOST:PORT) or a Unix
+socket (unix:PATH).
+
+    {"op": "open", "config": {...}}    new session; the connection gets its updates
+    {"op": "attach", "session": N}     also get the updates of session N (e.g. the
+                                       renderer while the EMG device sends signals)
+    {"op": "signal", "s": 0}           one answer (0..k-1 for k-way splits)
+    {"op": "undo"} | {"op": "reset"} | {"op": "close"}
+    {"op": "stats"}
+
+"session" defaults to the last session the connection opened or
+attached; an "id" on a request is echoed on its reply. A request that
+fails gets {"op": "error", "error": ...} and the connection stays open. Every change of a
+session is sent to all its connections as
+
+    {"op": "update", "session": N, "phase": ..., "region": [c1, r1, c2, r2],
+     "parts": [[c1, r1, c2, r2], ...] | null, "direction": ..., "cross": [c, r] | null,
+     "selection": [c, r] | null, "signals": n, "undos": n}
+
+plus "level", "view" and "point" for zoom sessions and "point" for target
+sessions. Config keys: cols, rows (default 20x20), mode (scan | bayes),
+cross, choice_cells, parts, error_rate, confidence, zoom with screen
+[w, h], targets (a list of [id, x1, y1, x2, y2, name]). A session no
+connection follows is dropped after IDLE_TIMEOUT_S.
+
+    python server.py serve tcp:127.0.0.1:7300
+    python server.py bench --sessions 1000 --signals 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+from scan_engine import (
+    CROSS_LINEAR, DONE, FINAL, MIN_REGION_CELLS, QUERY, REFINE, TOP, TOP_LEVEL_LIMIT, MultiResEngine, ScanEngine,
+    parse_parts,
+)
+
+IDLE_TIMEOUT_S = 60.0  # sessions without a connection live this long
+MAX_BUFFERED = 1 << 20  # a follower with more unsent bytes than this is dropped
+MAX_LINE = 1 << 22  # longest request line (target layouts can be large)
+
+
+# ---------------- sessions ----------------
+def build_engine(config):
+    """Engine for a session config (see the module docstring for the keys)."""
+    if config.get("targets") is not None:
+        from targets import Target, TargetEngine, TargetIndex
+
+        return TargetEngine(TargetIndex([Target(*t) for t in config["targets"]]))
+    cols, rows = int(config.get("cols", 20)), int(config.get("rows", 20))
+    if cols < 1 or rows < 1:
+        raise ValueError("a grid needs at least one cell")
+    if config.get("mode", "scan") == "bayes":
+        from bayes_engine import BayesEngine  # needs numpy
+
+        error_rate, confidence = float(config.get("error_rate", 0.05)), float(config.get("confidence", 0.95))
+        if not 0 < error_rate < 0.5:
+            raise ValueError("error_rate must be in (0, 0.5)")
+
+        def make_engine(cols, rows):
+            return BayesEngine(cols, rows, error_rate, confidence)
+    else:
+        arity, layout = parse_parts(str(config.get("parts", "2")))
+
+        def make_engine(cols, rows):
+            return ScanEngine(cols, rows, TOP_LEVEL_LIMIT, MIN_REGION_CELLS, None,
+                              config.get("cross", CROSS_LINEAR), int(config.get("choice_cells", 0)), arity, layout)
+    if config.get("zoom"):
+        screen_w, screen_h = (int(side) for side in config["screen"])
+        if screen_w < 1 or screen_h < 1:
+            raise ValueError("a screen needs at least one pixel")
+        return MultiResEngine(screen_w, screen_h, make_engine, cols, rows)
+    return make_engine(cols, rows)
+
+
+def _box(region):
+    return [region.c1, region.r1, region.c2, region.r2]
+
+
+def snapshot(engine):
+    """The current prompt of an engine as an update message body."""
+    halves, cross, selection = engine.halves, engine.cross, engine.selection
+    msg = {
+        "phase": engine.phase,
+        "region": _box(engine.region),
+        "parts": [_box(part) for part in halves] if halves is not None else None,
+        "direction": engine.direction,
+        "cross": list(cross) if cross is not None else None,
+        "selection": list(selection) if selection is not None else None,
+        "signals": engine.signals,
+        "undos": engine.undos,
+    }
+    if isinstance(engine, MultiResEngine):
+        msg["level"] = engine.level
+        msg["view"] = list(engine.view)
+    point = getattr(engine, "point", None)
+    if point is not None or "level" in msg:
+        msg["point"] = list(point) if point is not None else None
+    return msg
+
+
+class Session:
+    __slots__ = ("id", "engine", "followers", "idle_since")
+
+    def __init__(self, session_id, engine):
+        self.id = session_id
+        self.engine = engine
+        self.followers = set()  # connections that get the updates
+        self.idle_since = None  # monotonic time the last follower left
+
+    def update(self):
+        msg = snapshot(self.engine)
+        msg["op"] = "update"
+        msg["session"] = self.id
+        return msg
+
+
+class Connection:
+    __slots__ = ("writer", "session", "sessions")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.session = None  # default target of requests without "session"
+        self.sessions = set()  # sessions this connection follows
+
+    def send(self, msg):
+        self.writer.write(json.dumps(msg, separators=(",", ":")).encode() + b"\n")
+
+
+# ---------------- server ----------------
+class SelectionServer:
+    """All sessions of one process. `handle` is the whole protocol; `serve` puts it on a socket."""
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT_S):
+        self.sessions = {}
+        self.idle_timeout = idle_timeout
+        self._ids = itertools.count(1)
+        self.connections = 0
+        self.signals = 0
+
+    def _session(self, conn, msg):
+        session_id = msg.get("session", conn.session)
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"no session {session_id}")
+        return session
+
+    def _follow(self, conn, session):
+        session.followers.add(conn)
+        session.idle_since = None
+        conn.sessions.add(session)
+        conn.session = session.id
+
+    def _unfollow(self, conn, session):
+        session.followers.discard(conn)
+        conn.sessions.discard(session)
+        if not session.followers:
+            session.idle_since = time.monotonic()
+
+    def handle(self, conn, msg):
+        """Apply one request; returns (reply, session whose followers get the update or None)."""
+        op = msg.get("op")
+        if op == "open":
+            session = Session(next(self._ids), build_engine(msg.get("config") or {}))
+            reply = session.update()  # a session that can't describe its prompt is never registered
+            self.sessions[session.id] = session
+            self._follow(conn, session)
+            return reply, None
+        if op == "stats":
+            return self.stats(), None
+        session = self._session(conn, msg)
+        if op == "signal":
+            s, halves = int(msg["s"]), session.engine.halves
+            if not 0 <= s < (len(halves) if halves is not None else 2):
+                raise ValueError(f"signal {s} does not answer a {session.engine.phase} prompt")
+            session.engine.step(s)
+            self.signals += 1
+        elif op == "undo":
+            session.engine.undo()
+        elif op == "reset":
+            session.engine.reset()
+        elif op == "attach":
+            self._follow(conn, session)
+            return session.update(), None
+        elif op == "close":
+            for follower in list(session.followers):
+                self._unfollow(follower, session)
+            del self.sessions[session.id]
+            return {"op": "closed", "session": session.id}, None
+        else:
+            raise ValueError(f"unknown op {op!r}")
+        return session.update(), session
+
+    def stats(self):
+        try:
+            import resource
+            max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:  # not on Windows
+            max_rss_kb = None
+        return {"op": "stats", "sessions": len(self.sessions), "connections": self.connections,
+                "signals": self.signals, "max_rss_kb": max_rss_kb}
+
+    def sweep(self):
+        """Drop sessions nobody has followed for idle_timeout seconds."""
+        limit = time.monotonic() - self.idle_timeout
+        for session_id in [s.id for s in self.sessions.values() if s.idle_since is not None and s.idle_since < limit]:
+            del self.sessions[session_id]
+
+    async def _client(self, reader, writer):
+        conn = Connection(writer)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):  # line over MAX_LINE, peer reset
+                    break
+                if not line:
+                    break
+                msg = {}
+                try:
+                    msg = json.loads(line)
+                    if not isinstance(msg, dict):
+                        raise ValueError("a request is a JSON object")
+                    reply, session = self.handle(conn, msg)
+                except (ValueError, KeyError, TypeError) as exc:
+                    reply, session = {"op": "error", "error": str(exc)}, None
+                    msg = msg if isinstance(msg, dict) else {}
+                except Exception as exc:  # an engine failure fails its request, not the whole connection
+                    reply, session = {"op": "error", "error": f"{type(exc).__name__}: {exc}"}, None
+                if "id" in msg:
+                    reply["id"] = msg["id"]
+                conn.send(reply)
+                if session is not None:
+                    # the other followers (a renderer next to the device that sent the signal)
+                    reply.pop("id", None)
+                    for follower in list(session.followers):
+                        if follower is conn:
+                            continue
+                        if follower.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                            self._unfollow(follower, session)
+                            follower.writer.close()
+                        else:
+                            follower.send(reply)
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    break
+        finally:
+            self.connections -= 1
+            for session in list(conn.sessions):
+                self._unfollow(conn, session)
+            writer.close()
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 10.0))
+            self.sweep()
+
+    async def serve(self, address, ready=None):
+        """Serve on `address` (tcp:HOST:PORT | unix:PATH) until cancelled; `ready(address)` gets the bound address."""
+        kind, _, arg = address.partition(":")
+        if kind == "unix":
+            if os.path.exists(arg):
+                os.unlink(arg)
+            server = await asyncio.start_unix_server(self._client, arg, limit=MAX_LINE)
+        elif kind == "tcp":
+            host, _, port = arg.rpartition(":")
+            server = await asyncio.start_server(self._client, host or "127.0.0.1", int(port), limit=MAX_LINE)
+            host, port = server.sockets[0].getsockname()[:2]
+            address = f"tcp:{host}:{port}"
+        else:
+            raise ValueError(f"unknown address: {address!r}")
+        sweeper = asyncio.create_task(self._sweeper())
+        if ready is not None:
+            ready(address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+
+async def connect(address):
+    kind, _, arg = address.partition(":")
+    if kind == "unix":
+        return await asyncio.open_unix_connection(arg, limit=MAX_LINE)
+    if kind == "tcp":
+        host, _, port = arg.rpartition(":")
+        return await asyncio.open_connection(host or "127.0.0.1", int(port), limit=MAX_LINE)
+    raise ValueError(f"unknown address: {address!r}")
+
+
+# ---------------- load generator ----------------
+class _Client:
+    """One connection carrying requests of many sessions; replies are matched by "id"."""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.pending = {}
+        self._ids = itertools.count()
+        self._task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while line := await self.reader.readline():
+            msg = json.loads(line)
+            future = self.pending.pop(msg.get("id"), None)
+            if future is not None:
+                future.set_result(msg)
+        for future in self.pending.values():
+            future.set_exception(ConnectionError("server closed the connection"))
+
+    async def request(self, msg):
+        msg["id"] = request_id = next(self._ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(json.dumps(msg, separators=(",", ":")).encode() + b"\n")
+        reply = await future
+        if reply["op"] == "error":
+            raise RuntimeError(reply["error"])
+        return reply
+
+    async def close(self):
+        self._task.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def _answer(update, col, row):
+    """What a user aiming at (col, row) answers: the part holding it; 0 (keep scanning) otherwise."""
+    if update["phase"] in (TOP, REFINE, FINAL, QUERY):
+        for s, (c1, r1, c2, r2) in enumerate(update["parts"]):
+            if c1 <= col < c2 and r1 <= row < r2:
+                return s
+    return 0
+
+
+async def _drive(client, config, signals, think_s, rng, latencies, counts):
+    """One simulated station: selects random cells until it has sent `signals` signals (grid sessions)."""
+    cols, rows = config.get("cols", 20), config.get("rows", 20)
+    if think_s:
+        await asyncio.sleep(rng.random() * think_s)  # don't start in lockstep
+    update = await client.request({"op": "open", "config": config})
+    session_id = update["session"]
+    target = rng.randrange(cols), rng.randrange(rows)
+    for _ in range(signals):
+        s = _answer(update, *target)
+        t0 = time.perf_counter()
+        update = await client.request({"op": "signal", "session": session_id, "s": s})
+        latencies.append(time.perf_counter() - t0)
+        if update["phase"] == DONE:
+            counts["selections"] += 1
+            counts["wrong"] += tuple(update["selection"]) != target
+            update = await client.request({"op": "reset", "session": session_id})
+            target = rng.randrange(cols), rng.randrange(rows)
+        if think_s:
+            await asyncio.sleep(rng.expovariate(1 / think_s))
+    await client.request({"op": "close", "session": session_id})
+
+
+async def run_load(address, sessions, signals, connections, think_s, config, seed=0):
+    """Drive `sessions` concurrent sessions over `connections` connections; returns the results dict."""
+    rng = random.Random(seed)
+    clients = [_Client(*await connect(address)) for _ in range(max(1, min(connections, sessions)))]
+    before = await clients[0].request({"op": "stats"})
+    latencies, counts = [], {"selections": 0, "wrong": 0}
+    peak = {}
+
+    async def watch():
+        # server memory with every session open
+        while True:
+            await asyncio.sleep(0.2)
+            stats = await clients[0].request({"op": "stats"})
+            if stats["sessions"] >= peak.get("sessions", 0):
+                peak.update(stats)
+
+    watcher = asyncio.create_task(watch())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        _drive(clients[i % len(clients)], config, signals, think_s, random.Random(rng.random()), latencies, counts)
+        for i in range(sessions)))
+    wall = time.perf_counter() - t0
+    watcher.cancel()
+    after = await clients[0].request({"op": "stats"})
+    for client in clients:
+        await client.close()
+    latencies.sort()
+    n = len(latencies)
+
+    def pct(p):
+        return latencies[min(n - 1, int(p / 100.0 * n))] * 1000
+
+    peak_rss = max(peak.get("max_rss_kb") or 0, after["max_rss_kb"] or 0)
+    return {
+        "sessions": sessions, "connections": len(clients), "signals": n, "wall_s": wall,
+        "signals_per_s": n / wall if wall else 0.0,
+        "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99), "max_ms": latencies[-1] * 1000,
+        "selections": counts["selections"], "wrong": counts["wrong"],
+        "peak_sessions": peak.get("sessions", 0),
+        "rss_growth_kb": peak_rss - before["max_rss_kb"] if before["max_rss_kb"] is not None else None,
+    }
+
+
+async def _bench(args):
+    config = json.loads(args.config) if args.config else {}
+    server = None
+    address = args.connect
+    if address is None:
+        # the server in its own process, so client and server don't share one event loop
+        server = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "serve", "tcp:127.0.0.1:0", stdout=asyncio.subprocess.PIPE)
+        address = (await server.stdout.readline()).decode().split()[-1]
+    try:
+        for sessions in args.sessions:
+            r = await run_load(address, sessions, args.signals, args.connections, args.think_ms / 1000, config)
+            growth = (f" | server +{r['rss_growth_kb'] / max(1, r['peak_sessions']):.1f} KB/session"
+                      f" ({r['peak_sessions']} open)" if r["rss_growth_kb"] is not None and r["peak_sessions"] else "")
+            print(f"{r['sessions']} sessions / {r['connections']} conns: {r['signals']} signals in {r['wall_s']:.2f} s"
+                  f" ({r['signals_per_s']:,.0f}/s) | latency p50 {r['p50_ms']:.2f} p95 {r['p95_ms']:.2f}"
+                  f" p99 {r['p99_ms']:.2f} max {r['max_ms']:.2f} ms | {r['selections']} selections,"
+                  f" {r['wrong']} wrong{growth}")
+    finally:
+        if server is not None:
+            server.terminate()
+            await server.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Multi-session selection server.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="serve sessions on a socket")
+    p.add_argument("address", nargs="?", default="tcp:127.0.0.1:7300", help="tcp:HOST:PORT | unix:PATH")
+    p.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT_S,
+                   help="drop sessions without a connection after this many seconds")
+    p = sub.add_parser("bench", help="load generator: per-signal latency with many concurrent sessions")
+    p.add_argument("--connect", metavar="ADDRESS", help="running server (default: start one in a subprocess)")
+    p.add_argument("--sessions", type=int, nargs="+", default=[100, 1000])
+    p.add_argument("--signals", type=int, default=50, help="signals per session")
+    p.add_argument("--connections", type=int, default=256, help="connections the sessions are spread over")
+    p.add_argument("--think-ms", type=float, default=0.0,
+                   help="mean pause between a session's signals (0 = as fast as the server answers)")
+    p.add_argument("--config", metavar="JSON", help='session config, e.g. \'{"parts": "4", "choice_cells": 16}\'')
+    args = ap.parse_args()
+
+    if args.command == "bench":
+        config = json.loads(args.config) if args.config else {}
+        if config.get("targets") is not None or config.get("zoom"):
+            # the simulated stations aim at grid cells
+            ap.error("bench drives grid sessions only: no targets or zoom in --config")
+        asyncio.run(_bench(args))
+        return
+    server = SelectionServer(args.idle_timeout)
+    try:
+        asyncio.run(server.serve(args.address, ready=lambda address: print(f"listening on {address}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
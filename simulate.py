@@ -0,0 +1,447 @@
+"""
+Monte Carlo simulator for the scanning strategies in scan_engine.
+
+A simulated user aims at a random target cell, answers every prompt the
+way a correct user would and misfires with probability `error_rate`. Each
+signal costs a reaction time (log-normal) plus the UI pause after splits.
+For every configuration we report signals per selection, error rate
+(selected cell != target) and selection time distribution. With undo the
+user notices a misfire (the flash shows the wrong half) and sends the
+undo gesture at the next prompt; recovery cost is the extra signals per
+misfire compared to an error-free run for the same target.
+
+    python simulate.py --grid 20x20 --grid 40x40 --top-level-limit 2 3 4 \
+        --min-region-cells 1 4 -n 200000
+    python simulate.py --prior hotspots --split midpoint weighted
+    python simulate.py --worst-case --cross linear log --grid 8x8 --grid 20x20 --grid 64x64
+    python simulate.py --zoom 20 --grid 1920x1080 --cross linear log
+    python simulate.py --error-rate 0.05 --undo off on --cross log
+    python simulate.py --parts 2 3 4 quad --grid 64x64
+    python simulate.py --targets random:1000 random:5000 layout.json --error-rate 0 0.05 --undo on
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from scan_engine import (
+    AXIS, AXIS_SCAN, CHOICE, CROSS, CROSS_BAND, CROSS_LINEAR, DONE, FALLBACK, FINAL, MIN_REGION_CELLS, QUERY, REFINE, SPLIT_PHASES,
+    TOP, TOP_LEVEL_LIMIT, MultiResEngine, ScanEngine, parse_parts,
+)
+from target_prior import TargetPrior, WeightedSplitter
+
+MAX_SIGNALS = 1000  # a selection that needs more is abandoned (counted as an error)
+
+# UI time spent after a signal in each phase (flash + pause in demo1), seconds
+UI_DELAY = {TOP: 0.32, REFINE: 0.24, FINAL: 0.08, QUERY: 0.24}
+
+
+class SimulatedUser:
+    """Answers prompts for a fixed target; `choice` is the algorithm picked at CHOICE prompts.
+
+    With `undo`, a misfire is noticed and `wants_undo` is set until the front end sends the undo."""
+
+    def __init__(self, rng, error_rate=0.0, choice="continue", reaction_median=0.8, reaction_sigma=0.35,
+                 undo=False):
+        self.rng = rng
+        self.error_rate = error_rate
+        self.choice = 0 if choice == "continue" else 1
+        self.undo = undo
+        self.wants_undo = False
+        self.misfires = 0
+        self.mu = math.log(reaction_median)
+        self.sigma = reaction_sigma
+
+    def intended(self, engine, col, row):
+        """The signal a perfect user would send for target (col, row)."""
+        phase = engine.phase
+        if phase in SPLIT_PHASES:
+            parts = engine.halves
+            for s, part in enumerate(parts):
+                if part.contains(col, row):
+                    return s
+            # target already lost after a mistake
+            return self.rng.getrandbits(1) if len(parts) == 2 else self.rng.randrange(len(parts))
+        if phase == CHOICE:
+            return self.choice
+        if phase == FALLBACK:
+            return 0
+        if phase == CROSS_BAND:
+            return 1 if engine.band_contains(col, row) else 0
+        cc, cr = engine.cross
+        if phase == CROSS:
+            return 1 if (cc == col or cr == row) else 0
+        if phase == AXIS:
+            return 1 if cc == col else 0
+        if phase == AXIS_SCAN:
+            return 1 if (cc == col and cr == row) else 0
+        raise ValueError(f"no answer for phase {phase!r}")
+
+    def answer(self, engine, col, row):
+        s = self.intended(engine, col, row)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            k = len(engine.halves) if engine.phase in SPLIT_PHASES else 2
+            # a misfire is one of the other k - 1 symbols
+            s = 1 - s if k == 2 else (s + 1 + self.rng.randrange(k - 1)) % k
+            self.misfires += 1
+            self.wants_undo = self.undo
+        return s
+
+    def reaction_time(self):
+        return self.rng.lognormvariate(self.mu, self.sigma)
+
+
+def run_selection(engine, user, col, row):
+    """Run one selection; returns (signals, correct, seconds)."""
+    engine.reset()
+    elapsed = 0.0
+    while (engine.phase != DONE or user.wants_undo) and engine.signals < MAX_SIGNALS:
+        phase = engine.phase
+        if user.wants_undo:
+            user.wants_undo = False
+            engine.undo()
+        else:
+            engine.step(user.answer(engine, col, row))
+        elapsed += user.reaction_time() + UI_DELAY.get(phase, 0.0)
+    return engine.signals, engine.selection == (col, row), elapsed
+
+
+def run_zoom_selection(engine, user, px, py):
+    """run_selection for a MultiResEngine and a target screen pixel; the target cell moves with the level."""
+    engine.reset()
+    elapsed = 0.0
+    while (not engine.done or user.wants_undo) and engine.signals < MAX_SIGNALS:
+        phase = engine.phase
+        if user.wants_undo:
+            user.wants_undo = False
+            engine.undo()
+        else:
+            col, row = engine.cell_of(px, py)
+            engine.step(user.answer(engine, col, row))
+        elapsed += user.reaction_time() + UI_DELAY.get(phase, 0.0)
+    return engine.signals, engine.point == (px, py), elapsed
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))]
+
+
+def load_prior(spec, cols, rows):
+    """Prior from a CLI spec: None (uniform), "hotspots[:N]" (synthetic) or a heatmap path."""
+    if not spec:
+        return None
+    if spec.startswith("hotspots"):
+        _, _, spots = spec.partition(":")
+        return TargetPrior.hotspots(cols, rows, int(spots or 3))
+    prior = TargetPrior.load(spec)
+    if (prior.cols, prior.rows) != (cols, rows):
+        raise ValueError(f"prior {spec} is {prior.cols}x{prior.rows}, grid is {cols}x{rows}")
+    return prior
+
+
+def _simulate_chunk(args):
+    (cols, rows, top_level_limit, min_region_cells, n, error_rate, choice, split, prior_spec, mode, cross, zoom, undo,
+     choice_cells, parts, seed) = args
+    rng = random.Random(seed)
+    prior = load_prior(prior_spec, cols, rows)
+    if mode == "bayes":
+        from bayes_engine import BayesEngine  # needs numpy
+
+        def make_engine(c, r):
+            # the engine assumes at least a small misfire rate, otherwise one error is unrecoverable
+            return BayesEngine(c, r, max(error_rate, 0.01), prior=prior)
+    else:
+        splitter = WeightedSplitter(prior or TargetPrior(cols, rows)) if split == "weighted" else None
+
+        def make_engine(c, r):
+            return ScanEngine(c, r, top_level_limit, min_region_cells, splitter, cross, choice_cells,
+                              *parse_parts(parts))
+    if zoom:
+        # cols x rows is the screen in pixels, selected through levels of at most zoom x zoom cells
+        engine = MultiResEngine(cols, rows, make_engine, zoom, zoom)
+        clean_engine = MultiResEngine(cols, rows, make_engine, zoom, zoom)
+        select = run_zoom_selection
+    else:
+        engine = make_engine(cols, rows)
+        clean_engine = make_engine(cols, rows)
+        select = run_selection
+    user = SimulatedUser(rng, error_rate, choice, undo=undo)
+    # same target, no misfires: the baseline for the recovery cost
+    clean_user = SimulatedUser(random.Random(seed), 0.0, choice)
+    signals, times, errors = [], [], 0
+    extra = undos = 0
+    randrange = rng.randrange
+    for _ in range(n):
+        if prior is None:
+            col, row = randrange(cols), randrange(rows)
+        else:
+            col, row = prior.sample(rng)
+        count, correct, seconds = select(engine, user, col, row)
+        signals.append(count)
+        times.append(seconds)
+        errors += not correct
+        undos += engine.undos
+        if error_rate:
+            extra += count - select(clean_engine, clean_user, col, row)[0]
+    return signals, times, errors, user.misfires, extra, undos
+
+
+def simulate(cols, rows, top_level_limit=TOP_LEVEL_LIMIT, min_region_cells=MIN_REGION_CELLS, n=100000,
+             error_rate=0.0, choice="continue", seed=0, workers=1, split="midpoint", prior=None, mode="scan",
+             cross=CROSS_LINEAR, zoom=0, undo=False, choice_cells=0, parts="2"):
+    """Simulate n selections of one configuration and return a summary dict.
+
+    `prior` (see load_prior) is the target distribution; `split` is "midpoint" or "weighted"
+    (cut at the prior-balanced point); `mode` is "scan" (ScanEngine) or "bayes" (BayesEngine);
+    `cross` is the cross-precision variant ("linear" walk or "log" binary search); with `zoom` > 0
+    cols x rows is a screen in pixels selected through a MultiResEngine of zoom x zoom levels; with
+    `undo` the simulated user backs out of every misfire with the undo gesture; `choice_cells` skips
+    the scan / cross question for regions of at most that many cells; `parts` is the split prompt
+    ("2" binary, "3" / "4" stripes, "quad" 2x2, see scan_engine.parse_parts)."""
+    chunks = max(1, workers)
+    sizes = [n // chunks + (1 if i < n % chunks else 0) for i in range(chunks)]
+    jobs = [(cols, rows, top_level_limit, min_region_cells, size, error_rate, choice, split, prior, mode,
+             cross, zoom, undo, choice_cells, parts, seed * 1000003 + i)
+            for i, size in enumerate(sizes) if size]
+    t0 = time.perf_counter()
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.map(_simulate_chunk, jobs)
+    else:
+        results = [_simulate_chunk(job) for job in jobs]
+    wall = time.perf_counter() - t0
+
+    signals = sorted(itertools.chain.from_iterable(r[0] for r in results))
+    times = sorted(itertools.chain.from_iterable(r[1] for r in results))
+    errors = sum(r[2] for r in results)
+    misfires = sum(r[3] for r in results)
+    extra = sum(r[4] for r in results)
+    undos = sum(r[5] for r in results)
+    return {
+        "grid": f"{cols}x{rows}",
+        "zoom": zoom,
+        "undo": undo,
+        "choice_cells": choice_cells,
+        "parts": parts,
+        "mode": mode,
+        "top_level_limit": top_level_limit,
+        "min_region_cells": min_region_cells,
+        "choice": choice,
+        "cross": cross,
+        "split": split,
+        "prior": prior or "uniform",
+        "error_rate_in": error_rate,
+        "n": n,
+        "signals_mean": sum(signals) / n,
+        "signals_p50": _percentile(signals, 50),
+        "signals_p95": _percentile(signals, 95),
+        "signals_max": signals[-1],
+        "error_rate": errors / n,
+        "undos_mean": undos / n,
+        # extra signals per misfire over an error-free run on the same target
+        "recovery_cost": extra / misfires if misfires else None,
+        "time_mean_s": sum(times) / n,
+        "time_p50_s": _percentile(times, 50),
+        "time_p95_s": _percentile(times, 95),
+        "selections_per_min": n / wall * 60 if wall else float("inf"),
+    }
+
+
+class TargetUser(SimulatedUser):
+    """SimulatedUser aiming at one target of a targets.TargetEngine. Targets may overlap, so the
+    user answers by target id rather than by position."""
+
+    def intended(self, engine, target_id, _row=None):
+        s = engine.side_of(target_id)
+        return self.rng.getrandbits(1) if s is None else s  # lost after a mistake
+
+
+def run_target_selection(engine, user, target_id):
+    """run_selection over targets; returns (signals, correct, seconds)."""
+    engine.reset()
+    elapsed = 0.0
+    while (not engine.done or user.wants_undo) and engine.signals < MAX_SIGNALS:
+        phase = engine.phase
+        if user.wants_undo:
+            user.wants_undo = False
+            engine.undo()
+        else:
+            engine.step(user.answer(engine, target_id, None))
+        elapsed += user.reaction_time() + UI_DELAY.get(phase, 0.0)
+    return engine.signals, engine.target is not None and engine.target.id == target_id, elapsed
+
+
+def simulate_targets(spec, n=10000, error_rate=0.0, seed=0, undo=False):
+    """Selections of uniformly drawn targets of a layout (JSON path or random:N) by target snapping."""
+    from targets import TargetEngine, TargetIndex, load_targets, random_layout
+
+    rng = random.Random(seed)
+    if spec.startswith("random:"):
+        layout = random_layout(int(spec.split(":", 1)[1]), rng=random.Random(seed))
+    else:
+        layout = load_targets(spec)
+    t0 = time.perf_counter()
+    engine = TargetEngine(TargetIndex(layout))
+    build = time.perf_counter() - t0
+    user = TargetUser(rng, error_rate, undo=undo)
+    ids = [t.id for t in layout]
+    signals, times, errors = [], [], 0
+    t0 = time.perf_counter()
+    for _ in range(n):
+        count, correct, seconds = run_target_selection(engine, user, rng.choice(ids))
+        signals.append(count)
+        times.append(seconds)
+        errors += not correct
+    wall = time.perf_counter() - t0
+    signals.sort()
+    times.sort()
+    return {
+        "targets": spec,
+        "n_targets": len(layout),
+        "log2_targets": math.log2(len(layout)),
+        "error_rate_in": error_rate,
+        "undo": undo,
+        "n": n,
+        "build_ms": build * 1000,
+        "signals_mean": sum(signals) / n,
+        "signals_p50": _percentile(signals, 50),
+        "signals_p95": _percentile(signals, 95),
+        "signals_max": signals[-1],
+        "error_rate": errors / n,
+        "time_p50_s": _percentile(times, 50),
+        "time_p95_s": _percentile(times, 95),
+        "selections_per_min": n / wall * 60 if wall else float("inf"),
+    }
+
+
+def worst_case(cols, rows, top_level_limit=TOP_LEVEL_LIMIT, min_region_cells=MIN_REGION_CELLS,
+               cross=CROSS_LINEAR):
+    """Most signals an error-free user needs for any target when picking cross precision.
+
+    Returns (worst, bound): bound is the guarantee of the cross variant, top-level
+    splits + choice + diagonal + axis + row / column, where the log variant
+    binary-searches the diagonal and the row / column (ceil(log2) each, O(log n))
+    and the linear one walks them a cell per signal.
+    """
+    engine = ScanEngine(cols, rows, top_level_limit, min_region_cells, cross_mode=cross)
+    user = SimulatedUser(random.Random(0), choice="diagonal")
+    worst = 0
+    for col in range(cols):
+        for row in range(rows):
+            count, correct, _ = run_selection(engine, user, col, row)
+            if not correct:
+                raise AssertionError(f"{cols}x{rows} {cross}: target ({col}, {row}) selected {engine.selection}")
+            worst = max(worst, count)
+    # the second half of a midpoint split is never smaller, so always answering 1 gives the
+    # largest region the top-level phase can leave
+    engine.reset()
+    top = 0
+    while engine.phase == TOP:
+        engine.step(1)
+        top += 1
+    w, h = engine.region.width(), engine.region.height()
+    if cross == CROSS_LINEAR:
+        return worst, top + 1 + min(w, h) + 1 + max(w, h)
+    bound = top + 1 + math.ceil(math.log2(max(1, min(w, h)))) + 1 + math.ceil(math.log2(max(w, h)))
+    return worst, bound
+
+
+def parse_grid(text):
+    cols, _, rows = text.lower().partition("x")
+    return int(cols), int(rows or cols)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Monte Carlo simulation of the scanning strategies.")
+    ap.add_argument("--grid", action="append", type=parse_grid, help="COLSxROWS (repeatable, default 20x20)")
+    ap.add_argument("--top-level-limit", type=int, nargs="+", default=[TOP_LEVEL_LIMIT])
+    ap.add_argument("--min-region-cells", type=int, nargs="+", default=[MIN_REGION_CELLS])
+    ap.add_argument("--choice", nargs="+", default=["continue"], choices=["continue", "diagonal"],
+                    help="algorithm the simulated user picks at every choice prompt")
+    ap.add_argument("--choice-cells", type=int, nargs="+", default=[0], metavar="N",
+                    help="skip the choice prompt for regions of at most N cells (0 = always ask)")
+    ap.add_argument("--parts", nargs="+", default=["2"], choices=["2", "3", "4", "quad"],
+                    help="parts per split prompt: 2 (binary), 3 / 4 stripes or a 2x2 quad split (k-channel input)")
+    ap.add_argument("--split", nargs="+", default=["midpoint"], choices=["midpoint", "weighted"],
+                    help="midpoint halves or prior-balanced cuts (compare both on the same targets)")
+    ap.add_argument("--mode", nargs="+", default=["scan"], choices=["scan", "bayes"],
+                    help="scan: ScanEngine flows; bayes: noise-tolerant BayesEngine")
+    ap.add_argument("--cross", nargs="+", default=[CROSS_LINEAR], choices=["linear", "log"],
+                    help="cross-precision variant: linear diagonal/axis walk or log binary search")
+    ap.add_argument("--worst-case", action="store_true",
+                    help="enumerate every target with an error-free user picking cross precision, report the "
+                         "worst-case signal count per grid and fail if it exceeds the variant's bound")
+    ap.add_argument("--zoom", type=int, default=0, metavar="CELLS",
+                    help="treat each --grid as a screen in pixels and zoom through levels of at most "
+                         "CELLSxCELLS cells down to one pixel (multi-resolution grid)")
+    ap.add_argument("--targets", nargs="+", metavar="SPEC",
+                    help="target snapping instead of grids: layout JSON files or random:N layouts")
+    ap.add_argument("--prior", help="target distribution: heatmap .json/.npy or hotspots[:N] (default uniform)")
+    ap.add_argument("--error-rate", type=float, nargs="+", default=[0.0], help="per-signal misfire probability")
+    ap.add_argument("--undo", nargs="+", default=["off"], choices=["off", "on"],
+                    help="the simulated user undoes every misfire at the next prompt (compare both)")
+    ap.add_argument("-n", type=int, default=100000, help="selections per configuration")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--json", metavar="PATH", help="also write the results as JSON lines")
+    args = ap.parse_args()
+
+    if args.targets:
+        header = (f"{'targets':>16} {'n':>6} {'log2':>5} {'err_in':>6} {'undo':>4} | {'sig_mean':>8} {'p50':>4} "
+                  f"{'p95':>4} {'max':>5} | {'err':>6} | {'build_ms':>8} | {'sel/min':>10}")
+        print(header)
+        print("-" * len(header))
+        for spec, err, undo in itertools.product(args.targets, args.error_rate, args.undo):
+            r = simulate_targets(spec, args.n, err, args.seed, undo == "on")
+            print(f"{spec[-16:]:>16} {r['n_targets']:>6} {r['log2_targets']:>5.1f} {err:>6.3f} {undo:>4} | "
+                  f"{r['signals_mean']:>8.2f} {r['signals_p50']:>4} {r['signals_p95']:>4} {r['signals_max']:>5} | "
+                  f"{r['error_rate']:>6.3f} | {r['build_ms']:>8.1f} | {r['selections_per_min']:>10,.0f}")
+        return
+
+    grids = args.grid or [(20, 20)]
+    if args.zoom and (args.prior or "weighted" in args.split or args.worst_case):
+        ap.error("--zoom works with uniform targets and midpoint splits only")
+    if args.parts != ["2"] and ("weighted" in args.split or "bayes" in args.mode):
+        ap.error("--parts other than 2 needs --split midpoint and --mode scan")
+    if args.worst_case:
+        failed = False
+        print(f"{'grid':>9} {'cross':>6} {'TLL':>3} {'MRC':>3} | {'worst':>5} {'bound':>5}")
+        for (cols, rows), cross, tll, mrc in itertools.product(grids, args.cross, args.top_level_limit,
+                                                                args.min_region_cells):
+            worst, bound = worst_case(cols, rows, tll, mrc, cross)
+            flag = ""
+            if worst > bound:
+                flag, failed = "  EXCEEDS BOUND", True
+            print(f"{cols:>4}x{rows:<4} {cross:>6} {tll:>3} {mrc:>3} | {worst:>5} {bound:>5}{flag}")
+        raise SystemExit(1 if failed else 0)
+
+    header = (f"{'grid':>9} {'mode':>5} {'cross':>6} {'TLL':>3} {'MRC':>3} {'choice':>8} {'ask>':>4} {'parts':>5} {'split':>8} {'err_in':>6} | {'sig_mean':>8} {'p50':>4} "
+              f"{'p95':>4} {'max':>5} | {'err':>6} {'undo':>4} {'rec':>5} | {'t_p50':>6} {'t_p95':>6} | {'sel/min':>10}")
+    print(header)
+    print("-" * len(header))
+    out = open(args.json, "w") if args.json else None
+    try:
+        for (cols, rows), mode, cross, tll, mrc, choice, cc, parts, split, err, undo in itertools.product(
+                grids, args.mode, args.cross, args.top_level_limit, args.min_region_cells, args.choice,
+                args.choice_cells, args.parts, args.split, args.error_rate, args.undo):
+            r = simulate(cols, rows, tll, mrc, args.n, err, choice, args.seed, args.workers, split, args.prior,
+                         mode, cross, args.zoom, undo == "on", cc, parts)
+            rec = f"{r['recovery_cost']:>5.2f}" if r["recovery_cost"] is not None else f"{'-':>5}"
+            print(f"{r['grid']:>9} {mode:>5} {cross:>6} {tll:>3} {mrc:>3} {choice:>8} {cc:>4} {parts:>5} {split:>8} {err:>6.3f} | {r['signals_mean']:>8.2f} "
+                  f"{r['signals_p50']:>4} {r['signals_p95']:>4} {r['signals_max']:>5} | {r['error_rate']:>6.3f} {undo:>4} {rec} | "
+                  f"{r['time_p50_s']:>6.2f} {r['time_p95_s']:>6.2f} | {r['selections_per_min']:>10,.0f}")
+            if out:
+                out.write(json.dumps(r) + "\n")
+    finally:
+        if out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
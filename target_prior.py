@@ -0,0 +1,156 @@
+"""
+Target prior over grid cells with a summed-area table.
+
+`TargetPrior` holds a per-cell weight (how often users aim there), loaded
+from disk or learned from past selections. Region mass comes from a 2D
+prefix sum, so every candidate split costs O(1) and the balanced split of
+a region is a binary search over its rows / columns.
+
+`WeightedSplitter` plugs into ScanEngine: instead of the geometric
+midpoint it cuts each region where the prior mass of the two halves is as
+equal as possible (the Huffman / arithmetic-coding idea), which lowers the
+expected number of signals on skewed target distributions.
+"""
+import bisect
+import json
+import math
+import random
+
+from scan_engine import HORIZONTAL
+
+
+class TargetPrior:
+    def __init__(self, cols, rows, weights=None, smoothing=1.0):
+        """`weights[r][c]` (row-major, like an image); missing -> uniform. `smoothing` is added to
+        every cell so no cell ever becomes unreachable or free."""
+        self.cols, self.rows = cols, rows
+        self.smoothing = smoothing
+        if weights is None:
+            self.counts = [0.0] * (cols * rows)
+        else:
+            if len(weights) != rows or any(len(line) != cols for line in weights):
+                raise ValueError(f"prior weights must be {rows} rows x {cols} columns")
+            self.counts = [float(w) for line in weights for w in line]
+        self._rebuild()
+
+    # ---------------- persistence ----------------
+    @classmethod
+    def load(cls, path, smoothing=1.0):
+        """Load a heatmap from .json ({"cols", "rows", "weights"}) or .npy (rows x cols, needs numpy)."""
+        if path.endswith(".npy"):
+            import numpy as np
+            data = np.load(path)
+            return cls(data.shape[1], data.shape[0], data.tolist(), smoothing)
+        with open(path) as f:
+            return cls.from_dict(json.load(f), smoothing)
+
+    @classmethod
+    def from_dict(cls, doc, smoothing=1.0):
+        return cls(doc["cols"], doc["rows"], doc["weights"], doc.get("smoothing", smoothing))
+
+    def to_dict(self):
+        weights = [self.counts[r * self.cols:(r + 1) * self.cols] for r in range(self.rows)]
+        return {"cols": self.cols, "rows": self.rows, "smoothing": self.smoothing, "weights": weights}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def hotspots(cls, cols, rows, spots=3, spread=0.06, seed=0, smoothing=1.0):
+        """Synthetic skewed heatmap: a few Gaussian hot spots (for simulations)."""
+        rng = random.Random(seed)
+        centres = [(rng.uniform(0, cols), rng.uniform(0, rows), rng.uniform(0.5, 1.0)) for _ in range(spots)]
+        sx, sy = max(1.0, spread * cols), max(1.0, spread * rows)
+        weights = [[sum(1000.0 * h * math.exp(-((c + 0.5 - x) / sx) ** 2 - ((r + 0.5 - y) / sy) ** 2)
+                        for x, y, h in centres) for c in range(cols)] for r in range(rows)]
+        return cls(cols, rows, weights, smoothing)
+
+    # ---------------- learning ----------------
+    def observe(self, col, row, weight=1.0):
+        """Record a past selection. The summed-area table is rebuilt lazily on the next query."""
+        self.counts[row * self.cols + col] += weight
+        self._dirty = True
+
+    def reweight(self, counts):
+        """Replace every cell weight (flat, row-major), e.g. with next-key probabilities."""
+        if len(counts) != self.cols * self.rows:
+            raise ValueError(f"prior weights must be {self.cols * self.rows} cells")
+        self.counts = list(counts)
+        self._dirty = True
+
+    # ---------------- queries ----------------
+    def _rebuild(self):
+        cols, rows, smoothing = self.cols, self.rows, self.smoothing
+        stride = cols + 1
+        sat = [0.0] * (stride * (rows + 1))
+        counts = self.counts
+        for r in range(rows):
+            run = 0.0
+            base, above = (r + 1) * stride, r * stride
+            for c in range(cols):
+                run += counts[r * cols + c] + smoothing
+                sat[base + c + 1] = sat[above + c + 1] + run
+        self.sat = sat
+        self.total = sat[-1]
+        self._cdf = None
+        self._dirty = False
+
+    def mass(self, c1, r1, c2, r2):
+        """Prior mass of the cell span [c1,c2) x [r1,r2), O(1)."""
+        if self._dirty:
+            self._rebuild()
+        sat, stride = self.sat, self.cols + 1
+        return sat[r2 * stride + c2] - sat[r1 * stride + c2] - sat[r2 * stride + c1] + sat[r1 * stride + c1]
+
+    def region_mass(self, region):
+        return self.mass(region.c1, region.r1, region.c2, region.r2)
+
+    def balanced_cut(self, region, horizontal):
+        """Row (horizontal) or column index that splits `region` into two non-empty halves of
+        the most equal mass; binary search over the monotone prefix mass."""
+        c1, r1, c2, r2 = region.c1, region.r1, region.c2, region.r2
+        lo, hi = (r1, r2) if horizontal else (c1, c2)
+        if hi - lo < 2:
+            return (lo + hi) // 2
+        if horizontal:
+            first = lambda k: self.mass(c1, r1, c2, k)
+        else:
+            first = lambda k: self.mass(c1, r1, k, r2)
+        half = self.mass(c1, r1, c2, r2) / 2.0
+        # smallest cut k in [lo+1, hi-1] with first(k) >= half
+        a, b = lo + 1, hi - 1
+        while a < b:
+            m = (a + b) // 2
+            if first(m) >= half:
+                b = m
+            else:
+                a = m + 1
+        if a > lo + 1 and half - first(a - 1) < first(a) - half:
+            return a - 1
+        return a
+
+    def sample(self, rng):
+        """Draw a (col, row) target in proportion to the prior."""
+        if self._dirty:
+            self._rebuild()
+        if self._cdf is None:
+            run, cdf = 0.0, []
+            for w in self.counts:
+                run += w + self.smoothing
+                cdf.append(run)
+            self._cdf = cdf
+        i = bisect.bisect_right(self._cdf, rng.random() * self._cdf[-1])
+        i = min(i, len(self._cdf) - 1)
+        return i % self.cols, i // self.cols
+
+
+class WeightedSplitter:
+    """ScanEngine splitter that cuts each region at the prior-balanced point."""
+
+    def __init__(self, prior):
+        self.prior = prior
+
+    def __call__(self, region, direction):
+        horizontal = direction == HORIZONTAL
+        return region.subdivide(direction, self.prior.balanced_cut(region, horizontal))
@@ -0,0 +1,475 @@
+"""
+Target snapping: scan over UI elements instead of grid cells.
+
+Users mostly want a button, link or text field, not an arbitrary cell.
+Given the rectangles of those targets (a window layout or an
+accessibility-tree dump, see load_targets), TargetIndex keeps them in a
+k-d tree over their centers: every internal node splits its targets into
+two halves at the median of the wider axis, and every leaf is one target.
+A split prompt is one node, its two children are the halves, so a
+selection takes ~log2(#targets) signals however the targets are spread.
+
+Screens change, so the index is updated in place: `insert` descends to a
+leaf and splits it, `remove` empties a leaf and fixes counts and boxes up
+the path, and a subtree that gets lopsided (one child above ALPHA of its
+targets) or mostly empty is rebuilt from its live targets, scapegoat-tree
+style. `update(targets)` applies a whole new layout as a diff by target id.
+
+TargetEngine drives a selection over the index with the same prompt
+protocol as scan_engine.ScanEngine (phase, region, halves, direction,
+selection, step, undo, ...); the split prompt is QUERY, `region` and
+`halves` are the pixel bounding boxes of the candidates, and `target` /
+`point` hold the chosen target and its center. A selection in progress
+survives layout updates as long as its node was not rebuilt away.
+
+    python targets.py bench -n 5000 --updates 200
+    python targets.py bench layout.json
+"""
+import argparse
+import json
+import random
+import time
+from collections import deque
+
+from scan_engine import DONE, HISTORY_LIMIT, HORIZONTAL, QUERY, VERTICAL, Region
+
+ALPHA = 0.75  # a child holding more than this share of a node's targets triggers a rebuild
+MIN_REBUILD = 8  # smaller subtrees are never rebuilt for balance
+# accessibility roles that are targets even when they have children
+ACTIONABLE_ROLES = {"button", "push button", "toggle button", "check box", "radio button", "link", "entry", "text",
+                    "combo box", "menu item", "tab", "list item", "slider", "spin button", "password text"}
+
+
+class Target:
+    __slots__ = ("id", "x1", "y1", "x2", "y2", "name")
+
+    def __init__(self, id, x1, y1, x2, y2, name=""):
+        self.id = id
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+        self.name = name
+
+    @property
+    def center(self):
+        return (self.x1 + self.x2) // 2, (self.y1 + self.y2) // 2
+
+    def rect(self):
+        return self.x1, self.y1, self.x2, self.y2
+
+    def to_list(self):
+        return [self.id, self.x1, self.y1, self.x2, self.y2, self.name]
+
+    def __repr__(self):
+        return f"Target({self.id!r}, {self.x1}, {self.y1}, {self.x2}, {self.y2}, {self.name!r})"
+
+
+def _element_rect(element):
+    if "bounds" in element:
+        return tuple(element["bounds"])
+    x, y = element["x"], element["y"]
+    return x, y, x + element["w"], y + element["h"]
+
+
+def targets_from_json(data):
+    """Targets from a flat list of elements or an accessibility tree (nested "children").
+
+    Elements carry "bounds": [x1, y1, x2, y2] or x, y, w, h, and optionally "id", "name" and
+    "role". In a tree, elements with an actionable role are targets (their children are
+    not) and so are leaves. Without an "id" the element's path in the tree ("0/3/1") is
+    used, which stays the same across dumps of an unchanged layout."""
+    targets = []
+    roots = data if isinstance(data, list) else [data]
+    stack = [(str(i), element) for i, element in reversed(list(enumerate(roots)))]
+    while stack:
+        path, element = stack.pop()
+        children = element.get("children") or ()
+        actionable = element.get("role", "").lower() in ACTIONABLE_ROLES
+        if ("bounds" in element or "x" in element) and (actionable or not children):
+            x1, y1, x2, y2 = (int(v) for v in _element_rect(element))
+            if x2 > x1 and y2 > y1:
+                targets.append(Target(element.get("id", path), x1, y1, x2, y2, element.get("name", "")))
+            if actionable:
+                continue
+        stack.extend((f"{path}/{i}", child) for i, child in reversed(list(enumerate(children))))
+    return targets
+
+
+def load_targets(path):
+    with open(path) as f:
+        return targets_from_json(json.load(f))
+
+
+def random_layout(n, screen_w=1920, screen_h=1080, rng=None):
+    """n button-sized rectangles at random positions (benchmarks, simulation)."""
+    rng = rng or random.Random(0)
+    targets = []
+    for i in range(n):
+        w, h = rng.randint(16, 200), rng.randint(16, 40)
+        x, y = rng.randrange(screen_w - w), rng.randrange(screen_h - h)
+        targets.append(Target(i, x, y, x + w, y + h))
+    return targets
+
+
+# ---------------- spatial index ----------------
+class _Node:
+    __slots__ = ("x1", "y1", "x2", "y2", "count", "left", "right", "target", "vertical", "cut", "parent")
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.left = self.right = self.target = None
+        self.count = 0
+        self.vertical = False  # split by x (left / right) instead of y (top / bottom)
+        self.cut = 0
+        self.x1 = self.y1 = self.x2 = self.y2 = 0
+
+
+class TargetIndex:
+    """k-d tree of targets (one per leaf) with in-place insert / remove and partial rebuilds."""
+
+    def __init__(self, targets=()):
+        self.version = 0  # bumped by every change, engines use it to notice updates
+        self.rebuilds = 0
+        self.build(targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __contains__(self, target_id):
+        return target_id in self.targets
+
+    def get(self, target_id):
+        return self.targets[target_id]
+
+    # ---------------- construction ----------------
+    def build(self, targets):
+        self.targets = {t.id: t for t in targets}
+        self.leaves = {}  # target id -> leaf
+        self.root = self._build(list(self.targets.values()), None)
+        self.dead = 0 if self.targets else 1  # empty leaves still in the tree
+        self.version += 1
+
+    def _build(self, targets, parent):
+        node = _Node(parent)
+        if not targets:
+            return node
+        if len(targets) == 1:
+            self._set_leaf(node, targets[0])
+            return node
+        xs = [(t.x1 + t.x2) // 2 for t in targets]
+        ys = [(t.y1 + t.y2) // 2 for t in targets]
+        node.vertical = max(xs) - min(xs) >= max(ys) - min(ys)
+        keys = xs if node.vertical else ys
+        order = sorted(range(len(targets)), key=keys.__getitem__)
+        mid = len(order) // 2
+        node.cut = keys[order[mid]]
+        node.left = self._build([targets[i] for i in order[:mid]], node)
+        node.right = self._build([targets[i] for i in order[mid:]], node)
+        self._refresh(node)
+        return node
+
+    def _set_leaf(self, node, target):
+        node.target = target
+        node.count = 1
+        node.x1, node.y1, node.x2, node.y2 = target.x1, target.y1, target.x2, target.y2
+        self.leaves[target.id] = node
+
+    @staticmethod
+    def _refresh(node):
+        """Recompute count and bounding box of an internal node from its children."""
+        a, b = node.left, node.right
+        node.count = a.count + b.count
+        if not a.count:
+            a = b
+        elif not b.count:
+            b = a
+        node.x1, node.y1 = min(a.x1, b.x1), min(a.y1, b.y1)
+        node.x2, node.y2 = max(a.x2, b.x2), max(a.y2, b.y2)
+
+    def _live(self, node, out):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if not node.count:
+                continue
+            if node.target is not None:
+                out.append(node.target)
+            else:
+                stack.append(node.right)
+                stack.append(node.left)
+        return out
+
+    def _rebuild(self, node):
+        """Rebuild the subtree at `node` in place from its live targets (same node object).
+
+        The old nodes below it are detached (parent None), so engines holding one notice."""
+        live, leaves = [], 0
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.left is None:
+                leaves += 1
+                if n.count:
+                    live.append(n.target)
+            else:
+                stack.append(n.right)
+                stack.append(n.left)
+            if n is not node:
+                n.parent = None
+        self.dead -= leaves - len(live) - (0 if live else 1)
+        fresh = self._build(live, node.parent)
+        for name in _Node.__slots__:
+            if name != "parent":
+                setattr(node, name, getattr(fresh, name))
+        for child in (node.left, node.right):
+            if child is not None:
+                child.parent = node
+        if node.target is not None:
+            self.leaves[node.target.id] = node
+        self.rebuilds += 1
+
+    # ---------------- updates ----------------
+    def insert(self, target):
+        if target.id in self.targets:
+            self.remove(target.id)
+        self.targets[target.id] = target
+        cx, cy = target.center
+        node = self.root
+        while node.left is not None:
+            node = node.left if (cx if node.vertical else cy) < node.cut else node.right
+        if not node.count:
+            # reuse an empty leaf
+            self.dead -= 1
+            self._set_leaf(node, target)
+        else:
+            # split the leaf into the old target and the new one
+            old = node.target
+            ox, oy = old.center
+            node.target = None
+            node.vertical = abs(cx - ox) >= abs(cy - oy)
+            ko, kn = (ox, cx) if node.vertical else (oy, cy)
+            first, second = (old, target) if ko <= kn else (target, old)
+            node.cut = max(ko, kn)
+            node.left, node.right = _Node(node), _Node(node)
+            self._set_leaf(node.left, first)
+            self._set_leaf(node.right, second)
+            self._refresh(node)
+        self._fix_up(node.parent)
+        self.version += 1
+
+    def remove(self, target_id):
+        target = self.targets.pop(target_id)
+        leaf = self.leaves.pop(target_id)
+        leaf.target = None
+        leaf.count = 0
+        self.dead += 1
+        self._fix_up(leaf.parent)
+        if self.dead > len(self.targets) + MIN_REBUILD:
+            self._rebuild(self.root)
+        self.version += 1
+        return target
+
+    def _fix_up(self, node):
+        """Refresh counts and boxes from `node` to the root, then rebuild the highest lopsided node."""
+        scapegoat = None
+        while node is not None:
+            self._refresh(node)
+            if node.count >= MIN_REBUILD and max(node.left.count, node.right.count) > ALPHA * node.count:
+                scapegoat = node
+            node = node.parent
+        if scapegoat is not None:
+            self._rebuild(scapegoat)
+
+    def update(self, targets):
+        """Make the index hold exactly `targets` (a new layout); returns (added, removed, moved) ids.
+
+        `moved` also holds the targets that were only renamed; those keep their leaf."""
+        new = {t.id: t for t in targets}
+        removed = [tid for tid in self.targets if tid not in new]
+        added, moved, renamed = [], [], []
+        for tid, t in new.items():
+            old = self.targets.get(tid)
+            if old is None:
+                added.append(tid)
+            elif old.rect() != t.rect():
+                moved.append(tid)
+            elif old.name != t.name:
+                renamed.append(tid)
+        if len(added) + len(removed) + len(moved) > len(new) // 2:
+            self.build(targets)  # mostly a new screen: bulk build is cheaper
+            return added, removed, moved + renamed
+        for tid in renamed:
+            self.targets[tid] = self.leaves[tid].target = new[tid]
+        if renamed:
+            self.version += 1
+        for tid in removed:
+            self.remove(tid)
+        for tid in moved + added:
+            self.insert(new[tid])
+        return added, removed, moved + renamed
+
+    # ---------------- queries ----------------
+    def attached(self, node):
+        """True if `node` is still part of the tree (not cut loose by a rebuild)."""
+        while node.parent is not None:
+            node = node.parent
+        return node is self.root
+
+    @staticmethod
+    def settle(node):
+        """Skip splits with an empty side: the node whose children both hold targets, or a leaf."""
+        while node.left is not None and (not node.left.count or not node.right.count):
+            node = node.left if node.left.count else node.right
+        return node
+
+    def targets_under(self, node):
+        return self._live(node, [])
+
+
+def _box(node):
+    return Region(node.x1, node.y1, node.x2, node.y2)
+
+
+class TargetEngine:
+    """Binary scan over the targets of a TargetIndex: each prompt halves the candidate set."""
+
+    def __init__(self, index):
+        self.index = index
+        self.reset()
+
+    def reset(self):
+        self.signals = 0
+        self.undos = 0
+        self.history = deque(maxlen=HISTORY_LIMIT)
+        self.cross = None
+        self._enter(self.index.root)
+
+    def _enter(self, node):
+        """Show the prompt of `node` (settled to a real split), or select its target."""
+        self._version = self.index.version
+        node = self.current = TargetIndex.settle(node)
+        self.region = _box(node)
+        self.node_targets = node.count
+        if node.left is None:
+            self.phase = DONE
+            self.halves = self.direction = None
+            self.target = node.target  # None for an empty layout
+            self.point = self.selection = node.target.center if node.target is not None else None
+            return
+        self.phase = QUERY
+        self.target = self.point = self.selection = None
+        # vertical cut: left / right halves, like Region.subdivide(VERTICAL)
+        self.direction = VERTICAL if node.vertical else HORIZONTAL
+        self.halves = (_box(node.left), _box(node.right))
+
+    def sync(self):
+        """Pick up index updates: keep the current node if it survived, else start over."""
+        if self._version == self.index.version:
+            return False
+        node = self.current
+        if not (self.index.attached(node) and node.count):
+            self.history.clear()
+            node = self.index.root
+        self._enter(node)
+        return True
+
+    @property
+    def parts(self):
+        """The candidate nodes of the current prompt, in signal order."""
+        return self.current.left, self.current.right
+
+    def side_of(self, target_id):
+        """Signal that keeps `target_id` among the candidates; None if it is not a candidate."""
+        node = self.index.leaves.get(target_id)
+        while node is not None and node.parent is not self.current:
+            node = node.parent
+        if node is None:
+            return None
+        return 0 if node is self.current.left else 1
+
+    def step(self, s):
+        self.sync()
+        if self.phase == DONE:
+            return self.phase
+        self.history.append(self.current)
+        self.signals += 1
+        self._enter(self.current.right if s else self.current.left)
+        return self.phase
+
+    def undo(self):
+        """Back out of the last answer; False if there is nothing (still valid) to go back to."""
+        while self.history:
+            node = self.history.pop()
+            if self.index.attached(node) and node.count:
+                self._enter(node)
+                self.signals += 1
+                self.undos += 1
+                return True
+        return False
+
+    @property
+    def done(self):
+        return self.phase == DONE
+
+
+# ---------------- benchmark ----------------
+def bench(targets, selections=200, updates=0, seed=0):
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    index = TargetIndex(targets)
+    build_ms = (time.perf_counter() - t0) * 1000
+    engine = TargetEngine(index)
+    ids = list(index.targets)
+    steps, signals = [], []
+    for _ in range(selections):
+        goal = rng.choice(ids)
+        engine.reset()
+        while not engine.done:
+            s = engine.side_of(goal)
+            t = time.perf_counter()
+            engine.step(s)
+            steps.append(time.perf_counter() - t)
+        assert engine.target.id == goal, (engine.target, goal)
+        signals.append(engine.signals)
+    update_us = []
+    for i in range(updates):
+        t = rng.choice(ids)
+        old = index.get(t)
+        dx, dy = rng.randint(-40, 40), rng.randint(-40, 40)
+        t0 = time.perf_counter()
+        index.insert(Target(t, old.x1 + dx, old.y1 + dy, old.x2 + dx, old.y2 + dy, old.name))
+        update_us.append((time.perf_counter() - t0) * 1e6)
+    steps.sort()
+    update_us.sort()
+    return {
+        "targets": len(index),
+        "build_ms": build_ms,
+        "signals_mean": sum(signals) / len(signals),
+        "step_us_p50": steps[len(steps) // 2] * 1e6,
+        "step_us_p99": steps[min(len(steps) - 1, int(0.99 * len(steps)))] * 1e6,
+        "update_us_p50": update_us[len(update_us) // 2] if update_us else None,
+        "update_us_max": update_us[-1] if update_us else None,
+        "rebuilds": index.rebuilds,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Target index tools.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("bench", help="index build, partition step and update timings")
+    p.add_argument("layout", nargs="?", help="targets JSON (default: random layout of -n targets)")
+    p.add_argument("-n", type=int, nargs="+", default=[1000, 5000], help="random layout sizes")
+    p.add_argument("--selections", type=int, default=200)
+    p.add_argument("--updates", type=int, default=200, help="random target moves after the selections")
+    args = ap.parse_args()
+    layouts = [(args.layout, load_targets(args.layout))] if args.layout else [
+        (f"random:{n}", random_layout(n)) for n in args.n]
+    for name, targets in layouts:
+        r = bench(targets, args.selections, args.updates)
+        update = (f" | update p50 {r['update_us_p50']:.1f} us, max {r['update_us_max']:.1f} us"
+                  if r["update_us_p50"] is not None else "")
+        print(f"{name}: {r['targets']} targets | build {r['build_ms']:.1f} ms | {r['signals_mean']:.2f} signals"
+              f" | step p50 {r['step_us_p50']:.1f} us, p99 {r['step_us_p99']:.1f} us{update}"
+              f" | {r['rebuilds']} rebuilds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Per-step telemetry for scanning sessions.
+
+Every answered prompt becomes one record: phase, signal, region before the
+step, time the prompt waited for the user, signal-to-repaint time and time
+spent drawing the prompt.
+Records are plain tuples appended to a bounded ring buffer (live
+summaries) and, with a trace path, handed to a background thread that
+writes them as compact JSONL (one array per line, field names in the
+header line) once per flush interval. Recording costs a few
+microseconds, so it can stay on in normal use.
+
+With `profile=True` every handler runs under a cProfile.Profile of its
+phase; the profiles are dumped to <trace>.<phase>.prof on close (read
+them with pstats / snakeviz).
+
+    python demo1.py --trace session.jsonl [--profile]
+    python telemetry.py summary session.jsonl
+"""
+import argparse
+import cProfile
+import json
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+FIELDS = ("t", "phase", "signal", "c1", "r1", "c2", "r2", "signals", "wait_ms", "render_ms", "prompt_ms")
+TIMINGS = ("wait_ms", "render_ms", "prompt_ms")
+FLUSH_INTERVAL_S = 1.0
+
+_NO_PROFILE = nullcontext()
+
+
+class Telemetry:
+    def __init__(self, path=None, capacity=4096, flush_interval=FLUSH_INTERVAL_S, profile=False):
+        self.path = path
+        self.ring = deque(maxlen=capacity)  # most recent records
+        self.t0 = time.perf_counter()
+        self.profiles = {} if profile else None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if path:
+            self._file = open(path, "w")
+            self._file.write(json.dumps({"fields": FIELDS, "start": time.time()}) + "\n")
+            self._thread = threading.Thread(target=self._writer, args=(flush_interval,), daemon=True)
+            self._thread.start()
+
+    def record(self, phase, signal, region, signals, wait_s, render_s, prompt_s=0.0):
+        rec = (round(time.perf_counter() - self.t0, 4), phase, signal,
+               region.c1, region.r1, region.c2, region.r2, signals,
+               round(wait_s * 1000, 3), round(render_s * 1000, 3),
+               round(prompt_s * 1000, 3))
+        self.ring.append(rec)
+        if self._thread is not None:
+            with self._lock:
+                self._pending.append(rec)
+
+    def phase_profile(self, phase):
+        """Context manager profiling the enclosed code into the profile of `phase` (no-op unless profiling)."""
+        if self.profiles is None:
+            return _NO_PROFILE
+        profile = self.profiles.get(phase)
+        if profile is None:
+            profile = self.profiles[phase] = cProfile.Profile()
+        return profile
+
+    # ---------------- background writer ----------------
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._file.write("".join(json.dumps(rec, separators=(",", ":")) + "\n" for rec in batch))
+            self._file.flush()
+
+    def _writer(self, interval):
+        while not self._stop.wait(interval):
+            self._flush()
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._flush()
+            self._file.close()
+        if self.profiles:
+            for phase, profile in self.profiles.items():
+                profile.dump_stats(f"{self.path or 'telemetry'}.{phase}.prof")
+
+    def summary(self):
+        return format_summary(summarize(self.ring))
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))]
+
+
+def summarize(records):
+    """{phase: {"n": count, timing: (p50, p95), ...}} over FIELDS-ordered records."""
+    columns = {name: FIELDS.index(name) for name in TIMINGS}
+    by_phase = {}
+    for rec in records:
+        by_phase.setdefault(rec[1], []).append(rec)
+    out = {}
+    for phase, recs in by_phase.items():
+        stats = {"n": len(recs)}
+        for name, i in columns.items():
+            values = sorted(rec[i] for rec in recs)
+            stats[name] = (_percentile(values, 50), _percentile(values, 95))
+        out[phase] = stats
+    return out
+
+
+def format_summary(stats):
+    if not stats:
+        return "Telemetry: (no steps recorded)"
+    header = f"{'phase':>10} {'n':>6} | " + " | ".join(f"{name[:-3] + ' p50/p95 ms':>22}" for name in TIMINGS)
+    lines = [header, "-" * len(header)]
+    for phase, s in sorted(stats.items(), key=lambda item: -item[1]["n"]):
+        cells = " | ".join(f"{s[name][0]:>10.2f} {s[name][1]:>11.2f}" for name in TIMINGS)
+        lines.append(f"{phase:>10} {s['n']:>6} | {cells}")
+    return "\n".join(lines)
+
+
+def load_trace(path):
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if tuple(header["fields"]) != FIELDS:
+            raise ValueError(f"{path}: unknown trace fields {header['fields']}")
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scanning session telemetry.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("summary", help="p50/p95 timings per phase of one or more traces")
+    p.add_argument("trace", nargs="+")
+    args = ap.parse_args()
+    records = []
+    for path in args.trace:
+        records.extend(load_trace(path))
+    print(format_summary(summarize(records)))
+
+
+if __name__ == "__main__":
+    main()
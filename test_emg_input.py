@@ -0,0 +1,34 @@
+"""
+RingBuffer wrap-around and overrun (pytest).
+
+    python -m pytest -q test_emg_input.py
+"""
+import numpy as np
+
+from emg_input import RingBuffer
+
+
+def _samples(start, stop):
+    return np.arange(start, stop, dtype=np.float32)[:, None]
+
+
+def test_read_across_the_wrap():
+    ring = RingBuffer(8, 1)
+    ring.write(_samples(0, 6))
+    _, cursor, _ = ring.read_since(0)
+    ring.write(_samples(6, 12))
+    out, cursor, dropped = ring.read_since(cursor)
+    assert out[:, 0].tolist() == list(range(6, 12))
+    assert (cursor, dropped) == (12, 0)
+
+
+def test_block_larger_than_capacity_keeps_its_tail():
+    ring = RingBuffer(8, 1)
+    ring.write(_samples(0, 11))
+    out, cursor, dropped = ring.read_since(0)
+    assert out[:, 0].tolist() == list(range(3, 11))
+    assert (cursor, dropped) == (11, 3)
+    # later writes continue behind the kept tail
+    ring.write(_samples(11, 14))
+    out, cursor, _ = ring.read_since(cursor)
+    assert out[:, 0].tolist() == [11, 12, 13]
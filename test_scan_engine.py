@@ -0,0 +1,25 @@
+"""
+Worst-case signal counts of scan_engine's cross-precision flows (pytest).
+
+Every target of each grid is selected by an error-free simulated user that
+picks cross precision (simulate.worst_case); the most signals any target
+needs must stay within the variant's bound.
+
+    python -m pytest -q test_scan_engine.py
+"""
+import pytest
+
+from scan_engine import CROSS_LINEAR, CROSS_LOG
+from simulate import worst_case
+
+
+@pytest.mark.parametrize("cross", [CROSS_LINEAR, CROSS_LOG])
+@pytest.mark.parametrize("cols, rows", [(8, 8), (20, 20), (64, 64)])
+def test_worst_case_within_bound(cols, rows, cross):
+    worst, bound = worst_case(cols, rows, cross=cross)
+    assert worst <= bound, f"{cols}x{rows} {cross}: {worst} signals, bound {bound}"
+
+
+def test_log_cross_beats_linear_walk():
+    # O(log n) against a walk along the diagonal and the chosen row / column
+    assert worst_case(64, 64, cross=CROSS_LOG)[0] < worst_case(64, 64, cross=CROSS_LINEAR)[0]
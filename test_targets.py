@@ -0,0 +1,115 @@
+"""
+TargetIndex / TargetEngine invariants under random updates (pytest).
+
+After every batch of inserts, removals and moves the tree must stay
+consistent: parent links, counts and boxes match the leaves below each
+node, `leaves` maps every live target to its leaf, `dead` counts the
+empty leaves, and every target can still be selected.
+
+    python -m pytest -q test_targets.py
+"""
+import random
+
+from scan_engine import DONE, QUERY
+from server import snapshot
+from targets import Target, TargetEngine, TargetIndex, random_layout
+
+
+def check_tree(index):
+    def walk(node):
+        if node.left is None:
+            if node.count:
+                assert node.count == 1 and index.leaves[node.target.id] is node
+                return [node.target], 0
+            return [], 1
+        assert node.left.parent is node and node.right.parent is node
+        left, dead_left = walk(node.left)
+        right, dead_right = walk(node.right)
+        below = left + right
+        assert node.count == len(below)
+        if below:
+            box = (min(t.x1 for t in below), min(t.y1 for t in below),
+                   max(t.x2 for t in below), max(t.y2 for t in below))
+            assert (node.x1, node.y1, node.x2, node.y2) == box
+        return below, dead_left + dead_right
+
+    assert index.root.parent is None
+    live, dead = walk(index.root)
+    assert sorted(t.id for t in live) == sorted(index.targets) == sorted(index.leaves)
+    assert dead == index.dead
+
+
+def select(engine, target_id):
+    engine.reset()
+    while not engine.done:
+        engine.step(engine.side_of(target_id))
+    return engine.target.id
+
+
+def test_random_inserts_removals_and_moves():
+    rng = random.Random(3)
+    index = TargetIndex()
+    next_id = 0
+    for step in range(3000):
+        r = rng.random()
+        if r < 0.5 or not index.targets:
+            x, y = rng.randrange(1900), rng.randrange(1060)
+            index.insert(Target(next_id, x, y, x + rng.randint(1, 50), y + rng.randint(1, 20)))
+            next_id += 1
+        elif r < 0.8:
+            index.remove(rng.choice(list(index.targets)))
+        else:
+            t = index.get(rng.choice(list(index.targets)))
+            index.insert(Target(t.id, t.x1 + 5, t.y1, t.x2 + 5, t.y2))
+        if step % 100 == 0:
+            check_tree(index)
+    check_tree(index)
+    engine = TargetEngine(index)
+    for target_id in list(index.targets):
+        assert select(engine, target_id) == target_id
+
+
+def test_layout_updates_during_a_selection():
+    rng = random.Random(5)
+    index = TargetIndex(random_layout(300, rng=rng))
+    engine = TargetEngine(index)
+    for _ in range(100):
+        goal = rng.choice(list(index.targets))
+        engine.reset()
+        while not engine.done:
+            if rng.random() < 0.2:
+                layout = [Target(t.id, t.x1 + rng.randint(-3, 3), t.y1, t.x2, t.y2) if rng.random() < 0.02 else t
+                          for t in index.targets.values() if t.id == goal or rng.random() > 0.01]
+                index.update(layout)
+            engine.sync()
+            s = engine.side_of(goal)
+            if s is None:
+                engine.reset()
+                continue
+            engine.step(s)
+        assert engine.target.id == goal
+    check_tree(index)
+
+
+def test_rename_counts_as_a_change():
+    layout = random_layout(20, rng=random.Random(1))
+    index = TargetIndex(layout)
+    t = layout[3]
+    assert index.update(layout[:3] + [Target(t.id, t.x1, t.y1, t.x2, t.y2, "renamed")] + layout[4:]) == ([], [], [t.id])
+    assert index.get(t.id).name == "renamed"
+    check_tree(index)
+
+
+def test_empty_layout():
+    engine = TargetEngine(TargetIndex([]))
+    assert engine.phase == DONE and engine.selection is None and engine.direction is None
+    assert snapshot(engine)["selection"] is None
+
+
+def test_single_target():
+    engine = TargetEngine(TargetIndex([Target("ok", 10, 10, 30, 20)]))
+    assert engine.phase == DONE and engine.target.id == "ok" and engine.direction is None
+    assert snapshot(engine)["point"] == [20, 15]
+    engine.index.update([Target("ok", 10, 10, 30, 20), Target("cancel", 40, 10, 60, 20)])
+    engine.sync()
+    assert engine.phase == QUERY and select(engine, "cancel") == "cancel"